@@ -4,22 +4,35 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
 
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
 from spade.message import Message
+from spade.template import Template
 
 from src.protocol import (
+    ONTOLOGY,
+    MessageCodec,
     ResearchRequest,
     ResearchResult,
     VerifyRequest,
     VerifyResult,
+    as_int,
     make_metadata,
     new_conversation_id,
+    unresolved_evidence,
 )
-from src.tools.llm import LLMClient, LLMConfig
+from src.tools.claims import ClaimSplitter, cited_evidence, has_words
+from src.tools.evidence import estimate_tokens, evidence_line
+from src.tools.correlator import ReplyCorrelator
+from src.tools.llm import CompletionCache, LLMClient, LLMConfig
 from src.tools.logging_utils import log_msg
+from src.tools.output import ConsoleSink
+from src.tools.response_cache import ResponseCache
+from src.tools.tracing import NULL_TRACER, Span, Tracer, mark_received
+from src.tools.transport import LocalBus, TransportAgent
+from src.tools.worker_pool import WorkerPool
 
 #Promptovi su Ai generirani uz pomoc Github Copilota
 
@@ -52,45 +65,297 @@ Ispravi nacrt:
 - zadrži citate [DOC:CHUNK] samo ako se stvarno odnose na dokaze
 """
 
+COORDINATOR_CLAIM_REVISION_PROMPT = """Ti si Koordinator. Dobio si jedan dio odgovora (tvrdnju) i nalaz Provjeravatelja za nju.
 
-class CoordinatorAgent(Agent):
+Ispravi samo taj dio:
+- ukloni ili ublaži ono što dokazi ne potvrđuju
+- zadrži citate [DOC:CHUNK] samo ako se stvarno odnose na dokaze
+- vrati isključivo ispravljeni tekst dijela, bez uvoda i objašnjenja
+"""
+
+_VERDICT_RANK = {"PASS": 0, "WARN": 1, "FAIL": 2}
+_REPLY_ROLES = ("research_result", "verify_result", "index_update")
+
+
+class CoordinatorAgent(TransportAgent):
     def __init__(
         self,
         jid: str,
         password: str,
         *,
-        researcher_jid: str,
-        verifier_jid: str,
+        researcher_jids: Sequence[str],
+        verifier_jids: Sequence[str],
         llm_model: str,
         logger,
+        max_concurrency: int = 4,
+        queue_size: int = 32,
+        cache_size: int = 256,
+        cache_ttl: float = 3600.0,
+        cache_similarity: float = 0.0,
+        llm_cache: Optional[CompletionCache] = None,
+        stream: bool = True,
+        output: Optional[ConsoleSink] = None,
+        speculative: bool = False,
+        request_timeout: float = 30.0,
+        failover_attempts: int = 2,
+        worker_cooldown: float = 10.0,
+        tracer: Optional[Tracer] = None,
+        llm_client: Optional[LLMClient] = None,
+        bus: Optional[LocalBus] = None,
+        codec: Optional[MessageCodec] = None,
     ):
-        super().__init__(jid, password)
-        self.researcher_jid = researcher_jid
-        self.verifier_jid = verifier_jid
+        super().__init__(jid, password, bus=bus)
         self.logger = logger
-        self.llm = LLMClient(LLMConfig(model=llm_model, max_output_tokens=900))
+        # Zahtjevi se dijele među agentima iste uloge; tko ne odgovori, privremeno se preskače
+        self.researchers = WorkerPool("research", researcher_jids, cooldown=worker_cooldown, logger=logger)
+        self.verifiers = WorkerPool("verify", verifier_jids, cooldown=worker_cooldown, logger=logger)
+        self.request_timeout = request_timeout
+        self.failover_attempts = max(1, failover_attempts)
+        # llm_client: gotov klijent (npr. lažni model za mjerenja, vidi src/bench/fake_llm.py)
+        self.llm = llm_client or LLMClient(LLMConfig(model=llm_model, max_output_tokens=900), cache=llm_cache)
 
         self.history: list[dict[str, str]] = []
 
-        self.user_queue: asyncio.Queue[str] = asyncio.Queue()
+        # Nacrt se ispisuje dio po dio kako ga model piše; presuda Provjeravatelja dolazi nakon njega
+        self.stream = stream
+        self.output = output or ConsoleSink()
+        # Spekulativno: tvrdnje nacrta provjeravaju se paralelno već dok nacrt nastaje,
+        # a ispravljaju se samo označene tvrdnje umjesto cijelog odgovora
+        self.speculative = speculative
+
+        # Ograničen red = backpressure: put() čeka kad je previše pitanja na čekanju
+        # (pitanje, trenutak ulaska u red) - čekanje u redu bilježi se u spanu razgovora
+        self.user_queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue(maxsize=queue_size)
+        self.max_concurrency = max(1, max_concurrency)
+
+        # conversation-id -> zadatak razgovora; odgovori agenata idu kroz korelator
+        self.conversations: Dict[str, asyncio.Task] = {}
+        self.correlator = ReplyCorrelator(logger=logger)
+
+        # Predmemorija konačnih odgovora; vrijedi samo za poznatu generaciju indeksa korpusa
+        self.response_cache = ResponseCache(cache_size, cache_ttl, cache_similarity) if cache_size > 0 else None
+        self.index_generation = 0
+        self.tracer = tracer or NULL_TRACER
+        # Kodiranje tijela poruka i dokazi po referenci (MESSAGE_ENCODING, EVIDENCE_REFS)
+        self.codec = codec or MessageCodec()
+
+    async def ask(self, user_text: str) -> None:
+        """Stavi pitanje u red (čeka ako je red pun)."""
+        await self.user_queue.put((user_text, time.time_ns()))
+
+    def dispatch(self, msg: Message):
+        mark_received(msg)
+        return super().dispatch(msg)
+
+    def on_index_generation(self, generation: int) -> None:
+        """Istraživač javlja generaciju indeksa; promjena poništava predmemoriju odgovora."""
+        if generation == self.index_generation:
+            return
+        self.index_generation = generation
+        if self.response_cache is not None:
+            dropped = self.response_cache.invalidate(generation)
+            self.logger.info("response_cache invalidate generation=%d dropped=%d", generation, dropped)
 
     async def setup(self):
-        self.add_behaviour(_OrchestratorBehaviour())
+        # Bez predloška SPADE bi svaku poruku stavio i u red orkestratora, koji ga nikad ne čita
+        self.add_behaviour(_OrchestratorBehaviour(), ~Template())
+        self.add_behaviour(_ReplyDispatchBehaviour(), _reply_template())
+
+
+def _reply_template() -> Template:
+    """Odgovori Istraživača i Provjeravatelja te obavijesti o novoj generaciji indeksa."""
+    template = None
+    for role in _REPLY_ROLES:
+        t = Template()
+        t.set_metadata("ontology", ONTOLOGY)
+        t.set_metadata("role", role)
+        template = t if template is None else template | t
+    return template
+
+
+class _ReplyDispatchBehaviour(CyclicBehaviour):
+    """Jedini primatelj odgovora; prosljeđuje poruku čekatelju prema (conversation-id, role)."""
+
+    async def run(self):
+        msg = await self.receive(timeout=1)
+        if not msg:
+            return
+
+        md = dict(msg.metadata)
+        log_msg(self.agent.logger, "recv", str(msg.sender), str(self.agent.jid), md, msg.body or "")
+
+        if md.get("index-generation") is not None:
+            generation = _generation(md)
+            if generation:
+                self.agent.on_index_generation(generation)
+            else:
+                # Neispravan podatak drugog agenta ne smije srušiti jedino ponašanje za odgovore
+                self.agent.logger.warning(
+                    "index_generation_invalid sender=%s value=%r", msg.sender, md.get("index-generation")
+                )
+        if md.get("role") == "index_update":
+            return
+
+        # Odgovor koji još nitko ne čeka korelator kratko sprema umjesto da ga odbaci
+        self.agent.correlator.deliver(msg)
 
 
 class _OrchestratorBehaviour(CyclicBehaviour):
+    """Uzima pitanja iz reda i pokreće do `max_concurrency` razgovora istovremeno."""
+
+    async def on_start(self):
+        self._slots = asyncio.Semaphore(self.agent.max_concurrency)
+
     async def run(self):
+        # Novo pitanje uzimamo tek kad postoji slobodno mjesto (backpressure prema redu)
+        await self._slots.acquire()
         try:
-            user_text = self.agent.user_queue.get_nowait()
-        except asyncio.QueueEmpty:
-            await asyncio.sleep(0.1)
+            user_text, queued_ns = await asyncio.wait_for(self.agent.user_queue.get(), timeout=1)
+        except asyncio.TimeoutError:
+            self._slots.release()
             return
 
         if not user_text.strip():
+            self._slots.release()
             return
 
         conversation_id = new_conversation_id()
+        task = asyncio.create_task(self._converse(user_text, conversation_id, queued_ns))
+        self.agent.conversations[conversation_id] = task
+        task.add_done_callback(lambda _t, cid=conversation_id: self._finish(cid))
+
+    def _finish(self, conversation_id: str) -> None:
+        self.agent.conversations.pop(conversation_id, None)
+        self.agent.correlator.discard(conversation_id)
+        self._slots.release()
+
+    async def on_end(self):
+        for task in list(self.agent.conversations.values()):
+            task.cancel()
+
+    async def _converse(self, user_text: str, conversation_id: str, queued_ns: int) -> None:
+        root = self.agent.tracer.span(
+            "conversation", conversation_id, queue_wait_ms=round((time.time_ns() - queued_ns) / 1e6, 3)
+        )
+        try:
+            with root:
+                await self._pipeline(user_text, conversation_id, root)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            self.agent.logger.exception("Greška u razgovoru conversation_id=%s", conversation_id)
+            print(f"[GREŠKA] Obrada pitanja nije uspjela: {user_text}")
+        finally:
+            self.agent.output.end(conversation_id)
+
+    async def _write_llm(
+        self,
+        conversation_id: str,
+        stage: str,
+        system_prompt: str,
+        user_prompt: str,
+        started: float,
+        on_text: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> tuple[str, Optional[float]]:
+        """Odgovor modela ide u izlaz dok nastaje; vraća (tekst, TTFT u ms od početka razgovora).
+
+        `on_text` dobiva isti tekst koji je ispisan (npr. za provjeru tvrdnji usput);
+        `stage` je ime spana (draft, revision).
+        """
+        with self.agent.tracer.span(stage, input_tokens=estimate_tokens(system_prompt + user_prompt)) as span:
+            text, ttft_ms = await self._generate(conversation_id, system_prompt, user_prompt, started, on_text)
+            span.set(output_tokens=estimate_tokens(text), ttft_ms=round(ttft_ms, 3) if ttft_ms is not None else None)
+        return text, ttft_ms
+
+    async def _generate(
+        self,
+        conversation_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        started: float,
+        on_text: Optional[Callable[[str], Awaitable[None]]],
+    ) -> tuple[str, Optional[float]]:
+        out = self.agent.output
+        if not self.agent.stream:
+            text = (await self.agent.llm.acomplete(system_prompt, user_prompt)).strip()
+            out.write(conversation_id, text)
+            if on_text is not None:
+                await on_text(text)
+            return text, (time.perf_counter() - started) * 1000
+
+        parts: list[str] = []
+        ttft_ms = None
+        async for delta in self.agent.llm.astream(system_prompt, user_prompt):
+            if not parts:
+                # Početne praznine se ne ispisuju (kao i strip() kod acomplete)
+                delta = delta.lstrip()
+                if not delta:
+                    continue
+                ttft_ms = (time.perf_counter() - started) * 1000
+            parts.append(delta)
+            out.write(conversation_id, delta)
+            if on_text is not None:
+                await on_text(delta)
+        return "".join(parts).strip(), ttft_ms
+
+    async def _ask(
+        self, pool: WorkerPool, conversation_id: str, role: str, payload: Dict[str, Any], claim_id: str = ""
+    ) -> Optional[Message]:
+        """Zahtjev agentu iz skupa i čekanje na `<role>_result`; bez odgovora pokušava drugi agent.
+
+        Tijelo se kodira za svakog agenta posebno (vidi `MessageCodec`).
+        """
+        with self.agent.tracer.span(f"{role}.request", pool=pool.name, claim_id=claim_id or None) as span:
+            reply = await self._ask_pool(pool, conversation_id, role, payload, claim_id, span)
+            span.set(ok=reply is not None)
+            if reply is not None:
+                self.agent.tracer.hop(reply)
+            return reply
+
+    async def _ask_pool(
+        self, pool: WorkerPool, conversation_id: str, role: str, payload: Dict[str, Any], claim_id: str, span: Span
+    ) -> Optional[Message]:
+        extra = {"role": role}
+        if claim_id:
+            extra["claim-id"] = claim_id
+        tried: list[str] = []
+        for _ in range(min(len(pool), self.agent.failover_attempts)):
+            jid = pool.pick(exclude=tried)
+            if jid is None:
+                break
+            tried.append(jid)
+            body, encoding = self.agent.codec.encode(payload, jid)
+            span.set(attempts=len(tried), jid=jid, request_bytes=len(body.encode("utf-8")))
+            msg = Message(to=jid)
+            msg.metadata = make_metadata("request", conversation_id, {**extra, **encoding}, span.span_id)
+            msg.body = body
+            t0 = time.perf_counter()
+            ok: Optional[bool] = None
+            reply = None
+            try:
+                await self.send(msg)
+                log_msg(self.agent.logger, "send", str(self.agent.jid), jid, dict(msg.metadata), msg.body)
+                reply = await self.agent.correlator.wait(
+                    conversation_id, f"{role}_result", self.agent.request_timeout, claim_id=claim_id
+                )
+                ok = reply is not None
+            except ConnectionError as e:
+                # Neuspjelo slanje tretira se kao izostao odgovor - pokušava se drugi agent
+                self.agent.logger.warning("send_failed pool=%s jid=%s err=%s", pool.name, jid, e)
+                ok = False
+            finally:
+                pool.finish(jid, ok, time.perf_counter() - t0)
+            if reply is not None:
+                return reply
+            self.agent.logger.warning(
+                "no_reply pool=%s jid=%s conversation_id=%s claim_id=%s", pool.name, jid, conversation_id, claim_id
+            )
+        return None
+
+    async def _pipeline(self, user_text: str, conversation_id: str, root: Span) -> None:
         self.agent.logger.info("conversation_id=%s", conversation_id)
+        started = time.perf_counter()
+        out = self.agent.output
 
         history_block = "\n".join(
             [f"U: {h['user']}\nA: {h['assistant']}" for h in self.agent.history[-3:]]
@@ -100,27 +365,56 @@ class _OrchestratorBehaviour(CyclicBehaviour):
         else:
             user_for_plan = user_text
 
+        # 0) PREDMEMORIJA: isto (ili dovoljno slično) pitanje nad istom generacijom korpusa
+        cache = self.agent.response_cache
+        if cache is not None and self.agent.index_generation:
+            hit = cache.get(user_text, self.agent.index_generation, context=history_block)
+            if hit is not None:
+                root.set(cached=True, verdict=hit.verdict)
+                self.agent.logger.info("response_cache hit conversation_id=%s stats=%s", conversation_id, cache.stats)
+                out.begin(conversation_id, user_text, cached=True)
+                out.write(conversation_id, hit.answer)
+                out.write(conversation_id, _verdict_line(hit.verdict, hit.issues))
+                self._remember(user_text, hit.answer)
+                ms = (time.perf_counter() - started) * 1000
+                self.agent.logger.info(
+                    "latency conversation_id=%s ttft_ms=%.1f total_ms=%.1f cached=1", conversation_id, ms, ms
+                )
+                return
+
         # 1) PLANIRANJE
-        plan_raw = self.agent.llm.complete(COORDINATOR_PLAN_PROMPT, user_for_plan)
+        with self.agent.tracer.span(
+            "plan", input_tokens=estimate_tokens(COORDINATOR_PLAN_PROMPT + user_for_plan)
+        ) as span:
+            plan_raw = await self.agent.llm.acomplete(COORDINATOR_PLAN_PROMPT, user_for_plan)
+            span.set(output_tokens=estimate_tokens(plan_raw))
         plan = _safe_json(plan_raw, default={"research_query": user_text, "subtasks": [], "notes": ""})
         research_query = str(plan.get("research_query") or user_text)
 
         # 2) PITAJ ISTRAŽIVAČA
         research_req = ResearchRequest(query=research_query, top_k=5)
-        msg = Message(to=self.agent.researcher_jid)
-        msg.metadata = make_metadata("request", conversation_id, {"role": "research"})
-        msg.body = research_req.to_json()
-        await self.send(msg)
-        log_msg(self.agent.logger, "send", str(self.agent.jid), str(self.agent.researcher_jid), dict(msg.metadata), msg.body)
-
-        research_res = await _wait_for_role(self, conversation_id, want_role="research_result", timeout=30)
+        research_res = await self._ask(
+            self.agent.researchers, conversation_id, "research", research_req.to_payload()
+        )
         if research_res is None:
+            root.set(error="research_timeout")
             print("[GREŠKA] Isteklo vrijeme za Istraživača.")
             return
-        rr = ResearchResult.from_json(research_res.body or "{}")
+        rr = ResearchResult.from_payload(await self.agent.codec.adecode(research_res))
+        missing = unresolved_evidence(rr.evidence)
+        if missing:
+            # Nacrt se piše samo iz dokaza čiji je tekst poznat; izostavljeni se bilježe
+            rr.evidence = [e for e in rr.evidence if not e.get("unresolved")]
+            root.set(unresolved_evidence=len(missing))
+            self.agent.logger.warning(
+                "research_evidence_unresolved conversation_id=%s missing=%d kept=%d",
+                conversation_id,
+                len(missing),
+                len(rr.evidence),
+            )
 
         # 3) NACRT ODGOVORA
-        evidence_block = "\n".join([f"- [{e['doc_id']}:{e['chunk_id']}] {e['text']}" for e in rr.evidence])
+        evidence_block = "\n".join(evidence_line(e) for e in rr.evidence)
         draft_prompt = (
             f"Korisnikov upit: {user_text}\n\n"
             + (f"Kontekst (zadnja 3 turna):\n{history_block}\n\n" if history_block else "")
@@ -129,21 +423,36 @@ class _OrchestratorBehaviour(CyclicBehaviour):
             + f"Dokazi:\n{evidence_block}\n\n"
             + "Napiši konačan odgovor."
         )
-        draft_answer = self.agent.llm.complete(COORDINATOR_DRAFT_PROMPT, draft_prompt).strip()
+        out.begin(conversation_id, user_text)
+        if self.agent.speculative:
+            final_answer, ttft_ms, vr = await self._draft_speculative(
+                user_text, conversation_id, draft_prompt, rr.evidence, started
+            )
+            root.set(verdict=vr.verdict if vr is not None else "")
+            research_generation = _generation(research_res.metadata)
+            # Sprema se samo odgovor koji je prošao provjeru (pogodak se ispisuje kao provjeren)
+            if vr is not None and vr.verdict == "PASS" and cache is not None and research_generation:
+                cache.put(user_text, research_generation, final_answer, vr.verdict, vr.issues, context=history_block)
+            self._finish_conversation(user_text, conversation_id, final_answer, ttft_ms, started)
+            return
+
+        draft_answer, ttft_ms = await self._write_llm(
+            conversation_id, "draft", COORDINATOR_DRAFT_PROMPT, draft_prompt, started
+        )
 
         # 4) PROVJERA
-        verify_req = VerifyRequest(draft_answer=draft_answer, evidence=rr.evidence)
-        vmsg = Message(to=self.agent.verifier_jid)
-        vmsg.metadata = make_metadata("request", conversation_id, {"role": "verify"})
-        vmsg.body = verify_req.to_json()
-        await self.send(vmsg)
-        log_msg(self.agent.logger, "send", str(self.agent.jid), str(self.agent.verifier_jid), dict(vmsg.metadata), vmsg.body)
-
-        verify_res = await _wait_for_role(self, conversation_id, want_role="verify_result", timeout=30)
+        # Provjeravatelju samo citirani dokazi (bez citata svi), ne cijeli paket ponovno
+        verify_req = VerifyRequest(draft_answer=draft_answer, evidence=cited_evidence(draft_answer, rr.evidence))
+        verify_res = await self._ask(self.agent.verifiers, conversation_id, "verify", verify_req.to_payload())
         final_answer = draft_answer
 
-        if verify_res is not None:
-            vr = VerifyResult.from_json(verify_res.body or "{}")
+        if verify_res is None:
+            out.write(conversation_id, "\n\n[Provjeravatelj: nema odgovora]\n")
+        else:
+            vr = VerifyResult.from_payload(self.agent.codec.decode(verify_res))
+            root.set(verdict=vr.verdict)
+            # Presuda se dodaje ispod već ispisanog nacrta
+            out.write(conversation_id, _verdict_line(vr.verdict, vr.issues))
             if vr.verdict in {"WARN", "FAIL"}:
                 revision_prompt = (
                     f"UPIT: {user_text}\n\n"
@@ -153,35 +462,139 @@ class _OrchestratorBehaviour(CyclicBehaviour):
                     f"- suggested_fixes: {vr.suggested_fixes}\n\n"
                     "Ispravi odgovor." 
                 )
-                final_answer = self.agent.llm.complete(COORDINATOR_REVISION_PROMPT, revision_prompt).strip()
+                out.write(conversation_id, "\n--- ISPRAVLJENI ODGOVOR ---\n\n")
+                final_answer, _ = await self._write_llm(
+                    conversation_id, "revision", COORDINATOR_REVISION_PROMPT, revision_prompt, started
+                )
 
-            # Prikaz presude provjeravatelja
-            print(f"\n[Provjeravatelj: {vr.verdict}] {(' | '.join(vr.issues[:3])) if vr.issues else ''}\n")
+            # WARN/FAIL znači ispravljen, a neprovjeren odgovor - takav se ne sprema
+            if cache is not None and vr.verdict == "PASS":
+                generation = _generation(research_res.metadata)
+                if generation:
+                    cache.put(user_text, generation, final_answer, vr.verdict, vr.issues, context=history_block)
+
+        # 5) POVIJEST I MJERENJA (blok odgovora zatvara _converse)
+        self._finish_conversation(user_text, conversation_id, final_answer, ttft_ms, started)
+
+    async def _draft_speculative(
+        self, user_text: str, conversation_id: str, draft_prompt: str, evidence: list, started: float
+    ) -> tuple[str, Optional[float], Optional[VerifyResult]]:
+        """Nacrt uz paralelnu provjeru tvrdnji; vraća (konačni odgovor, TTFT, zbirna presuda)."""
+        out = self.agent.output
+        splitter = ClaimSplitter()
+        segments: list[str] = []  # dijelovi nacrta redom; zajedno čine cijeli ispisani tekst
+        checked: list[int] = []  # indeksi dijelova poslanih na provjeru (claim-id = c<indeks>)
+        pending: list[asyncio.Task] = []
+
+        async def submit(segment: str) -> None:
+            segments.append(segment)
+            if has_words(segment):
+                idx = len(segments) - 1
+                checked.append(idx)
+                req = VerifyRequest(draft_answer=segment.strip(), evidence=cited_evidence(segment, evidence))
+                # Svaka tvrdnja ide (možda drugom) Provjeravatelju dok nacrt i dalje nastaje
+                ask = self._ask(self.agent.verifiers, conversation_id, "verify", req.to_payload(), f"c{idx}")
+                pending.append(asyncio.create_task(ask))
+
+        async def on_text(text: str) -> None:
+            for segment in splitter.feed(text):
+                await submit(segment)
 
-        # 5) ISPIS
-        print("\n=== ODGOVOR ===\n")
-        print(final_answer)
-        print("\n==============\n")
+        try:
+            draft_answer, ttft_ms = await self._write_llm(
+                conversation_id, "draft", COORDINATOR_DRAFT_PROMPT, draft_prompt, started, on_text=on_text
+            )
+            for segment in splitter.flush():
+                await submit(segment)
+            # Provjere ranijih tvrdnji su većinom već gotove
+            replies = await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+        codec = self.agent.codec
+        results = {i: VerifyResult.from_payload(codec.decode(m)) for i, m in zip(checked, replies) if m is not None}
+        if not results:
+            out.write(conversation_id, "\n\n[Provjeravatelj: nema odgovora]\n")
+            return draft_answer, ttft_ms, None
+
+        verdict = max((r.verdict for r in results.values()), key=lambda v: _VERDICT_RANK.get(v, 1))
+        issues = [issue for r in results.values() for issue in r.issues]
+        fixes = [fix for r in results.values() for fix in r.suggested_fixes]
+        if len(results) < len(checked):
+            issues.append(f"Provjera nije stigla za {len(checked) - len(results)} od {len(checked)} tvrdnji.")
+        vr = VerifyResult(verdict=verdict, issues=issues, suggested_fixes=fixes)
+        out.write(conversation_id, _verdict_line(vr.verdict, vr.issues))
+
+        flagged = [i for i, r in results.items() if r.verdict in {"WARN", "FAIL"}]
+        self.agent.logger.info(
+            "speculative_verify conversation_id=%s claims=%d verified=%d flagged=%d",
+            conversation_id, len(checked), len(results), len(flagged),
+        )
+        if not flagged:
+            return draft_answer, ttft_ms, vr
+
+        async def revise(i: int) -> str:
+            prompt = _claim_revision_prompt(user_text, segments[i], results[i], cited_evidence(segments[i], evidence))
+            with self.agent.tracer.span(
+                "revision",
+                claim_id=f"c{i}",
+                input_tokens=estimate_tokens(COORDINATOR_CLAIM_REVISION_PROMPT + prompt),
+            ) as span:
+                text = await self.agent.llm.acomplete(COORDINATOR_CLAIM_REVISION_PROMPT, prompt)
+                span.set(output_tokens=estimate_tokens(text))
+            return text
+
+        # Ispravljaju se samo označene tvrdnje, paralelno; ostatak nacrta ostaje kakav jest
+        revised = await asyncio.gather(*(revise(i) for i in flagged))
+        for i, text in zip(flagged, revised):
+            text = text.strip()
+            if text:
+                segment = segments[i]
+                lead = segment[: len(segment) - len(segment.lstrip())]
+                trail = segment[len(segment.rstrip()) :]
+                segments[i] = lead + text + trail
+        final_answer = "".join(segments).strip()
+        out.write(conversation_id, "\n--- ISPRAVLJENI ODGOVOR ---\n\n")
+        out.write(conversation_id, final_answer)
+        return final_answer, ttft_ms, vr
+
+    def _finish_conversation(
+        self, user_text: str, conversation_id: str, final_answer: str, ttft_ms: Optional[float], started: float
+    ) -> None:
+        self._remember(user_text, final_answer)
+        self.agent.logger.info(
+            "latency conversation_id=%s ttft_ms=%.1f total_ms=%.1f cached=0",
+            conversation_id,
+            ttft_ms if ttft_ms is not None else -1.0,
+            (time.perf_counter() - started) * 1000,
+        )
 
-        self.agent.history.append({"user": user_text, "assistant": final_answer})
+    def _remember(self, user_text: str, answer: str) -> None:
+        self.agent.history.append({"user": user_text, "assistant": answer})
         if len(self.agent.history) > 10:
             self.agent.history = self.agent.history[-10:]
 
 
-async def _wait_for_role(behaviour: CyclicBehaviour, conversation_id: str, want_role: str, timeout: int = 20) -> Optional[Message]:
-    """Čekaj dolaznu poruku s odgovarajućim ID-jem razgovora i ulogom."""
-    end = asyncio.get_event_loop().time() + timeout
-    while asyncio.get_event_loop().time() < end:
-        msg = await behaviour.receive(timeout=1)
-        if not msg:
-            continue
-        md = dict(msg.metadata)
-        if md.get("conversation-id") == conversation_id and md.get("role") == want_role:
-            log_msg(behaviour.agent.logger, "recv", str(msg.sender), str(behaviour.agent.jid), md, msg.body or "")
-            return msg
-        # Inače: ignoriraj (ali zabilježi)
-        log_msg(behaviour.agent.logger, "recv", str(msg.sender), str(behaviour.agent.jid), md, msg.body or "")
-    return None
+def _claim_revision_prompt(user_text: str, claim: str, result: VerifyResult, evidence: list) -> str:
+    evidence_block = "\n".join(evidence_line(e) for e in evidence)
+    return (
+        f"UPIT: {user_text}\n\n"
+        f"TVRDNJA:\n{claim.strip()}\n\n"
+        f"DOKAZI:\n{evidence_block}\n\n"
+        f"PROVJERA (verdict={result.verdict}):\n"
+        f"- issues: {result.issues}\n"
+        f"- suggested_fixes: {result.suggested_fixes}\n\n"
+        "Ispravi tvrdnju."
+    )
+
+
+def _generation(md: Dict[str, Any]) -> int:
+    """`index-generation` iz metapodataka poruke; 0 ako ga nema ili nije pozitivan broj."""
+    return max(0, as_int(md.get("index-generation")))
+
+
+def _verdict_line(verdict: str, issues: list) -> str:
+    return f"\n\n[Provjeravatelj: {verdict}] {(' | '.join(issues[:3])) if issues else ''}\n"
 
 
 def _safe_json(text: str, default: Dict[str, Any]) -> Dict[str, Any]:
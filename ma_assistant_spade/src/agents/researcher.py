@@ -1,17 +1,22 @@
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, List
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour
+from spade.behaviour import CyclicBehaviour, PeriodicBehaviour
 from spade.message import Message
 from spade.template import Template
 
-from src.protocol import ResearchRequest, ResearchResult, make_metadata, ONTOLOGY
+from src.protocol import MessageCodec, ResearchRequest, ResearchResult, make_metadata, ONTOLOGY
 from src.tools.corpus_search import CorpusIndex
-from src.tools.llm import LLMClient, LLMConfig
+from src.tools.evidence import estimate_tokens, evidence_line, evidence_tokens, pack_evidence
+from src.tools.llm import CompletionCache, LLMClient, LLMConfig
 from src.tools.logging_utils import log_msg
+from src.tools.tracing import NULL_TRACER, Span, Tracer, mark_received
+from src.tools.transport import LocalBus, TransportAgent
 
 #Promptovi su Ai generirani uz pomoc Github Copilota
 
@@ -27,7 +32,7 @@ Pravila:
 """
 
 
-class ResearcherAgent(Agent):
+class ResearcherAgent(TransportAgent):
     def __init__(
         self,
         jid: str,
@@ -37,68 +42,287 @@ class ResearcherAgent(Agent):
         top_k: int,
         llm_model: str,
         logger,
+        index_dir: Optional[str] = None,
+        reload_interval: float = 5.0,
+        index_options: Optional[Dict[str, Any]] = None,
+        llm_cache: Optional[CompletionCache] = None,
+        index: Optional[CorpusIndex] = None,
+        search_workers: int = 2,
+        evidence_tokens: int = 500,
+        batch_window_ms: float = 5.0,
+        batch_max: int = 16,
+        max_concurrency: int = 32,
+        tracer: Optional[Tracer] = None,
+        llm_client: Optional[LLMClient] = None,
+        bus: Optional[LocalBus] = None,
+        codec: Optional[MessageCodec] = None,
     ):
-        super().__init__(jid, password)
+        super().__init__(jid, password, bus=bus)
         self.corpus_dir = corpus_dir
         self.top_k = top_k
         self.logger = logger
-        self.llm = LLMClient(LLMConfig(model=llm_model, max_output_tokens=600))
-        self.index = CorpusIndex(corpus_dir)
+        self.llm = llm_client or LLMClient(LLMConfig(model=llm_model, max_output_tokens=600), cache=llm_cache)
+        # Više Istraživača u istom procesu dijeli jedan indeks; gradi ga i osvježava samo vlasnik.
+        # index_options: retriever, stopwords, stemming, read_only, ... (vidi CorpusIndex)
+        self.owns_index = index is None
+        self.index = index or CorpusIndex(corpus_dir, index_dir=index_dir, **(index_options or {}))
+        self.reload_interval = reload_interval
+        # Pretraga (numpy/scipy) ide u radne dretve da event loop i XMPP promet ne čekaju
+        # (search_workers <= 0: zadani executor event loopa)
+        self.search_executor = (
+            ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search") if search_workers > 0 else None
+        )
+        # Tko je slao zahtjeve: njima se javlja nova generacija indeksa (poništavanje predmemorija)
+        self.subscribers: set[str] = set()
+        # Najviše tokena dokaza u odgovoru (i promptu za sažetak); <= 0 bez ograničenja
+        self.evidence_tokens = evidence_tokens
+        # Mikro-batch: zahtjevi pristigli unutar batch_window_ms boduju se zajedno (0 = jedan po jedan)
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.batch_max = max(1, batch_max)
+        self.stats: Dict[str, int] = {"batches": 0, "batched_requests": 0, "max_batch": 0}
+        # Sažeci teku u vlastitim zadacima (najviše max_concurrency), pa se za to vrijeme primaju novi zahtjevi
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests: Set[asyncio.Task] = set()
+        self.tracer = tracer or NULL_TRACER
+        # Kodiranje odgovora po oglasu Koordinatora; reference dokaza pokazuju u indeks ovog Istraživača
+        self.codec = codec or MessageCodec()
+        if self.codec.refs and self.codec.index is None:
+            self.codec.index = self.index
+
+    def dispatch(self, msg: Message):
+        mark_received(msg)
+        return super().dispatch(msg)
 
     async def setup(self):
-        self.index.build()
+        if self.owns_index:
+            try:
+                # Izgradnja (po potrebi u procesima, vidi build_workers) ne blokira event loop
+                await asyncio.get_running_loop().run_in_executor(None, self.index.build)
+            except FileNotFoundError as e:
+                # read_only: indeks gradi drugi proces; preuzima se čim se pojavi
+                self.logger.warning("index_missing %s", e)
+        self.logger.info(
+            "index_ready generation=%d chunks=%d retriever=%s build_workers=%d build_docs_per_s=%.1f "
+            "build_mb_per_s=%.2f dense_build_chunks_per_s=%.1f",
+            self.index.generation,
+            len(self.index.chunks),
+            self.index.retriever,
+            self.index.build_workers,
+            self.index.stats.get("build_docs_per_s", 0.0),
+            self.index.stats.get("build_mb_per_s", 0.0),
+            self.index.stats.get("dense_build_chunks_per_s", 0.0),
+        )
 
         template = Template()
         template.set_metadata("ontology", ONTOLOGY)
         template.set_metadata("role", "research")
 
         self.add_behaviour(_ResearchBehaviour(), template)
+        if self.reload_interval > 0:
+            self.add_behaviour(_CorpusWatchBehaviour(period=self.reload_interval))
+
+
+class _CorpusWatchBehaviour(PeriodicBehaviour):
+    """Prati korpus i u radnoj dretvi gradi novu generaciju indeksa; pretraga za to vrijeme radi na staroj.
+
+    Istraživač koji dijeli tuđi indeks samo primjećuje novu generaciju i javlja je svojim pošiljateljima.
+    """
+
+    async def on_start(self):
+        self._seen = self.agent.index.generation
+
+    async def run(self):
+        if self.agent.owns_index:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self.agent.index.reload)
+            except FileNotFoundError:
+                return
+            except Exception:  # noqa: BLE001
+                self.agent.logger.exception("Osvježavanje indeksa nije uspjelo; ostaje prethodna generacija")
+                return
+        changed = self.agent.index.generation != self._seen
+        self._seen = self.agent.index.generation
+        if changed:
+            for jid in sorted(self.agent.subscribers):
+                note = Message(to=jid)
+                note.metadata = make_metadata(
+                    "inform", "", {"role": "index_update", "index-generation": self.agent.index.generation}
+                )
+                await self.send(note)
+            st = self.agent.index.stats
+            self.agent.logger.info(
+                "index_reload generation=%d reload_s=%.3f chunks=%d reloads=%d",
+                st["generation"],
+                st["last_reload_s"],
+                len(self.agent.index.chunks),
+                st["reloads"],
+            )
 
 
 class _ResearchBehaviour(CyclicBehaviour):
+    """Serija se pretražuje zajedno, a sažetak svakog zahtjeva piše se u vlastitom zadatku
+    (do `max_concurrency`), pa spori poziv modela ne zadržava primanje sljedećih zahtjeva."""
+
+    async def on_start(self):
+        self._slots = asyncio.Semaphore(self.agent.max_concurrency)
+
     async def run(self):
+        # Sljedeću poruku uzimamo tek kad postoji slobodno mjesto; ostale čekaju u sandučiću
+        await self._slots.acquire()
         msg = await self.receive(timeout=1)
         if not msg:
+            self._slots.release()
             return
 
-        log_msg(self.agent.logger, "recv", str(msg.sender), str(self.agent.jid), dict(msg.metadata), msg.body or "")
+        # Pričekaj nekoliko ms na ostale zahtjeve pa ih boduj jednim rijetkim množenjem
+        batch = [msg]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.agent.batch_window
+        while len(batch) < self.agent.batch_max and not self._slots.locked() and (left := deadline - loop.time()) > 0:
+            nxt = await self.receive(timeout=left)
+            if nxt is None:
+                break
+            # Mjesto je slobodno (samo ovo ponašanje ih zauzima), pa acquire ne čeka
+            await self._slots.acquire()
+            batch.append(nxt)
+        requests = [self._parse(m) for m in batch]
+        tracer = self.agent.tracer
+        spans = [tracer.serve(m, "research.handle", batch_size=len(batch)) for m in batch]
+
+        t0 = time.perf_counter()
+        t0_ns = time.time_ns()
+        try:
+            generation, results = await loop.run_in_executor(self.agent.search_executor, self._search, requests)
+        except FileNotFoundError:
+            self.agent.logger.warning("search bez indeksa (read_only, generacija još nije izgrađena)")
+            generation, results = self.agent.index.generation, [[] for _ in requests]
+        search_ms = (time.perf_counter() - t0) * 1000
+        t1_ns = time.time_ns()
+        # Serija se boduje zajedno; svaki zahtjev dobiva isti span pretrage
+        for span, res in zip(spans, results):
+            tracer.record(
+                "search",
+                t0_ns,
+                t1_ns,
+                parent=span,
+                retriever=self.agent.index.retriever,
+                generation=generation,
+                hits=len(res),
+                batch_size=len(batch),
+            )
+
+        st = self.agent.stats
+        st["batches"] += 1
+        st["batched_requests"] += len(batch)
+        st["max_batch"] = max(st["max_batch"], len(batch))
+        if len(batch) > 1:
+            self.agent.logger.info(
+                "search_batch size=%d ms=%.2f avg_batch=%.2f query_cache_hit_rate=%.2f",
+                len(batch),
+                search_ms,
+                st["batched_requests"] / st["batches"],
+                self.agent.index.query_cache_hit_rate,
+            )
+        # Sažeci (LLM) zahtjeva serije teku istovremeno i neovisno o primanju; neuspjeh jednog ne ruši ostale
+        for m, req, res, span in zip(batch, requests, results, spans):
+            task = asyncio.create_task(self._answer(m, req, res, generation, search_ms, span))
+            self.agent.requests.add(task)
+            task.add_done_callback(functools.partial(self._finish, m))
+
+    def _finish(self, msg: Message, task: asyncio.Task) -> None:
+        self.agent.requests.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            self.agent.logger.error(
+                "research_failed conversation_id=%s err=%r",
+                msg.metadata.get("conversation-id", ""),
+                task.exception(),
+                exc_info=task.exception(),
+            )
+
+    async def on_end(self):
+        for task in list(self.agent.requests):
+            task.cancel()
 
-        # Parsiraj zahtjev
+    def _parse(self, msg: Message) -> ResearchRequest:
+        log_msg(self.agent.logger, "recv", str(msg.sender), str(self.agent.jid), dict(msg.metadata), msg.body or "")
+        self.agent.subscribers.add(str(msg.sender))
         try:
-            d = json.loads(msg.body or "{}")
-            req = ResearchRequest(query=str(d.get("query", "")), top_k=int(d.get("top_k", self.agent.top_k)))
+            d = self.agent.codec.decode(msg)
+            return ResearchRequest(query=str(d.get("query", "")), top_k=int(d.get("top_k", self.agent.top_k)))
         except Exception:  # noqa: BLE001
-            req = ResearchRequest(query=(msg.body or ""), top_k=self.agent.top_k)
-
-        results = self.agent.index.search(req.query, top_k=req.top_k)
-
-        evidence: List[Dict[str, Any]] = []
-        for chunk, score in results:
-            evidence.append(
-                {
-                    "doc_id": chunk.doc_id,
-                    "chunk_id": chunk.chunk_id,
-                    "score": round(score, 4),
-                    "text": chunk.text[:600],
-                }
+            return ResearchRequest(query=(msg.body or ""), top_k=self.agent.top_k)
+
+    def _search(self, requests: List[ResearchRequest]) -> Tuple[int, List[list]]:
+        """Radna dretva: (generacija, rezultati); jedan upit preko `search`, više njih preko
+        `search_batch` (s najvećim top_k pa rezanje).
+
+        Generacija je ona nad kojom je pretraga stvarno rađena: ako je indeks zamijenjen usred
+        pretrage, pretraga se ponavlja (generacije samo rastu, pa ista prije i poslije znači bez zamjene).
+        """
+        index = self.agent.index
+        while True:
+            generation = index.generation
+            if len(requests) == 1:
+                results = [index.search(requests[0].query, requests[0].top_k)]
+            else:
+                top_k = max(r.top_k for r in requests)
+                batch = index.search_batch([r.query for r in requests], top_k)
+                results = [res[: r.top_k] for r, res in zip(requests, batch)]
+            if index.generation == generation:
+                return generation, results
+
+    async def _answer(
+        self, msg: Message, req: ResearchRequest, results: list, generation: int, search_ms: float, span: Span
+    ) -> None:
+        """Sažetak i odgovor na jedan zahtjev serije; završava span obrade zahtjeva.
+
+        `generation` je generacija indeksa iz koje su dokazi; indeks se može zamijeniti dok model piše sažetak.
+        """
+        with span:
+            passages: List[Dict[str, Any]] = [
+                {"doc_id": chunk.doc_id, "chunk_id": chunk.chunk_id, "score": round(score, 4), "text": chunk.text}
+                for chunk, score in results
+            ]
+            # Cijele rečenice do proračuna tokena, bez ponovljenog preklapanja susjednih chunkova
+            evidence = pack_evidence(passages, req.query, self.agent.evidence_tokens)
+            self.agent.logger.info(
+                "search retriever=%s ms=%.2f hits=%d generation=%d evidence=%d evidence_tokens=%d",
+                self.agent.index.retriever,
+                search_ms,
+                len(results),
+                generation,
+                len(evidence),
+                evidence_tokens(evidence),
             )
 
-        # Zatraži od LLM-a sažetak temeljen na dokazima
-        evidence_block = "\n".join(
-            [f"- [{e['doc_id']}:{e['chunk_id']}] {e['text']}" for e in evidence]
-        )
-        user_prompt = (
-            f"Upit korisnika: {req.query}\n\n"
-            f"Dokazi (mini-korpus):\n{evidence_block}\n\n"
-            "Napiši sažetak (5-10 rečenica) koji odgovara na upit, koristeći samo dokaze."
-        )
-        summary = self.agent.llm.complete(RESEARCHER_SYSTEM_PROMPT, user_prompt).strip()
+            # Zatraži od LLM-a sažetak temeljen na dokazima
+            evidence_block = "\n".join(evidence_line(e) for e in evidence)
+            user_prompt = (
+                f"Upit korisnika: {req.query}\n\n"
+                f"Dokazi (mini-korpus):\n{evidence_block}\n\n"
+                "Napiši sažetak (5-10 rečenica) koji odgovara na upit, koristeći samo dokaze."
+            )
+            with self.agent.tracer.span(
+                "summary",
+                input_tokens=estimate_tokens(RESEARCHER_SYSTEM_PROMPT + user_prompt),
+                evidence_tokens=evidence_tokens(evidence),
+            ) as llm_span:
+                summary = (await self.agent.llm.acomplete(RESEARCHER_SYSTEM_PROMPT, user_prompt)).strip()
+                llm_span.set(output_tokens=estimate_tokens(summary))
 
-        out = ResearchResult(evidence=evidence, summary=summary)
+            out = ResearchResult(evidence=evidence, summary=summary)
 
-        reply = Message(to=str(msg.sender))
-        reply.metadata = make_metadata("inform", msg.metadata.get("conversation-id", ""), {"role": "research_result"})
-        reply.body = out.to_json()
+            reply = Message(to=str(msg.sender))
+            body, encoding = self.agent.codec.encode(out.to_payload(), str(msg.sender))
+            reply.metadata = make_metadata(
+                "inform",
+                msg.metadata.get("conversation-id", ""),
+                {"role": "research_result", "index-generation": generation, **encoding},
+                span.span_id,
+            )
+            reply.body = body
 
-        await self.send(reply)
-        log_msg(self.agent.logger, "send", str(self.agent.jid), str(msg.sender), dict(reply.metadata), reply.body)
+            await self.send(reply)
+            log_msg(self.agent.logger, "send", str(self.agent.jid), str(msg.sender), dict(reply.metadata), reply.body)
@@ -1,16 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
 from spade.message import Message
 from spade.template import Template
 
-from src.protocol import VerifyRequest, VerifyResult, make_metadata, ONTOLOGY
-from src.tools.llm import LLMClient, LLMConfig
+from src.protocol import (
+    MessageCodec,
+    VerifyRequest,
+    VerifyResult,
+    as_int,
+    make_metadata,
+    unresolved_evidence,
+    ONTOLOGY,
+)
+from src.tools.claims import citations, has_words, split_sentences, strip_citations
+from src.tools.evidence import estimate_tokens, evidence_line, pack_evidence
+from src.tools.llm import CompletionCache, LLMClient, LLMConfig
 from src.tools.logging_utils import log_msg
+from src.tools.ranking import Analyzer
+from src.tools.tracing import NULL_TRACER, Span, Tracer, mark_received
+from src.tools.transport import LocalBus, TransportAgent
 
 
 VERIFIER_SYSTEM_PROMPT = """Ti si Provjeravatelj (verifier) u višeagentnom razgovornom asistentu.
@@ -29,7 +43,7 @@ Upute:
 """
 
 
-class VerifierAgent(Agent):
+class VerifierAgent(TransportAgent):
     def __init__(
         self,
         jid: str,
@@ -37,10 +51,34 @@ class VerifierAgent(Agent):
         *,
         llm_model: str,
         logger,
+        llm_cache: Optional[CompletionCache] = None,
+        fast_path: bool = True,
+        pass_overlap: float = 0.8,
+        evidence_tokens: int = 500,
+        tracer: Optional[Tracer] = None,
+        llm_client: Optional[LLMClient] = None,
+        bus: Optional[LocalBus] = None,
+        codec: Optional[MessageCodec] = None,
+        max_concurrency: int = 8,
     ):
-        super().__init__(jid, password)
+        super().__init__(jid, password, bus=bus)
         self.logger = logger
-        self.llm = LLMClient(LLMConfig(model=llm_model, max_output_tokens=700))
+        self.llm = llm_client or LLMClient(LLMConfig(model=llm_model, max_output_tokens=700), cache=llm_cache)
+        # Lokalna provjera citata prije LLM-a; model dobiva samo nejasne slučajeve
+        self.fast_path = fast_path
+        self.pass_overlap = pass_overlap
+        self.stats: Dict[str, int] = {"fast_pass": 0, "fast_fail": 0, "escalated": 0, "unresolved": 0}
+        self.evidence_tokens = evidence_tokens
+        self.tracer = tracer or NULL_TRACER
+        # Kodiranje poruka; uz `codec.index` dokazi mogu stizati kao reference u zajednički indeks
+        self.codec = codec or MessageCodec()
+        # Zahtjevi (npr. tvrdnje spekulativne provjere) obrađuju se istovremeno, najviše ovoliko
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests: Set[asyncio.Task] = set()
+
+    def dispatch(self, msg: Message):
+        mark_received(msg)
+        return super().dispatch(msg)
 
     async def setup(self):
         template = Template()
@@ -50,23 +88,79 @@ class VerifierAgent(Agent):
 
 
 class _VerifyBehaviour(CyclicBehaviour): #Github copilott otklonio probleme potvrdivanja
+    """Svaki zahtjev u vlastitom zadatku (do `max_concurrency`), pa spori poziv modela ne zadržava ostale."""
+
+    async def on_start(self):
+        self._slots = asyncio.Semaphore(self.agent.max_concurrency)
+
     async def run(self):
+        # Sljedeću poruku uzimamo tek kad postoji slobodno mjesto; ostale čekaju u sandučiću
+        await self._slots.acquire()
         msg = await self.receive(timeout=1)
         if not msg:
+            self._slots.release()
             return
 
         log_msg(self.agent.logger, "recv", str(msg.sender), str(self.agent.jid), dict(msg.metadata), msg.body or "")
+        task = asyncio.create_task(self._serve(msg))
+        self.agent.requests.add(task)
+        task.add_done_callback(self._finish)
+
+    def _finish(self, task: asyncio.Task) -> None:
+        self.agent.requests.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            self.agent.logger.error("verify_failed err=%r", task.exception(), exc_info=task.exception())
+
+    async def on_end(self):
+        for task in list(self.agent.requests):
+            task.cancel()
+
+    async def _serve(self, msg: Message) -> None:
+        with self.agent.tracer.serve(msg, "verify.handle", claim_id=msg.metadata.get("claim-id")) as span:
+            await self._handle(msg, span)
 
+    async def _handle(self, msg: Message, span: Span) -> None:
         # Parsiraj zahtjev
         try:
-            d = json.loads(msg.body or "{}")
+            d = await self.agent.codec.adecode(msg)
             req = VerifyRequest(draft_answer=str(d.get("draft_answer", "")), evidence=list(d.get("evidence", [])))
         except Exception:  # noqa: BLE001
             req = VerifyRequest(draft_answer=(msg.body or ""), evidence=[])
 
-        evidence_block = "\n".join(
-            [f"- [{e.get('doc_id')}:{e.get('chunk_id')}] {str(e.get('text',''))[:600]}" for e in req.evidence]
-        )
+        missing = unresolved_evidence(req.evidence)
+        if missing:
+            # Provjera s manje dokaza nego što je nacrt citirao nije provjera: javi to izričito
+            self.agent.stats["unresolved"] += 1
+            span.set(unresolved_evidence=len(missing))
+            refs = ", ".join(f"[{e['doc_id']}:{e['chunk_id']}] (generacija {e['generation']})" for e in missing)
+            out = VerifyResult(
+                verdict="WARN",
+                issues=[f"Dokazi {refs} nisu dostupni u indeksu Provjeravatelja; nacrt nije provjeren."],
+                suggested_fixes=["Ponovi pitanje kad svi agenti učitaju istu generaciju indeksa."],
+            )
+            await self._reply(msg, out, span)
+            return
+
+        if self.agent.fast_path:
+            fast = precheck(
+                req.draft_answer, req.evidence, self.agent.pass_overlap, claim=bool(msg.metadata.get("claim-id"))
+            )
+            if fast is not None:
+                self.agent.stats["fast_pass" if fast.verdict == "PASS" else "fast_fail"] += 1
+            else:
+                self.agent.stats["escalated"] += 1
+            self.agent.logger.info(
+                "verify fast_path=%s stats=%s", fast.verdict if fast else "escalate", self.agent.stats
+            )
+            span.set(fast_path=fast.verdict if fast else "escalate")
+            if fast is not None:
+                await self._reply(msg, fast, span)
+                return
+
+        # Dokazi su obično već spakirani (Istraživač); ovo samo čuva proračun za tuđe/veće zahtjeve
+        evidence = pack_evidence(req.evidence, req.draft_answer, self.agent.evidence_tokens)
+        evidence_block = "\n".join(evidence_line(e) for e in evidence)
 
         user_prompt = (
             "NACRT ODGOVORA:\n"
@@ -76,7 +170,11 @@ class _VerifyBehaviour(CyclicBehaviour): #Github copilott otklonio probleme potv
             "Vrati rezultat kao JSON objekt s ključevima: verdict, issues, suggested_fixes."
         )
 
-        raw = self.agent.llm.complete(VERIFIER_SYSTEM_PROMPT, user_prompt).strip()
+        with self.agent.tracer.span(
+            "verify.llm", input_tokens=estimate_tokens(VERIFIER_SYSTEM_PROMPT + user_prompt)
+        ) as llm_span:
+            raw = (await self.agent.llm.acomplete(VERIFIER_SYSTEM_PROMPT, user_prompt)).strip()
+            llm_span.set(output_tokens=estimate_tokens(raw))
 
         # Pokušaj parsirati JSON iz izlaza modela; inače WARN
         verdict = "WARN"
@@ -91,16 +189,95 @@ class _VerifyBehaviour(CyclicBehaviour): #Github copilott otklonio probleme potv
             issues = ["Nije moguće parsirati JSON iz provjere; pogledaj 'raw' u logu."]
             fixes = ["U promptu zatraži striktan JSON output."]
 
-        out = VerifyResult(verdict=verdict, issues=issues, suggested_fixes=fixes)
+        await self._reply(msg, VerifyResult(verdict=verdict, issues=issues, suggested_fixes=fixes), span)
 
+    async def _reply(self, msg: Message, out: VerifyResult, span: Span) -> None:
         reply = Message(to=str(msg.sender))
-        reply.metadata = make_metadata("inform", msg.metadata.get("conversation-id", ""), {"role": "verify_result"})
-        reply.body = out.to_json()
+        extra = {"role": "verify_result"}
+        if msg.metadata.get("claim-id"):
+            # Provjera pojedine tvrdnje - Koordinator čeka više odgovora u istom razgovoru
+            extra["claim-id"] = msg.metadata["claim-id"]
+        body, encoding = self.agent.codec.encode(out.to_payload(), str(msg.sender))
+        reply.metadata = make_metadata(
+            "inform", msg.metadata.get("conversation-id", ""), {**extra, **encoding}, span.span_id
+        )
+        span.set(verdict=out.verdict)
+        reply.body = body
 
         await self.send(reply)
         log_msg(self.agent.logger, "send", str(self.agent.jid), str(msg.sender), dict(reply.metadata), reply.body)
 
 
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+_THOUSANDS_RE = re.compile(r"(?<=\d)[ .](?=\d{3}\b)")
+_ANALYZER = Analyzer(stopwords=True, stemming=True)
+
+
+def _terms(text: str) -> Tuple[Set[str], Set[Tuple[str, str]], Set[str]]:
+    """(riječi, susjedni parovi riječi, brojevi) teksta bez citata, za usporedbu s dokazom."""
+    text = strip_citations(text)
+    tokens = [t for t in _ANALYZER(text) if not t.isdigit()]
+    numbers = set(_NUMBER_RE.findall(_THOUSANDS_RE.sub("", text)))
+    return set(tokens), set(zip(tokens, tokens[1:])), numbers
+
+
+def _supported(sentence: str, source: Tuple[Set[str], Set[Tuple[str, str]], Set[str]], pass_overlap: float) -> bool:
+    words, bigrams, numbers = _terms(sentence)
+    src_words, src_bigrams, src_numbers = source
+    if not words:
+        return not (numbers - src_numbers)
+    word_cov = len(words & src_words) / len(words)
+    bigram_cov = len(bigrams & src_bigrams) / len(bigrams) if bigrams else 1.0
+    return word_cov >= pass_overlap and bigram_cov >= pass_overlap / 2 and not (numbers - src_numbers)
+
+
+def precheck(
+    draft: str, evidence: List[dict], pass_overlap: float = 0.8, claim: bool = False
+) -> Optional[VerifyResult]:
+    """Deterministička provjera citata [DOC:CHUNK]; None znači da odlučuje model.
+
+    FAIL: nacrt ne citira ništa ili citira chunk kojeg nema među dokazima.
+    PASS: svaka rečenica sa sadržajem dovoljno se (riječi, parovi riječi, svi brojevi)
+    preklapa s chunkovima koje citira - ili, bez citata, sa svim dokazima.
+    Pojedinačna tvrdnja (`claim`, spekulativni način) smije biti bez citata - sažetak ili
+    veznu rečenicu ocjenjuje se kao rečenicu u cijelom nacrtu, a ne odbacuje odmah.
+    """
+    if not has_words(draft):
+        return None
+    cited = citations(draft)
+    if not cited and not claim:
+        if not evidence:
+            return None  # nema se što citirati - npr. odgovor da podataka nema
+        return VerifyResult(
+            verdict="FAIL",
+            issues=["Nacrt ne citira nijedan dokaz [DOC:CHUNK]."],
+            suggested_fixes=["Uz svaku tvrdnju dodaj citat dokaza na kojem se temelji ili je ukloni."],
+        )
+
+    by_key = {(str(e.get("doc_id")), as_int(e.get("chunk_id"))): str(e.get("text", "")) for e in evidence}
+    unknown = [f"[{d}:{c}]" for d, c in cited if (d, c) not in by_key]
+    if unknown:
+        return VerifyResult(
+            verdict="FAIL",
+            issues=[f"Citat {u} ne postoji među dokazima." for u in unknown],
+            suggested_fixes=["Citiraj samo dostavljene dokaze; tvrdnje bez dokaza ukloni."],
+        )
+
+    sources = {key: _terms(text) for key, text in by_key.items()}
+    everything = tuple(set().union(*parts) for parts in zip(*sources.values())) if sources else (set(), set(), set())
+    for sentence in split_sentences(draft):
+        if not has_words(sentence):
+            continue
+        keys = citations(sentence)
+        if keys:
+            source = tuple(set().union(*parts) for parts in zip(*(sources[k] for k in keys)))
+        else:
+            source = everything
+        if not _supported(sentence, source, pass_overlap):
+            return None
+    return VerifyResult(verdict="PASS", issues=[], suggested_fixes=[])
+
+
 def _extract_json(text: str) -> str:
     """Izdvoji prvi JSON objekt iz stringa."""
     start = text.find("{")
@@ -0,0 +1,108 @@
+"""Propusnost izgradnje CorpusIndexa (dokumenti/s, MB/s) za različit broj procesa.
+
+    python -m src.bench.build_throughput --docs 400 --doc-kb 64 --workers 1 2 4 8
+
+Bez `--corpus` generira se sintetski korpus (pseudo-hrvatske riječi) u privremenoj mapi.
+Svako mjerenje je potpuna izgradnja (`build(force=True)`) u novi `index_dir`; `warm_s` je
+ponovljena potpuna izgradnja s već pokrenutim procesima (bez troška pokretanja poola).
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.tools.corpus_search import CorpusIndex
+
+_SYLLABLES = "ba be bi bo bu ca če ći da de di do du ga go gra ja je ka ko kra la le li lo lu ma me mi mo na ne ni no " \
+    "nja pa pe pi po pra ra re ri ro ru sa se si so sta ša še ta te ti to tu va ve vi vo za ze zi žu"
+
+
+def make_corpus(path: Path, docs: int, doc_kb: int, vocab_size: int = 20_000, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    syllables = _SYLLABLES.split()
+    vocab = ["".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(vocab_size)))  # Zipfova razdioba
+    path.mkdir(parents=True, exist_ok=True)
+    for d in range(docs):
+        words: List[str] = []
+        size = 0
+        while size < doc_kb * 1024:
+            sentence = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(6, 18))
+            words.append(" ".join(sentence).capitalize() + ".")
+            size += len(words[-1]) + 1
+        (path / f"doc_{d:05d}.txt").write_text(" ".join(words), encoding="utf-8")
+
+
+def measure(corpus: Path, workers: int, **index_options) -> Dict[str, float]:
+    index_dir = Path(tempfile.mkdtemp(prefix="bench-index-"))
+    try:
+        index = CorpusIndex(str(corpus), index_dir=str(index_dir), build_workers=workers, **index_options)
+        t0 = time.perf_counter()
+        index.build(force=True)
+        total_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        index.build(force=True)
+        warm_s = time.perf_counter() - t0
+        index.close()
+        files = list(corpus.glob("*.txt"))
+        mb = sum(f.stat().st_size for f in files) / 1e6
+        return {
+            "workers": workers,
+            "docs": len(files),
+            "mb": round(mb, 2),
+            "chunks": len(index.chunks),
+            "total_s": round(total_s, 3),
+            "docs_per_s": round(len(files) / total_s, 1),
+            "mb_per_s": round(mb / total_s, 2),
+            "warm_s": round(warm_s, 3),
+            "warm_mb_per_s": round(mb / warm_s, 2),
+            "analyze_docs_per_s": round(index.stats.get("build_docs_per_s", 0.0), 1),
+            "analyze_mb_per_s": round(index.stats.get("build_mb_per_s", 0.0), 2),
+        }
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", help="postojeća mapa s .txt datotekama (inače sintetski korpus)")
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--doc-kb", type=int, default=64)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--retriever", default="bm25")
+    ap.add_argument("--json", help="spremi rezultate i u JSON datoteku")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.corpus:
+        corpus = Path(args.corpus)
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="bench-corpus-"))
+        corpus = tmp / "corpus"
+        make_corpus(corpus, args.docs, args.doc_kb)
+    try:
+        results = [measure(corpus, w, retriever=args.retriever) for w in args.workers]
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{'workers':>7} {'docs':>6} {'MB':>8} {'total_s':>8} {'docs/s':>8} {'MB/s':>7} {'warm_s':>7} {'warm MB/s':>9}")
+    for r in results:
+        print(
+            f"{r['workers']:>7} {r['docs']:>6} {r['mb']:>8} {r['total_s']:>8} {r['docs_per_s']:>8} "
+            f"{r['mb_per_s']:>7} {r['warm_s']:>7} {r['warm_mb_per_s']:>9}"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
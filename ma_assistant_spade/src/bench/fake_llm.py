@@ -0,0 +1,209 @@
+"""Deterministički lažni model za mjerenja bez OpenAI ključa.
+
+Isti prompt uvijek daje isti tekst i isto kašnjenje (slučajnost je sjemenjena sažetkom
+prompta). Kašnjenje = vrijeme do prvog tokena (lognormalno oko `ttft_ms`) + izlazni tokeni
+brzinom `tokens_per_s`; broj izlaznih tokena je normalno raspodijeljen oko `output_tokens`.
+Odgovori imaju oblik koji agenti očekuju: plan i presuda kao JSON, sažetak i nacrt od
+rečenica dokaza iz prompta s citatima [DOC:CHUNK] (uz `unsupported` vjerojatnost dodaje se
+rečenica bez dokaza, pa Provjeravatelj ponekad ide modelu, a Koordinator ispravlja).
+Lažan je samo OpenAI klijent (`FakeOpenAI`, `FakeAsyncOpenAI`); `FakeLLMClient` se gradi
+pravim konstruktorom `LLMClient` i mjeri se pravi kod (`acomplete`, `astream`, retry, timeout).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.agents.coordinator import (
+    COORDINATOR_CLAIM_REVISION_PROMPT,
+    COORDINATOR_PLAN_PROMPT,
+    COORDINATOR_REVISION_PROMPT,
+)
+from src.agents.verifier import VERIFIER_SYSTEM_PROMPT
+from src.tools.claims import CITATION_RE, split_sentences
+from src.tools.evidence import CHARS_PER_TOKEN
+from src.tools.llm import CompletionCache, LLMClient, LLMConfig
+
+_EVIDENCE_RE = re.compile(r"^- \[([^\[\]:\s]+):(\d+)\] (.*)$", re.MULTILINE)
+_UNSUPPORTED = [
+    "Prema nekim izvorima grad je imao i vlastitu zračnu luku još 1850. godine.",
+    "Broj stanovnika udvostručio se u posljednjih pet godina.",
+    "Ovo je najposjećenije odredište u cijeloj Europi.",
+]
+
+
+@dataclass
+class FakeLLMProfile:
+    ttft_ms: float = 200.0
+    ttft_sigma: float = 0.4  # lognormalni raspon vremena do prvog tokena
+    tokens_per_s: float = 200.0
+    output_tokens: int = 120
+    output_tokens_std: float = 30.0
+    unsupported: float = 0.2  # vjerojatnost rečenice bez dokaza u nacrtu
+    fail_verdict: float = 0.3  # vjerojatnost WARN presude kad Provjeravatelj pita model
+    time_scale: float = 1.0  # < 1 ubrzava sva kašnjenja
+
+
+class FakeLLMClient(LLMClient):
+    """Pravi `LLMClient` (retry, predmemorija, timeout, stream) nad lažnim OpenAI klijentom bez mreže."""
+
+    def __init__(
+        self,
+        profile: Optional[FakeLLMProfile] = None,
+        seed: int = 0,
+        config: Optional[LLMConfig] = None,
+        cache: Optional[CompletionCache] = None,
+    ):
+        self.model = FakeModel(profile, seed)
+        super().__init__(
+            config or LLMConfig(model="fake"),
+            client=FakeOpenAI(self.model),
+            async_client=FakeAsyncOpenAI(self.model),
+            cache=cache,
+        )
+
+    @property
+    def profile(self) -> FakeLLMProfile:
+        return self.model.profile
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self.model.stats
+
+
+class FakeOpenAI:
+    """Umjesto `OpenAI`: `responses.create` odmah vraća odgovor (sinkroni `complete`)."""
+
+    def __init__(self, model: "FakeModel"):
+        self.responses = _Responses(model)
+
+
+class FakeAsyncOpenAI:
+    """Umjesto `AsyncOpenAI`: odgovor nakon kašnjenja modela, uz `stream=True` događaji `response.output_text.delta`."""
+
+    def __init__(self, model: "FakeModel"):
+        self.responses = _AsyncResponses(model)
+
+
+@dataclass
+class _Response:
+    output_text: str
+
+
+@dataclass
+class _Delta:
+    delta: str
+    type: str = "response.output_text.delta"
+
+
+class _Responses:
+    def __init__(self, model: "FakeModel"):
+        self.model = model
+
+    def create(self, **request: Any) -> _Response:
+        return _Response(self.model.generate(request)[0])
+
+
+class _AsyncResponses(_Responses):
+    async def create(self, stream: bool = False, **request: Any) -> Any:  # type: ignore[override]
+        text, ttft_s, total_s = self.model.generate(request)
+        if stream:
+            return _stream(text, ttft_s, total_s)
+        await asyncio.sleep(total_s)
+        return _Response(text)
+
+
+async def _stream(text: str, ttft_s: float, total_s: float) -> AsyncIterator[_Delta]:
+    await asyncio.sleep(ttft_s)
+    step = max(1, int(4 * CHARS_PER_TOKEN))  # dijelovi od ~4 tokena
+    pause = (total_s - ttft_s) * step / max(1, len(text))
+    for i in range(0, len(text), step):
+        if i:
+            await asyncio.sleep(pause)
+        yield _Delta(text[i : i + step])
+
+
+class FakeModel:
+    """Tekst i kašnjenje odgovora iz profila; deterministički za isti `seed` i prompt."""
+
+    def __init__(self, profile: Optional[FakeLLMProfile] = None, seed: int = 0):
+        self.profile = profile or FakeLLMProfile()
+        self.seed = seed
+        self.stats: Dict[str, int] = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def generate(self, request: Dict[str, Any]) -> Tuple[str, float, float]:
+        """Zahtjev kao za Responses API (`input` s porukama system/user, `max_output_tokens`)."""
+        messages = {m["role"]: m["content"] for m in request["input"]}
+        return self._generate(messages.get("system", ""), messages.get("user", ""), request["max_output_tokens"])
+
+    def _generate(self, system_prompt: str, user_prompt: str, max_tokens: int) -> Tuple[str, float, float]:
+        """(tekst, vrijeme do prvog tokena, ukupno vrijeme) u sekundama."""
+        digest = hashlib.sha1(f"{self.seed}\x00{system_prompt}\x00{user_prompt}".encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+        p = self.profile
+        tokens = max(8, min(max_tokens, int(rng.gauss(p.output_tokens, p.output_tokens_std))))
+        text = self._text(system_prompt, user_prompt, tokens, rng)
+        out_tokens = max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+        ttft_s = p.ttft_ms / 1000 * math.exp(rng.gauss(0.0, p.ttft_sigma)) * p.time_scale
+        total_s = ttft_s + out_tokens / p.tokens_per_s * p.time_scale
+        self.stats["calls"] += 1
+        self.stats["input_tokens"] += math.ceil((len(system_prompt) + len(user_prompt)) / CHARS_PER_TOKEN)
+        self.stats["output_tokens"] += out_tokens
+        return text, ttft_s, total_s
+
+    def _text(self, system_prompt: str, user_prompt: str, tokens: int, rng: random.Random) -> str:
+        if system_prompt == COORDINATOR_PLAN_PROMPT:
+            query = user_prompt.rsplit("Novi upit:", 1)[-1].strip()
+            return json.dumps({"research_query": query, "subtasks": [query], "notes": ""}, ensure_ascii=False)
+        if system_prompt == VERIFIER_SYSTEM_PROMPT:
+            warn = rng.random() < self.profile.fail_verdict
+            return json.dumps(
+                {
+                    "verdict": "WARN" if warn else "PASS",
+                    "issues": ["Tvrdnja nije potkrijepljena dokazima."] if warn else [],
+                    "suggested_fixes": ["Ukloni tvrdnju bez dokaza."] if warn else [],
+                },
+                ensure_ascii=False,
+            )
+        if system_prompt == COORDINATOR_REVISION_PROMPT:
+            # Ispravak zadržava citirane rečenice nacrta
+            draft = user_prompt.split("NACRT:", 1)[-1].split("PROVJERA", 1)[0]
+            kept = [s.strip() for s in split_sentences(draft) if CITATION_RE.search(s)]
+            return " ".join(kept) or "Dokazi ne potvrđuju odgovor."
+        evidence = _evidence(user_prompt)
+        if system_prompt == COORDINATOR_CLAIM_REVISION_PROMPT:
+            return _cited(evidence[:1], tokens, rng) or "Dokazi ne potvrđuju ovu tvrdnju."
+        # Sažetak Istraživača i nacrt: rečenice dokaza s citatima
+        text = _cited(evidence, tokens, rng)
+        if not text:
+            return "Dostavljeni dokazi ne pokrivaju upit."
+        if rng.random() < self.profile.unsupported:
+            text += " " + rng.choice(_UNSUPPORTED)
+        return text
+
+
+def _evidence(prompt: str) -> List[Tuple[str, str, str]]:
+    return _EVIDENCE_RE.findall(prompt)
+
+
+def _cited(evidence: List[Tuple[str, str, str]], tokens: int, rng: random.Random) -> str:
+    """Do `tokens` tokena rečenica iz dokaza, svaka s citatom svog chunka."""
+    budget = tokens * CHARS_PER_TOKEN
+    out: List[str] = []
+    for doc_id, chunk_id, text in evidence:
+        sentences = [s.strip() for s in split_sentences(text) if len(s.strip()) > 20]
+        if not sentences:
+            continue
+        sentence = sentences[rng.randrange(min(3, len(sentences)))]
+        line = f"{sentence} [{doc_id}:{chunk_id}]"
+        if out and len(" ".join(out)) + len(line) > budget:
+            break
+        out.append(line)
+    return " ".join(out)
@@ -0,0 +1,247 @@
+"""Izgradnja i pretraga CorpusIndexa na sintetskim korpusima od 10³ do 10⁶ chunkova.
+
+    python -m src.bench.index_scale --chunks 1000 10000 100000 --retrievers bm25 tfidf dense
+    python -m src.bench.index_scale --chunk-chars 600 900 --overlap 0 150 --json after.json --compare before.json
+
+Za svaki broj chunkova generira se korpus (kao build_throughput, pseudo-hrvatske riječi sa
+Zipfovom razdiobom) dovoljne veličine uz zadani `chunk_chars`/`overlap`, pa se za svaku
+kombinaciju retrievera i chunkanja mjeri u zasebnom procesu (čisti RSS): vrijeme izgradnje,
+veličina indeksa na disku, najveći RSS, te kašnjenje pojedinačnog upita i upita u seriji
+(`search_batch`, po upitu). Predmemorija upita je isključena. Rezultati idu u JSON
+(`--json`), a uz `--compare` tablica pokazuje i promjenu u odnosu na raniji JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import queue
+import random
+import re
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.bench.build_throughput import make_corpus
+from src.tools.tracing import percentile
+
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+# Stupci tablice (ključ, naslov); za sve je manje bolje
+_COLUMNS = [
+    ("build_s", "build_s"),
+    ("index_mb", "index_MB"),
+    ("peak_rss_mb", "rss_MB"),
+    ("single_p50_ms", "q_p50"),
+    ("single_p95_ms", "q_p95"),
+    ("batch_ms_per_query", "batch/q"),
+]
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+def _dir_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6
+
+
+def make_queries(corpus: Path, n: int, seed: int = 0) -> List[str]:
+    """Upiti od 1-4 riječi iz korpusa (češće riječi češće, kao u stvarnim upitima)."""
+    rng = random.Random(seed)
+    words: List[str] = []
+    for path in sorted(corpus.glob("*.txt"))[:4]:
+        words.extend(_WORD_RE.findall(path.read_text(encoding="utf-8")[:200_000]))
+    return [" ".join(rng.choices(words, k=rng.randint(1, 4))) for _ in range(n)]
+
+
+def _measure(corpus: str, options: Dict, queries: List[str], batch_size: int, top_k: int, out) -> None:
+    """Radni proces: izgradnja + upiti; rezultat ide u `out` (multiprocessing.Queue)."""
+    from src.tools.corpus_search import CorpusIndex
+
+    index_dir = Path(tempfile.mkdtemp(prefix="bench-index-"))
+    try:
+        rss_start = _peak_rss_mb()
+        index = CorpusIndex(corpus, index_dir=str(index_dir), query_cache_size=0, **options)
+        t0 = time.perf_counter()
+        index.build(force=True)
+        build_s = time.perf_counter() - t0
+        rss_build = _peak_rss_mb()
+
+        index.search(queries[0], top_k)  # prvo mapiranje stupaca ne ulazi u mjerenje
+        single: List[float] = []
+        for q in queries:
+            t0 = time.perf_counter()
+            index.search(q, top_k)
+            single.append((time.perf_counter() - t0) * 1000)
+        batch: List[float] = []
+        for i in range(0, len(queries), batch_size):
+            part = queries[i : i + batch_size]
+            t0 = time.perf_counter()
+            index.search_batch(part, top_k)
+            batch.append((time.perf_counter() - t0) * 1000 / len(part))
+
+        out.put(
+            {
+                "chunks": len(index.chunks),
+                "build_s": round(build_s, 3),
+                "chunks_per_s": round(len(index.chunks) / build_s, 1),
+                "index_mb": round(_dir_mb(index_dir), 2),
+                "start_rss_mb": round(rss_start, 1),
+                "build_rss_mb": round(rss_build, 1),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+                "single_p50_ms": round(percentile(single, 50), 3),
+                "single_p95_ms": round(percentile(single, 95), 3),
+                "single_p99_ms": round(percentile(single, 99), 3),
+                "batch_ms_per_query": round(sum(batch) / len(batch), 3),
+            }
+        )
+        index.close()
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+def measure(corpus: Path, options: Dict, queries: List[str], batch_size: int = 32, top_k: int = 5) -> Dict:
+    """Jedno mjerenje u novom procesu (spawn), da najveći RSS pripada samo toj izgradnji."""
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(str(corpus), options, queries, batch_size, top_k, out))
+    proc.start()
+    try:
+        while True:
+            try:
+                return out.get(timeout=1)
+            except queue.Empty:
+                if not proc.is_alive():
+                    raise RuntimeError(f"Mjerenje {options} nije uspjelo (izlazni kod {proc.exitcode})") from None
+    finally:
+        proc.join()
+
+
+def corpus_for(root: Path, chunks: int, chunk_chars: int, overlap: int, doc_kb: int) -> Tuple[Path, int]:
+    """Korpus s približno `chunks` chunkova (svaki chunk pomiče tekst za chunk_chars - overlap)."""
+    stride = max(1, chunk_chars - overlap)
+    docs = max(1, math.ceil(chunks * stride / (doc_kb * 1024)))
+    path = root / f"corpus-{docs}x{doc_kb}kb"
+    if not path.exists():
+        make_corpus(path, docs, doc_kb)
+    return path, docs
+
+
+def compare_rows(results: List[Dict], previous: List[Dict]) -> Dict[Tuple, Dict]:
+    prev = {_key(r): r for r in previous}
+    return {_key(r): prev[_key(r)] for r in results if _key(r) in prev}
+
+
+def format_table(results: List[Dict], previous: Optional[List[Dict]] = None) -> str:
+    before = compare_rows(results, previous or [])
+    head = f"{'target':>8} {'chunks':>8} {'retriever':>9} {'chunking':>14}"
+    head += "".join(f" {title:>10}" + (f" {'Δ%':>6}" if before else "") for _, title in _COLUMNS)
+    lines = [head]
+    for r in results:
+        line = (
+            f"{r['target_chunks']:>8} {r['chunks']:>8} {r['retriever']:>9} "
+            f"{r['chunking'] + '/' + str(r['chunk_chars']) + '/' + str(r['overlap']):>14}"
+        )
+        old = before.get(_key(r))
+        for key, _ in _COLUMNS:
+            line += f" {r[key]:>10}"
+            if before:
+                line += f" {_delta(r[key], old[key]) if old else '':>6}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def regressions(results: List[Dict], previous: List[Dict], tolerance: float) -> List[str]:
+    """Stupci koji su u odnosu na `previous` lošiji za više od `tolerance` (udio)."""
+    out: List[str] = []
+    before = compare_rows(results, previous)
+    for r in results:
+        old = before.get(_key(r))
+        if old is None:
+            continue
+        for key, _ in _COLUMNS:
+            if old[key] > 0 and r[key] > old[key] * (1 + tolerance):
+                out.append(f"{_label(r)} {key}: {old[key]} -> {r[key]}")
+    return out
+
+
+def _key(r: Dict) -> Tuple:
+    return (r["target_chunks"], r["retriever"], r["chunking"], r["chunk_chars"], r["overlap"])
+
+
+def _label(r: Dict) -> str:
+    return f"{r['target_chunks']}/{r['retriever']}/{r['chunking']}/{r['chunk_chars']}/{r['overlap']}"
+
+
+def _delta(now: float, old: float) -> str:
+    return f"{(now - old) / old * 100:+.0f}" if old else ""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="ciljani broj chunkova")
+    ap.add_argument("--retrievers", nargs="+", default=["bm25", "tfidf", "hybrid", "dense"])
+    ap.add_argument("--chunking", nargs="+", default=["sentence"], choices=["sentence", "fixed"])
+    ap.add_argument("--chunk-chars", type=int, nargs="+", default=[900])
+    ap.add_argument("--overlap", type=int, nargs="+", default=[150])
+    ap.add_argument("--doc-kb", type=int, default=64)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--build-workers", type=int, default=1)
+    ap.add_argument("--json", help="spremi rezultate u JSON datoteku")
+    ap.add_argument("--compare", help="raniji JSON za usporedbu (stupci Δ%%)")
+    ap.add_argument("--tolerance", type=float, help="uz --compare: izlazni kod 1 ako je nešto lošije za više od ovog udjela")
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench-scale-"))
+    results: List[Dict] = []
+    try:
+        for target, chunk_chars, overlap in itertools.product(args.chunks, args.chunk_chars, args.overlap):
+            corpus, docs = corpus_for(root, target, chunk_chars, overlap, args.doc_kb)
+            queries = make_queries(corpus, args.queries)
+            for chunking, retriever in itertools.product(args.chunking, args.retrievers):
+                options = {
+                    "retriever": retriever,
+                    "chunking": chunking,
+                    "chunk_chars": chunk_chars,
+                    "overlap": overlap,
+                    "build_workers": args.build_workers,
+                }
+                r = measure(corpus, options, queries, args.batch_size, args.top_k)
+                r = {
+                    "target_chunks": target,
+                    "docs": docs,
+                    "corpus_mb": round(_dir_mb(corpus), 2),
+                    "retriever": retriever,
+                    "chunking": chunking,
+                    "chunk_chars": chunk_chars,
+                    "overlap": overlap,
+                    **r,
+                }
+                results.append(r)
+                print(f"{_label(r)}: chunks={r['chunks']} build_s={r['build_s']} q_p50_ms={r['single_p50_ms']}", flush=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    previous = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    print()
+    print(format_table(results, previous))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if previous is not None and args.tolerance is not None:
+        worse = regressions(results, previous, args.tolerance)
+        for w in worse:
+            print(f"REGRESIJA {w}")
+        if worse:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
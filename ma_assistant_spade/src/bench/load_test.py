@@ -0,0 +1,367 @@
+"""Opterećenje cijelog sustava bez OpenAI ključa i XMPP poslužitelja.
+
+    python -m src.bench.load_test --questions 30 --rate 1.5 --researchers 2 --verifiers 2
+    python -m src.bench.load_test --save-baseline prije.json   # prije promjene
+    python -m src.bench.load_test --baseline prije.json        # poslije, na istom računalu
+
+Pravi Koordinator, Istraživači i Provjeravatelji rade u jednom procesu; model je
+`FakeLLMClient` (vidi fake_llm.py, kašnjenje i broj tokena iz `--ttft-ms`, `--tokens-per-s`,
+`--output-tokens`), a poruke ne idu preko XMPP poslužitelja nego kroz lokalne sandučiće
+(`LocalBus`, kao `TRANSPORT=local`). Pitanja se generiraju iz rečenica korpusa i šalju
+Poissonovim dolascima brzinom `--rate` pitanja/s (`0` = sva odjednom). Izvještaj: pitanja/s,
+p50/p95/p99 od ulaska u red do kraja odgovora, isto po fazi (spanovi iz tools/tracing),
+bajtovi tijela poruka po pitanju (`--encoding`, `--evidence-refs`) i najveći RSS procesa. Uz `--baseline` izlazni kod je 1 ako je rezultat lošiji od spremljenog
+više od `--tolerance`; `--save-baseline` sprema trenutni rezultat kao referencu. Vremena
+ovise o računalu pa se referenca ne sprema u repozitorij: usporedba s referencom s drugog
+računala ili s drugim postavkama završava izlaznim kodom 2.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from spade import run
+
+from src.agents.coordinator import CoordinatorAgent
+from src.agents.researcher import ResearcherAgent
+from src.agents.verifier import VerifierAgent
+from src.protocol import ENCODINGS, MessageCodec
+from src.bench.fake_llm import FakeLLMClient, FakeLLMProfile
+from src.tools.claims import split_sentences
+from src.tools.output import ConsoleSink
+from src.tools.tracing import Tracer, format_table, percentile, read_spans, summarize
+from src.tools.transport import LocalBus, TransportAgent
+
+_QUESTION_TEMPLATES = [
+    "Što korpus kaže o temi: {}?",
+    "Objasni ukratko: {}.",
+    "Koje su poznate činjenice o: {}?",
+    "Kakva je veza između pojmova {}?",
+]
+_WORD_RE = re.compile(r"[^\W\d_]{5,}")
+
+_ABS_SLACK_MS = 5.0  # manje razlike vremena nisu regresija (šum rasporeda)
+
+
+def corpus_questions(corpus_dir: str, n: int, seed: int = 0) -> List[str]:
+    """`n` pitanja od riječi nasumičnih rečenica korpusa (deterministički za isti `seed`)."""
+    rng = random.Random(seed)
+    sentences: List[str] = []
+    for path in sorted(Path(corpus_dir).glob("*.txt")):
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        sentences.extend(s for s in split_sentences(text) if len(_WORD_RE.findall(s)) >= 3)
+    if not sentences:
+        raise SystemExit(f"Korpus {corpus_dir} nema rečenica za pitanja")
+    out = []
+    for _ in range(n):
+        words = _WORD_RE.findall(rng.choice(sentences))
+        start = rng.randrange(len(words) - 2)
+        phrase = " ".join(w.lower() for w in words[start : start + rng.randint(2, 4)])
+        out.append(rng.choice(_QUESTION_TEMPLATES).format(phrase))
+    return out
+
+
+def arrivals(n: int, rate: float, seed: int = 0) -> List[float]:
+    """Trenuci slanja u sekundama od početka: Poissonovi dolasci, a uz `rate <= 0` sva odjednom."""
+    if rate <= 0:
+        return [0.0] * n
+    rng = random.Random(seed)
+    t, out = 0.0, []
+    for _ in range(n):
+        out.append(t)
+        t += rng.expovariate(rate)
+    return out
+
+
+async def load_test(args: argparse.Namespace) -> Dict:
+    logger = logging.getLogger("ma_assistant.load_test")
+    logger.setLevel(logging.INFO)  # log_msg i dalje gradi zapise poruka, samo se ne ispisuju
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler() if args.verbose else logging.NullHandler())
+
+    profile = FakeLLMProfile(
+        ttft_ms=args.ttft_ms,
+        tokens_per_s=args.tokens_per_s,
+        output_tokens=args.output_tokens,
+        unsupported=args.unsupported,
+        time_scale=args.time_scale,
+    )
+    questions = corpus_questions(args.corpus, args.questions, args.seed)
+    schedule = arrivals(len(questions), args.rate, args.seed)
+
+    work = Path(tempfile.mkdtemp(prefix="load-test-"))
+    trace_path = args.trace or str(work / "traces.jsonl")
+    tracer = Tracer(trace_path, service="load_test")
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    bus = LocalBus(logger)
+    llms: List[FakeLLMClient] = []
+
+    def fake(seed: int) -> FakeLLMClient:
+        llms.append(FakeLLMClient(profile, seed=args.seed * 1000 + seed))
+        return llms[-1]
+
+    researcher_jids = [f"researcher{i}@localhost" for i in range(args.researchers)]
+    verifier_jids = [f"verifier{i}@localhost" for i in range(args.verifiers)]
+    codecs: List[MessageCodec] = []
+
+    def codec(index=None) -> MessageCodec:
+        codecs.append(MessageCodec(args.encoding, args.evidence_refs, index, logger))
+        return codecs[-1]
+
+    researchers: List[ResearcherAgent] = []
+    for i, jid in enumerate(researcher_jids):
+        researchers.append(
+            ResearcherAgent(
+                jid,
+                "bench",
+                corpus_dir=args.corpus,
+                top_k=args.top_k,
+                llm_model="fake",
+                logger=logger,
+                index_dir=str(work / "index"),
+                reload_interval=0,
+                index_options={"retriever": args.retriever, "chunking": args.chunking},
+                index=researchers[0].index if researchers else None,
+                batch_window_ms=args.batch_window_ms,
+                tracer=tracer,
+                llm_client=fake(1 + i),
+                bus=bus,
+                codec=codec(),
+            )
+        )
+    shared = researchers[0].index  # Koordinator i Provjeravatelji razrješavaju reference u isti indeks
+    verifiers = [
+        VerifierAgent(
+            jid,
+            "bench",
+            llm_model="fake",
+            logger=logger,
+            tracer=tracer,
+            llm_client=fake(100 + i),
+            bus=bus,
+            codec=codec(shared),
+        )
+        for i, jid in enumerate(verifier_jids)
+    ]
+    coordinator = CoordinatorAgent(
+        "coordinator@localhost",
+        "bench",
+        researcher_jids=researcher_jids,
+        verifier_jids=verifier_jids,
+        llm_model="fake",
+        logger=logger,
+        max_concurrency=args.concurrency,
+        queue_size=max(1, args.questions),
+        cache_size=0,  # svako pitanje prolazi cijeli put
+        stream=not args.no_stream,
+        output=ConsoleSink(devnull),
+        speculative=args.speculative,
+        tracer=tracer,
+        llm_client=fake(0),
+        bus=bus,
+        codec=codec(shared),
+    )
+    agents: List[TransportAgent] = [*researchers, *verifiers, coordinator]
+    try:
+        for agent in agents:
+            await agent.start(auto_register=False)
+
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        for at, question in zip(schedule, questions):
+            delay = t0 + at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await coordinator.ask(question)
+        deadline = loop.time() + args.timeout
+        while coordinator.user_queue.qsize() or coordinator.conversations:
+            if loop.time() > deadline:
+                logger.warning("load_test timeout; prekidam %d razgovora", len(coordinator.conversations))
+                break
+            await asyncio.sleep(0.02)
+        elapsed = loop.time() - t0
+    finally:
+        for agent in agents:
+            await agent.stop()
+        if researchers:
+            researchers[0].index.close()
+        tracer.close()
+        devnull.close()
+
+    spans = list(read_spans([trace_path]))
+    conversations = [s for s in spans if s["name"] == "conversation"]
+    answered = [s for s in conversations if "error" not in s]
+    end_to_end = [s["duration_ms"] + float(s.get("queue_wait_ms", 0.0)) for s in answered]
+    report = {
+        "config": _config(args),
+        "host": _host(),
+        "questions": len(questions),
+        "answered": len(answered),
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_s": round(len(answered) / elapsed, 3) if elapsed > 0 else 0.0,
+        "end_to_end_ms": {f"p{q}": round(percentile(end_to_end, q), 2) for q in (50, 95, 99)},
+        "stages": summarize(spans),
+        "llm": {k: sum(llm.stats[k] for llm in llms) for k in ("calls", "input_tokens", "output_tokens")},
+        "messages": bus.stats["delivered"],
+        # Tijela poruka među agentima (skokovi u spanovima), po odgovorenom pitanju
+        "message_bytes_per_question": round(
+            sum(s.get("body_bytes", 0) for s in spans if s["name"].startswith("hop.")) / max(1, len(answered)), 1
+        ),
+        "evidence": {k: sum(c.stats[k] for c in codecs) for k in ("evidence_refs", "evidence_texts", "unresolved_refs")},
+        # ru_maxrss je na Linuxu u KB (uključuje izgradnju indeksa i učitane module)
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if not args.trace:
+        shutil.rmtree(work, ignore_errors=True)
+    return report
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Pogoršanja u odnosu na referencu veća od `tolerance` (udio); za vremena se sitne razlike zanemaruju."""
+    regressions: List[str] = []
+
+    def slower(name: str, now: float, ref: float) -> None:
+        if now > ref * (1 + tolerance) + _ABS_SLACK_MS:
+            regressions.append(f"{name}: {now:.2f} ms > {ref:.2f} ms")
+
+    if report["questions_per_s"] < baseline["questions_per_s"] * (1 - tolerance):
+        regressions.append(f"questions_per_s: {report['questions_per_s']} < {baseline['questions_per_s']}")
+    if report["answered"] / max(1, report["questions"]) < baseline["answered"] / max(1, baseline["questions"]):
+        regressions.append(f"answered: {report['answered']}/{report['questions']}")
+    for q, ref in baseline["end_to_end_ms"].items():
+        slower(f"end_to_end {q}", report["end_to_end_ms"][q], ref)
+    for name, ref in baseline["stages"].items():
+        if name in report["stages"]:
+            slower(f"{name} p95", report["stages"][name]["p95_ms"], ref["p95_ms"])
+    if report["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak_rss_mb: {report['peak_rss_mb']} > {baseline['peak_rss_mb']}")
+    return regressions
+
+
+def _host() -> Dict:
+    """Računalo na kojem je mjereno; vremena se uspoređuju samo unutar istog računala."""
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def _config(args: argparse.Namespace) -> Dict:
+    keys = (
+        "questions",
+        "rate",
+        "seed",
+        "researchers",
+        "verifiers",
+        "concurrency",
+        "speculative",
+        "no_stream",
+        "top_k",
+        "retriever",
+        "chunking",
+        "batch_window_ms",
+        "ttft_ms",
+        "tokens_per_s",
+        "output_tokens",
+        "unsupported",
+        "time_scale",
+        "encoding",
+        "evidence_refs",
+    )
+    return {k: getattr(args, k) for k in keys}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default="./data/corpus")
+    ap.add_argument("--questions", type=int, default=30)
+    ap.add_argument("--rate", type=float, default=1.5, help="pitanja/s (Poisson); 0 = sva odjednom")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--researchers", type=int, default=2)
+    ap.add_argument("--verifiers", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=4, help="COORD_MAX_CONCURRENCY")
+    ap.add_argument("--speculative", action="store_true")
+    ap.add_argument("--no-stream", action="store_true")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--retriever", default="bm25")
+    ap.add_argument("--chunking", default="sentence")
+    ap.add_argument("--batch-window-ms", type=float, default=5.0)
+    ap.add_argument("--ttft-ms", type=float, default=200.0, help="medijan vremena do prvog tokena lažnog modela")
+    ap.add_argument("--tokens-per-s", type=float, default=200.0)
+    ap.add_argument("--output-tokens", type=int, default=120)
+    ap.add_argument("--unsupported", type=float, default=0.2, help="udio nacrta s tvrdnjom bez dokaza")
+    ap.add_argument("--time-scale", type=float, default=1.0, help="množi sva kašnjenja modela")
+    ap.add_argument("--encoding", default="json", choices=ENCODINGS, help="MESSAGE_ENCODING")
+    ap.add_argument("--evidence-refs", action="store_true", help="EVIDENCE_REFS: dokazi kao reference u indeks")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--trace", help="zadrži spanove u ovoj datoteci")
+    ap.add_argument("--json", help="spremi izvještaj u JSON datoteku")
+    ap.add_argument("--baseline", help="usporedi s referencom spremljenom na ovom računalu")
+    ap.add_argument("--save-baseline", help="spremi izvještaj kao referencu")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--verbose", action="store_true", help="ispiši log agenata")
+    args = ap.parse_args(argv)
+    try:
+        MessageCodec(args.encoding)  # npr. msgpack bez paketa: javi prije pokretanja agenata
+    except ValueError as e:
+        ap.error(str(e))
+
+    reports: List[Dict] = []
+
+    async def _main() -> None:
+        reports.append(await load_test(args))
+
+    started = time.perf_counter()
+    run(_main())
+    if not reports:
+        raise SystemExit("load_test nije završio (vidi log)")
+    report = reports[0]
+
+    print(
+        f"pitanja={report['answered']}/{report['questions']} trajanje_s={report['elapsed_s']} "
+        f"pitanja/s={report['questions_per_s']} e2e_ms={report['end_to_end_ms']} "
+        f"peak_rss_mb={report['peak_rss_mb']} bajtova_po_pitanju={report['message_bytes_per_question']} "
+        f"llm={report['llm']} (ukupno {time.perf_counter() - started:.1f} s)"
+    )
+    print(format_table(report["stages"]))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"referenca spremljena: {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("config") != report["config"]:
+            print("Postavke se razlikuju od reference; pokreni s istim postavkama ili spremi novu referencu.")
+            sys.exit(2)
+        if baseline.get("host") != report["host"]:
+            print(f"Referenca je s drugog računala ({baseline.get('host')}); spremi novu referencu na ovom računalu.")
+            sys.exit(2)
+        regressions = compare(report, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESIJA {r}")
+        if regressions:
+            sys.exit(1)
+        print(f"bez regresija u odnosu na {args.baseline} (tolerancija {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
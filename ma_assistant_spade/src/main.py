@@ -10,57 +10,228 @@ from spade import run
 from src.agents.coordinator import CoordinatorAgent
 from src.agents.researcher import ResearcherAgent
 from src.agents.verifier import VerifierAgent
-from src.tools.logging_utils import setup_logger
+from src.protocol import MessageCodec
+from src.tools.corpus_search import CorpusIndex
+from src.tools.dense import DENSE_QUANTS, DENSE_SEARCHES
+from src.tools.llm import CompletionCache
+from src.tools.logging_utils import close_logger, setup_logger
+from src.tools.tracing import Tracer
+from src.tools.transport import TRANSPORTS, LocalBus
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in {"1", "true", "yes"}
+
+
+def _env_list(name: str, default: str) -> list[str]:
+    return [x.strip() for x in os.getenv(name, default).split(",") if x.strip()]
 
 
 async def main():
     load_dotenv()
 
     log_dir = os.getenv("LOG_DIR", "./logs")
-    logger = setup_logger(log_dir)
+    # Logovi idu kroz red u zasebnu dretvu (JSONL s rotacijom); tijela poruka cijela, skraćena ili sažetak
+    logger = setup_logger(
+        log_dir,
+        body=os.getenv("LOG_BODY", "truncate").lower(),
+        body_chars=int(os.getenv("LOG_BODY_CHARS", "500")),
+        sample=float(os.getenv("LOG_SAMPLE", "1")),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        max_bytes=int(float(os.getenv("LOG_MAX_MB", "50")) * 1024 * 1024),
+        backups=int(os.getenv("LOG_BACKUPS", "5")),
+        compress=_env_flag("LOG_COMPRESS", "false"),
+    )
+    # Spanovi po fazama pitanja (OTLP/JSON po retku); prazno isključuje praćenje
+    tracer = Tracer(os.getenv("TRACE_PATH") or None)
 
     openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
     coord_jid = os.getenv("COORD_JID", "coordinator@localhost")
     coord_pwd = os.getenv("COORD_PASSWORD", "tajna")
 
-    researcher_jid = os.getenv("RESEARCHER_JID", "researcher@localhost")
+    # *_JID: agenti pokrenuti u ovom procesu; *_POOL: svi kojima Koordinator šalje zahtjeve
+    researcher_jids = _env_list("RESEARCHER_JID", "researcher@localhost")
+    researcher_pool = _env_list("RESEARCHER_POOL", ",".join(researcher_jids))
     researcher_pwd = os.getenv("RESEARCHER_PASSWORD", "tajna")
 
-    verifier_jid = os.getenv("VERIFIER_JID", "verifier@localhost")
+    verifier_jids = _env_list("VERIFIER_JID", "verifier@localhost")
+    verifier_pool = _env_list("VERIFIER_POOL", ",".join(verifier_jids))
     verifier_pwd = os.getenv("VERIFIER_PASSWORD", "tajna")
 
+    local_roles = set(_env_list("AGENTS", "coordinator,researcher,verifier"))
+
     corpus_dir = os.getenv("CORPUS_DIR", "./data/corpus")
+    index_dir = os.getenv("INDEX_DIR") or None
+    reload_interval = float(os.getenv("CORPUS_RELOAD_INTERVAL", "5"))
+    index_options = {
+        "retriever": os.getenv("RETRIEVER", "bm25").lower(),
+        "stopwords": _env_flag("HR_STOPWORDS", "true"),
+        "stemming": _env_flag("STEMMING", "false"),
+        "hybrid_alpha": float(os.getenv("HYBRID_ALPHA", "0.5")),
+        "embedder": os.getenv("EMBEDDER", "hashing"),
+        "dense_quant": os.getenv("DENSE_QUANT", "int8").lower(),
+        "dense_search": os.getenv("DENSE_SEARCH", "exact").lower(),
+        "ivf_nprobe": int(os.getenv("IVF_NPROBE", "8")),
+        "read_only": _env_flag("INDEX_READ_ONLY", "false"),
+        "build_workers": int(os.getenv("BUILD_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        "chunking": os.getenv("CHUNKING", "sentence").lower(),
+        "query_cache_size": int(os.getenv("QUERY_CACHE_SIZE", "256")),
+    }
+    if index_options["dense_search"] not in DENSE_SEARCHES:
+        raise ValueError(f"Nepoznat DENSE_SEARCH '{index_options['dense_search']}', dostupno: {', '.join(DENSE_SEARCHES)}")
+    if index_options["dense_quant"] not in DENSE_QUANTS:
+        raise ValueError(f"Nepoznat DENSE_QUANT '{index_options['dense_quant']}', dostupno: {', '.join(DENSE_QUANTS)}")
+    search_workers = int(os.getenv("SEARCH_WORKERS", "2"))
     top_k = int(os.getenv("TOP_K", "5"))
-    auto_register = os.getenv("AUTO_REGISTER", "false").lower() in {"1", "true", "yes"}
+    evidence_budget = int(os.getenv("EVIDENCE_TOKENS", "500"))
+    research_batch_window_ms = float(os.getenv("RESEARCH_BATCH_WINDOW_MS", "5"))
+    research_batch_max = int(os.getenv("RESEARCH_BATCH_MAX", "16"))
+    research_max_concurrency = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "32"))
+    auto_register = _env_flag("AUTO_REGISTER", "false")
+    transport = os.getenv("TRANSPORT", "xmpp").lower()
+    message_encoding = os.getenv("MESSAGE_ENCODING", "json").lower()
+    evidence_refs = _env_flag("EVIDENCE_REFS", "false")
+    coord_max_concurrency = int(os.getenv("COORD_MAX_CONCURRENCY", "4"))
+    coord_queue_size = int(os.getenv("COORD_QUEUE_SIZE", "32"))
+    coord_stream = _env_flag("COORD_STREAM", "true")
+    coord_speculative = _env_flag("COORD_SPECULATIVE", "false")
+    coord_request_timeout = float(os.getenv("COORD_REQUEST_TIMEOUT", "30"))
+    coord_failover_attempts = int(os.getenv("COORD_FAILOVER_ATTEMPTS", "2"))
+    worker_cooldown = float(os.getenv("WORKER_COOLDOWN", "10"))
+    verifier_fast_path = _env_flag("VERIFIER_FAST_PATH", "true")
+    verifier_pass_overlap = float(os.getenv("VERIFIER_PASS_OVERLAP", "0.8"))
+    verifier_max_concurrency = int(os.getenv("VERIFIER_MAX_CONCURRENCY", "8"))
+    response_cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+    response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    response_cache_similarity = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+    # Predmemorija LLM poziva - dijeljena, ali uključena samo za navedene agente
+    llm_cache_agents = {a.strip().lower() for a in os.getenv("LLM_CACHE_AGENTS", "researcher,verifier").split(",") if a.strip()}
+    llm_cache = None
+    if llm_cache_agents:
+        llm_cache = CompletionCache(
+            path=os.getenv("LLM_CACHE_PATH", "./data/cache/llm_cache.sqlite") or None,
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+        )
+
+    # TRANSPORT=local: svi agenti u ovom procesu razmjenjuju poruke kroz sandučiće, bez XMPP poslužitelja
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Nepoznat TRANSPORT '{transport}', dostupno: {', '.join(TRANSPORTS)}")
+    bus = None
+    if transport == "local":
+        remote = set(researcher_pool) - set(researcher_jids) | set(verifier_pool) - set(verifier_jids)
+        if local_roles != {"coordinator", "researcher", "verifier"} or remote:
+            raise ValueError("TRANSPORT=local zahtijeva sve agente (AGENTS, *_POOL) u istom procesu")
+        bus = LocalBus(logger)
+
+    def cache_for(agent: str):
+        return llm_cache if agent in llm_cache_agents else None
+
+    def codec_for(index=None) -> MessageCodec:
+        # Istraživač sam veže svoj indeks; ostali dobivaju zajednički (ref_index)
+        return MessageCodec(message_encoding, evidence_refs, index, logger)
 
     # Agenti - OPENAI predložak
-    researcher = ResearcherAgent(
-        researcher_jid,
-        researcher_pwd,
-        corpus_dir=corpus_dir,
-        top_k=top_k,
-        llm_model=openai_model,
-        logger=logger,
-    )
-    verifier = VerifierAgent(
-        verifier_jid,
-        verifier_pwd,
-        llm_model=openai_model,
-        logger=logger,
-    )
-    coordinator = CoordinatorAgent(
-        coord_jid,
-        coord_pwd,
-        researcher_jid=researcher_jid,
-        verifier_jid=verifier_jid,
-        llm_model=openai_model,
-        logger=logger,
-    )
+    researchers: list[ResearcherAgent] = []
+    verifiers: list[VerifierAgent] = []
+    coordinator = None
+    if "researcher" in local_roles:
+        for jid in researcher_jids:
+            # Prvi gradi (ili učitava) indeks, ostali dijele isti memory-mapped indeks
+            researchers.append(
+                ResearcherAgent(
+                    jid,
+                    researcher_pwd,
+                    corpus_dir=corpus_dir,
+                    top_k=top_k,
+                    llm_model=openai_model,
+                    logger=logger,
+                    index_dir=index_dir,
+                    reload_interval=reload_interval,
+                    index_options=index_options,
+                    llm_cache=cache_for("researcher"),
+                    index=researchers[0].index if researchers else None,
+                    search_workers=search_workers,
+                    evidence_tokens=evidence_budget,
+                    batch_window_ms=research_batch_window_ms,
+                    batch_max=research_batch_max,
+                    max_concurrency=research_max_concurrency,
+                    tracer=tracer,
+                    bus=bus,
+                    codec=codec_for(),
+                )
+            )
+
+    # EVIDENCE_REFS: reference se razrješavaju u indeks Istraživača ovog procesa, a bez njih
+    # u isti INDEX_DIR samo za čitanje (generaciju gradi proces s Istraživačima)
+    ref_index = None
+    if evidence_refs:
+        ref_index = researchers[0].index if researchers else CorpusIndex(
+            corpus_dir, index_dir=index_dir, **{**index_options, "read_only": True, "query_cache_size": 0}
+        )
+
+    if "verifier" in local_roles:
+        for jid in verifier_jids:
+            verifiers.append(
+                VerifierAgent(
+                    jid,
+                    verifier_pwd,
+                    llm_model=openai_model,
+                    logger=logger,
+                    llm_cache=cache_for("verifier"),
+                    fast_path=verifier_fast_path,
+                    pass_overlap=verifier_pass_overlap,
+                    evidence_tokens=evidence_budget,
+                    max_concurrency=verifier_max_concurrency,
+                    tracer=tracer,
+                    bus=bus,
+                    codec=codec_for(ref_index),
+                )
+            )
+    if "coordinator" in local_roles:
+        coordinator = CoordinatorAgent(
+            coord_jid,
+            coord_pwd,
+            researcher_jids=researcher_pool,
+            verifier_jids=verifier_pool,
+            llm_model=openai_model,
+            logger=logger,
+            max_concurrency=coord_max_concurrency,
+            queue_size=coord_queue_size,
+            stream=coord_stream,
+            speculative=coord_speculative,
+            request_timeout=coord_request_timeout,
+            failover_attempts=coord_failover_attempts,
+            worker_cooldown=worker_cooldown,
+            cache_size=response_cache_size,
+            cache_ttl=response_cache_ttl,
+            cache_similarity=response_cache_similarity,
+            llm_cache=cache_for("coordinator"),
+            tracer=tracer,
+            bus=bus,
+            codec=codec_for(ref_index),
+        )
 
     # Agenti
-    await researcher.start(auto_register=auto_register)
-    await verifier.start(auto_register=auto_register)
+    for agent in [*researchers, *verifiers]:
+        await agent.start(auto_register=auto_register)
+
+    if coordinator is None:
+        # Proces samo s radnicima (npr. dodatni Istraživači): radi dok se ne prekine
+        print(f"\nPokrenuti agenti: {', '.join(str(a.jid) for a in [*researchers, *verifiers])}\n")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for agent in [*researchers, *verifiers]:
+                await agent.stop()
+            if researchers:
+                researchers[0].index.close()
+            tracer.close()
+            logger.info("trace path=%s stats=%s", tracer.path, tracer.stats)
+            close_logger(logger)
+        return
+
     await coordinator.start(auto_register=auto_register)
 
     print("\nVišeagentni asistent pokrenut. Unesite pitanje (ili 'izlaz', 'kraj').\n")
@@ -72,13 +243,37 @@ async def main():
                 break
             if not text:
                 continue
-            coordinator.user_queue.put_nowait(text)
+            # Čeka ako je red pun (backpressure) umjesto da gomila pitanja
+            await coordinator.ask(text)
             # Daj koordinatoru vremena da obradi red
             await asyncio.sleep(0.2)
     finally:
         await coordinator.stop()
-        await researcher.stop()
-        await verifier.stop()
+        for agent in [*researchers, *verifiers]:
+            await agent.stop()
+        if researchers:
+            researchers[0].index.close()
+        if llm_cache is not None:
+            logger.info("llm_cache stats=%s", llm_cache.stats)
+        for verifier in verifiers:
+            logger.info("verifier jid=%s fast_path stats=%s", verifier.jid, verifier.stats)
+        for researcher in researchers:
+            logger.info("researcher jid=%s batch stats=%s", researcher.jid, researcher.stats)
+        if researchers:
+            index = researchers[0].index
+            logger.info(
+                "query_cache hit_rate=%.2f hits=%d misses=%d",
+                index.query_cache_hit_rate,
+                index.stats["query_cache_hits"],
+                index.stats["query_cache_misses"],
+            )
+        logger.info("worker_pools research=%s verify=%s", coordinator.researchers.stats(), coordinator.verifiers.stats())
+        if bus is not None:
+            logger.info("local_bus stats=%s", bus.stats)
+        logger.info("message_codec encoding=%s stats=%s", message_encoding, coordinator.codec.stats)
+        tracer.close()
+        logger.info("trace path=%s stats=%s", tracer.path, tracer.stats)
+        close_logger(logger)
         print("Zaustavljeno.")
 
 
@@ -1,22 +1,41 @@
 # generirano uz pomoc chatGPT-a - https://chatgpt.com/s/t_696d5be585488191b11e651d5eadb0f1
 from __future__ import annotations
 
+import asyncio
+import base64
 import json
+import logging
+import time
 import uuid
+import zlib
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # opcionalno: binarni zapis tijela poruka (MESSAGE_ENCODING=msgpack...)
+    import msgpack
+except ImportError:  # pragma: no cover - ovisi o okruženju
+    msgpack = None
 
 
 ONTOLOGY = "ma-assistant"
 PROTOCOL = "coordination-v1"
 LANGUAGE = "hr"
- 
+
+# Metapodaci kodiranja: kako je tijelo zapisano, što pošiljatelj prima i razrješava li reference dokaza
+ENCODING = "encoding"
+ACCEPT_ENCODING = "accept-encoding"
+EVIDENCE_REFS = "evidence-refs"
+ENCODINGS = ("json", "json+zlib", "msgpack", "msgpack+zlib")
+_COMPRESS_MIN = 512  # manja tijela se ne sažimaju (zlib + base64 bi ih samo povećao)
+
 
 def new_conversation_id() -> str:
     return str(uuid.uuid4())
 
 
-def make_metadata(performative: str, conversation_id: str, extra: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+def make_metadata(
+    performative: str, conversation_id: str, extra: Optional[Dict[str, Any]] = None, span_id: str = ""
+) -> Dict[str, str]:
     md: Dict[str, str] = {
         "performative": performative,
         "ontology": ONTOLOGY,
@@ -26,16 +45,202 @@ def make_metadata(performative: str, conversation_id: str, extra: Optional[Dict[
     }
     if extra:
         md.update({k: str(v) for k, v in extra.items()})
+    if span_id:
+        # Kontekst praćenja (vidi tools/tracing): roditeljski span i trenutak slanja
+        md["span-id"] = span_id
+        md["sent-ns"] = str(time.time_ns())
     return md
 
 
+def encode_body(payload: Dict[str, Any], encoding: str = "json") -> Tuple[str, str]:
+    """(tijelo poruke, stvarno kodiranje); binarni zapis ide kao base64 jer je tijelo XMPP poruke tekst."""
+    fmt, _, compress = encoding.partition("+")
+    if fmt == "msgpack" and msgpack is not None:
+        data = msgpack.packb(payload, use_bin_type=True)
+    elif compress:
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        fmt = "json"
+        if len(data) < _COMPRESS_MIN:
+            return data.decode("utf-8"), "json"
+    else:
+        return json.dumps(payload, ensure_ascii=False), "json"
+    if compress and len(data) >= _COMPRESS_MIN:
+        data = zlib.compress(data, 1)
+        fmt += "+zlib"
+    return base64.b64encode(data).decode("ascii"), fmt
+
+
+def decode_body(body: str, encoding: str = "json") -> Dict[str, Any]:
+    if encoding in ("", "json"):
+        return json.loads(body or "{}")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Nepoznato kodiranje poruke '{encoding}'")
+    data = base64.b64decode(body)
+    if encoding.endswith("+zlib"):
+        data = zlib.decompress(data)
+    if encoding.startswith("msgpack"):
+        if msgpack is None:
+            raise ValueError("Poruka je u msgpack zapisu, a paket msgpack nije instaliran")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+class MessageCodec:
+    """Kodiranje tijela poruka po dogovoru s primateljem i dokazi po referenci u zajednički indeks.
+
+    Svaka poruka oglašava u metapodacima kodiranje koje agent prima (`accept-encoding`) i
+    razrješava li dokaze iz indeksa (`evidence-refs`). Pošiljatelj pamti oglas zadnje poruke
+    svakog agenta i prema njemu kodira poruke tom agentu; dok oglasa nema, šalje JSON s
+    tekstovima dokaza kao i prije. Dokaz po referenci je [doc_id, chunk_id, generacija], uz
+    [početak, kraj] ako je dokaz samo dio chunka, i šalje se samo kad tekst doslovno odgovara
+    chunku te generacije. Uz `refs` agent reference šalje i prima ako ima `index`, CorpusIndex
+    koji agenti dijele (isti INDEX_DIR).
+    """
+
+    def __init__(
+        self, encoding: str = "json", refs: bool = False, index=None, logger: Optional[logging.Logger] = None
+    ):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Nepoznat MESSAGE_ENCODING '{encoding}', dostupno: {', '.join(ENCODINGS)}")
+        if encoding.startswith("msgpack") and msgpack is None:
+            raise ValueError(f"MESSAGE_ENCODING={encoding} zahtijeva paket msgpack (pip install msgpack)")
+        self.encoding = encoding
+        self.refs = refs
+        self.index = index
+        self.logger = logger or logging.getLogger(__name__)
+        self._peers: Dict[str, Tuple[str, bool]] = {}  # bare JID -> (kodiranje, reference)
+        self.stats: Dict[str, int] = {"evidence_refs": 0, "evidence_texts": 0, "unresolved_refs": 0}
+
+    def advertise(self) -> Dict[str, str]:
+        """Metapodaci o tome što ovaj agent prima; prazno za zadani JSON bez referenci."""
+        md: Dict[str, str] = {}
+        if self.encoding != "json":
+            md[ACCEPT_ENCODING] = self.encoding
+        if self.resolves_refs:
+            md[EVIDENCE_REFS] = "1"
+        return md
+
+    @property
+    def resolves_refs(self) -> bool:
+        return self.refs and self.index is not None
+
+    def encode(self, payload: Dict[str, Any], to: str) -> Tuple[str, Dict[str, str]]:
+        """(tijelo, metapodaci kodiranja) poruke za agenta `to`."""
+        accept, refs = self._peers.get(_bare(to), ("json", False))
+        if refs and self.resolves_refs and payload.get("evidence"):
+            payload = dict(payload, evidence=self._refs(payload["evidence"]))
+        body, encoding = encode_body(payload, accept)
+        md = self.advertise()
+        if encoding != "json":
+            md[ENCODING] = encoding
+        return body, md
+
+    def decode(self, msg) -> Dict[str, Any]:
+        """Tijelo primljene poruke kao rječnik, s razriješenim referencama dokaza; pamti oglas pošiljatelja.
+
+        Reference se razrješavaju samo iz već učitanih generacija indeksa; one koje se ne mogu
+        razriješiti ostaju u dokazima kao `{"unresolved": True, ...}` bez teksta.
+        """
+        d = self._body(msg)
+        if isinstance(d.get("evidence"), list) and any(isinstance(e, list) for e in d["evidence"]):
+            d["evidence"] = self._resolve(d["evidence"])
+        return d
+
+    async def adecode(self, msg) -> Dict[str, Any]:
+        """Kao `decode`, ali indeks samo za čitanje noviju generaciju iz referenci učitava u radnoj dretvi."""
+        d = self._body(msg)
+        evidence = d.get("evidence")
+        if not isinstance(evidence, list) or not any(isinstance(e, list) for e in evidence):
+            return d
+        newest = max((as_int(e[2]) for e in evidence if isinstance(e, list) and len(e) >= 3), default=-1)
+        if self.resolves_refs and self.index.read_only and newest > self.index.generation:
+            try:
+                await asyncio.to_thread(self.index.reload)
+            except Exception as exc:  # noqa: BLE001 - npr. generacija upravo zamijenjena; reference ostaju nerazriješene
+                self.logger.warning("evidence_ref_reload_failed generation=%d err=%r", newest, exc)
+        d["evidence"] = self._resolve(evidence)
+        return d
+
+    def _body(self, msg) -> Dict[str, Any]:
+        md = msg.metadata
+        self._peers[_bare(str(msg.sender))] = (md.get(ACCEPT_ENCODING, "json"), md.get(EVIDENCE_REFS) == "1")
+        return decode_body(msg.body or "", md.get(ENCODING, "json"))
+
+    def _refs(self, evidence: List[Any]) -> List[Any]:
+        generation = self.index.generation
+        out: List[Any] = []
+        for e in evidence:
+            ref = None
+            if isinstance(e, dict) and e.get("text"):
+                doc_id, chunk_id, text = str(e.get("doc_id")), as_int(e.get("chunk_id")), str(e["text"])
+                chunk = self.index.chunk_text(doc_id, chunk_id, generation)
+                start = chunk.find(text) if chunk is not None else -1
+                if start == 0 and len(text) == len(chunk):
+                    ref = [doc_id, chunk_id, generation]
+                elif start >= 0:
+                    ref = [doc_id, chunk_id, generation, start, start + len(text)]
+            self.stats["evidence_refs" if ref else "evidence_texts"] += 1
+            out.append(ref or e)
+        return out
+
+    def _resolve(self, evidence: List[Any]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for e in evidence:
+            if isinstance(e, list):
+                e = self._resolve_ref(e)
+            out.append(e)
+        return out
+
+    def _resolve_ref(self, ref: List[Any]) -> Dict[str, Any]:
+        doc_id = str(ref[0]) if ref else ""
+        chunk_id = as_int(ref[1]) if len(ref) > 1 else -1
+        generation = as_int(ref[2]) if len(ref) > 2 else -1
+        text = None
+        try:
+            if self.resolves_refs and generation >= 0:
+                text = self.index.chunk_text(doc_id, chunk_id, generation)
+            if text is not None and len(ref) >= 5:
+                text = text[int(ref[3]) : int(ref[4])]
+        except Exception as exc:  # noqa: BLE001 - neispravna referenca ne smije srušiti razgovor
+            self.logger.warning("evidence_ref_invalid ref=%r err=%r", ref, exc)
+            text = None
+        if text is None:
+            # Generacija više nije dostupna (ili agent nema indeks): primatelj mora znati da dokaz nedostaje
+            self.stats["unresolved_refs"] += 1
+            self.logger.warning(
+                "evidence_ref_unresolved doc_id=%s chunk_id=%d generation=%d", doc_id, chunk_id, generation
+            )
+            return {"doc_id": doc_id, "chunk_id": chunk_id, "generation": generation, "text": "", "unresolved": True}
+        return {"doc_id": doc_id, "chunk_id": chunk_id, "text": text}
+
+
+def unresolved_evidence(evidence: List[Any]) -> List[Dict[str, Any]]:
+    """Dokazi čije reference primatelj nije mogao razriješiti (vidi `MessageCodec.decode`)."""
+    return [e for e in evidence if isinstance(e, dict) and e.get("unresolved")]
+
+
+def _bare(jid: str) -> str:
+    return jid.split("/", 1)[0]
+
+
+def as_int(value: Any) -> int:
+    """Cijeli broj iz podatka drugog agenta (metapodaci, reference dokaza); -1 ako nije broj."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
 @dataclass
 class ResearchRequest:
     query: str
     top_k: int = 5
 
+    def to_payload(self) -> Dict[str, Any]:
+        return {"query": self.query, "top_k": self.top_k}
+
     def to_json(self) -> str:
-        return json.dumps({"query": self.query, "top_k": self.top_k}, ensure_ascii=False)
+        return json.dumps(self.to_payload(), ensure_ascii=False)
 
 
 @dataclass
@@ -43,22 +248,31 @@ class ResearchResult:
     evidence: list[dict]
     summary: str
 
+    def to_payload(self) -> Dict[str, Any]:
+        return {"evidence": self.evidence, "summary": self.summary}
+
     def to_json(self) -> str:
-        return json.dumps({"evidence": self.evidence, "summary": self.summary}, ensure_ascii=False)
+        return json.dumps(self.to_payload(), ensure_ascii=False)
 
     @staticmethod
-    def from_json(s: str) -> "ResearchResult":
-        d = json.loads(s)
+    def from_payload(d: Dict[str, Any]) -> "ResearchResult":
         return ResearchResult(evidence=d.get("evidence", []), summary=d.get("summary", ""))
 
+    @staticmethod
+    def from_json(s: str) -> "ResearchResult":
+        return ResearchResult.from_payload(json.loads(s))
+
 
 @dataclass
 class VerifyRequest:
     draft_answer: str
     evidence: list[dict]
 
+    def to_payload(self) -> Dict[str, Any]:
+        return {"draft_answer": self.draft_answer, "evidence": self.evidence}
+
     def to_json(self) -> str:
-        return json.dumps({"draft_answer": self.draft_answer, "evidence": self.evidence}, ensure_ascii=False)
+        return json.dumps(self.to_payload(), ensure_ascii=False)
 
 
 @dataclass
@@ -67,17 +281,20 @@ class VerifyResult:
     issues: list[str]
     suggested_fixes: list[str]
 
+    def to_payload(self) -> Dict[str, Any]:
+        return {"verdict": self.verdict, "issues": self.issues, "suggested_fixes": self.suggested_fixes}
+
     def to_json(self) -> str:
-        return json.dumps(
-            {"verdict": self.verdict, "issues": self.issues, "suggested_fixes": self.suggested_fixes},
-            ensure_ascii=False,
-        )
+        return json.dumps(self.to_payload(), ensure_ascii=False)
 
     @staticmethod
-    def from_json(s: str) -> "VerifyResult":
-        d = json.loads(s)
+    def from_payload(d: Dict[str, Any]) -> "VerifyResult":
         return VerifyResult(
             verdict=d.get("verdict", "WARN"),
             issues=list(d.get("issues", [])),
             suggested_fixes=list(d.get("suggested_fixes", [])),
         )
+
+    @staticmethod
+    def from_json(s: str) -> "VerifyResult":
+        return VerifyResult.from_payload(json.loads(s))
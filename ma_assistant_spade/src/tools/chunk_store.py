@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# Chunkovi jedne generacije indeksa u stupcima umjesto objekta po chunku:
+#   docs.json          - tablica doc_id-ova (svaki samo jednom)
+#   chunk_doc.npy      - indeks dokumenta u tablici, po retku (int32)
+#   chunk_no.npy       - redni broj chunka u dokumentu (int32)
+#   chunk_offsets.npy  - početak teksta retka u chunks.bin (int64, n + 1)
+#   chunks.bin         - tekstovi (UTF-8) jedan za drugim
+# Stupci i tekst mapiraju se u memoriju; `Chunk` je samo pogled (pohrana, redak).
+
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+DOC_FILE = "chunk_doc.npy"
+CHUNK_NO_FILE = "chunk_no.npy"
+DOCS_FILE = "docs.json"
+
+
+class Chunk:
+    """Pogled na jedan redak `ChunkStore`; polja se čitaju iz stupaca tek kad zatrebaju."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "ChunkStore", row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def doc_id(self) -> str:
+        return self.store.docs[int(self.store.doc_index[self.row])]
+
+    @property
+    def chunk_id(self) -> int:
+        return int(self.store.chunk_no[self.row])
+
+    @property
+    def text(self) -> str:
+        return self.store.text(self.row)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Chunk):
+            return NotImplemented
+        return (self.doc_id, self.chunk_id) == (other.doc_id, other.chunk_id)
+
+    def __hash__(self) -> int:
+        return hash((self.doc_id, self.chunk_id))
+
+    def __repr__(self) -> str:
+        return f"Chunk(doc_id={self.doc_id!r}, chunk_id={self.chunk_id})"
+
+
+class ChunkStoreWriter:
+    """Dodaje chunkove (tekst na kraj datoteke, doc/redni broj/pomak u stupce) tijekom izgradnje."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.path = self.directory / TEXT_FILE
+        self._fh = open(self.path, "a+b")  # a+: `texts` čita natrag
+        self._docs: Dict[str, int] = {}
+        self._doc_index = array("i")
+        self._chunk_no = array("i")
+        self._offsets = array("q", [self._fh.tell()])
+
+    def __len__(self) -> int:
+        return len(self._doc_index)
+
+    def append_file(self, path: Path, doc_id: str, lengths: np.ndarray, block_size: int = 1 << 20) -> None:
+        """Prepiši već zapisane tekstove dokumenta (npr. iz radnog procesa) zadanih duljina u bajtovima."""
+        with open(path, "rb") as src:
+            while block := src.read(block_size):
+                self._fh.write(block)
+        self.extend(doc_id, lengths)
+
+    def copy_rows(self, store: "ChunkStore", start: int, end: int) -> None:
+        """Prepiši retke [start, end) iz postojeće pohrane (nepromijenjeni dokumenti)."""
+        offsets = np.asarray(store.offsets[start : end + 1], dtype=np.int64)
+        for block in store.blocks(int(offsets[0]), int(offsets[-1])):
+            self._fh.write(block)
+        # Samo dokumenti prepisanih redaka, inače bi obrisani dokumenti ostali u tablici zauvijek
+        doc_index = np.asarray(store.doc_index[start:end])
+        used = np.unique(doc_index)
+        docs = np.zeros(len(store.docs), dtype=np.int32)
+        docs[used] = [self._intern(store.docs[i]) for i in used.tolist()]
+        self._doc_index.extend(docs[doc_index].tolist())
+        self._chunk_no.extend(np.asarray(store.chunk_no[start:end]).tolist())
+        self._extend_offsets(np.diff(offsets))
+
+    def flush(self) -> None:
+        """Isprazni međuspremnik prije nego što drugi (npr. `_analyze_document`) doda na kraj datoteke."""
+        self._fh.flush()
+
+    def extend(self, doc_id: str, lengths: np.ndarray) -> None:
+        """Zabilježi chunkove 0..n-1 dokumenta čije je tekstove nakon `flush()` zapisao netko drugi."""
+        doc = self._intern(doc_id)
+        self._doc_index.extend([doc] * len(lengths))
+        self._chunk_no.extend(range(len(lengths)))
+        self._extend_offsets(lengths)
+
+    def texts(self, start: int, end: int) -> List[str]:
+        """Pročitaj natrag već zapisane chunkove (npr. za ugradnje); ne pomiče pisanje."""
+        self._fh.flush()
+        a, b = self._offsets[start], self._offsets[end]
+        data = memoryview(os.pread(self._fh.fileno(), b - a, a))
+        return [str(data[self._offsets[i] - a : self._offsets[i + 1] - a], "utf-8") for i in range(start, end)]
+
+    def close(self) -> "ChunkStore":
+        self._fh.close()
+        docs = [""] * len(self._docs)
+        for doc_id, i in self._docs.items():
+            docs[i] = doc_id
+        (self.directory / DOCS_FILE).write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+        np.save(self.directory / DOC_FILE, np.frombuffer(self._doc_index, dtype=np.int32))
+        np.save(self.directory / CHUNK_NO_FILE, np.frombuffer(self._chunk_no, dtype=np.int32))
+        np.save(self.directory / OFFSETS_FILE, np.frombuffer(self._offsets, dtype=np.int64))
+        return ChunkStore(self.directory)
+
+    def abort(self) -> None:
+        self._fh.close()
+
+    def _intern(self, doc_id: str) -> int:
+        return self._docs.setdefault(doc_id, len(self._docs))
+
+    def _extend_offsets(self, lengths) -> None:
+        pos = self._offsets[-1]
+        for n in np.asarray(lengths, dtype=np.int64).tolist():
+            pos += n
+            self._offsets.append(pos)
+
+
+class ChunkStore:
+    """Chunkovi jedne generacije kao niz: `store[i]` je `Chunk` pogled, tekst se dekodira tek pri čitanju.
+
+    Po chunku ostaje 16 bajtova stupaca (mapiranih s diska) umjesto Python objekata;
+    mapiranje ostaje valjano i nakon što se generacija preimenuje ili obriše s diska.
+    """
+
+    def __init__(self, directory: Path):
+        directory = Path(directory)
+        self.docs: List[str] = json.loads((directory / DOCS_FILE).read_text(encoding="utf-8"))
+        self.doc_index = np.load(directory / DOC_FILE, mmap_mode="r")
+        self.chunk_no = np.load(directory / CHUNK_NO_FILE, mmap_mode="r")
+        self.offsets = np.load(directory / OFFSETS_FILE, mmap_mode="r")
+        self._buf = memoryview(b"")
+        with open(directory / TEXT_FILE, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size:
+                self._buf = memoryview(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return len(self.doc_index)
+
+    def __getitem__(self, row: int) -> Chunk:
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return Chunk(self, row % len(self))
+
+    def __iter__(self) -> Iterator[Chunk]:
+        return (Chunk(self, row) for row in range(len(self)))
+
+    def view(self, row: int) -> memoryview:
+        """Sirovi UTF-8 tekst retka, bez kopiranja."""
+        return self._buf[int(self.offsets[row]) : int(self.offsets[row + 1])]
+
+    def text(self, row: int) -> str:
+        return str(self.view(row), "utf-8")
+
+    def blocks(self, start: int, end: int, block_size: int = 1 << 20) -> Iterator[memoryview]:
+        for pos in range(start, end, block_size):
+            yield self._buf[pos : min(end, pos + block_size)]
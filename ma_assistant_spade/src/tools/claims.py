@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Tuple
+
+from src.protocol import as_int
+
+# Citati i tvrdnje u odgovoru Koordinatora ([DOC:CHUNK] uz rečenice)
+
+CITATION_RE = re.compile(r"\[([^\[\]:\s]+):(\d+)\]")
+
+# Granica tvrdnje: kraj rečenice (s citatima koji slijede iza točke) ili novi redak,
+# ali samo kad je poznat i početak sljedeće - usred streama citat još može stići.
+# Malo slovo iza točke znači redni broj ili kraticu ("12. stoljeće"), ne kraj rečenice.
+_BOUNDARY_RE = re.compile(
+    r"[.!?…]+(?:[ \t]*\[[^\[\]\n]*\])*\s+(?=[^\s\[a-zčćđšž])|\n\s*(?=[^\s\[])"
+)
+_WORD_RE = re.compile(r"\w{2,}")
+
+
+def citations(text: str) -> List[Tuple[str, int]]:
+    """Citirani (doc_id, chunk_id) redom pojavljivanja, bez ponavljanja."""
+    seen: Dict[Tuple[str, int], None] = {}
+    for doc_id, chunk_id in CITATION_RE.findall(text):
+        seen.setdefault((doc_id, int(chunk_id)), None)
+    return list(seen)
+
+
+def strip_citations(text: str) -> str:
+    return CITATION_RE.sub(" ", text)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Cijeli tekst po rečenicama/stavkama (citati ostaju uz svoju rečenicu)."""
+    splitter = ClaimSplitter(min_chars=0)
+    return [s for s in splitter.feed(text) + splitter.flush() if s.strip()]
+
+
+def has_words(text: str) -> bool:
+    return _WORD_RE.search(strip_citations(text)) is not None
+
+
+def cited_evidence(text: str, evidence: List[dict]) -> List[dict]:
+    """Dokazi na koje se tekst poziva; bez citata - svi dokazi."""
+    cited = set(citations(text))
+    if not cited:
+        return list(evidence)
+    return [e for e in evidence if (str(e.get("doc_id")), as_int(e.get("chunk_id"))) in cited]
+
+
+class ClaimSplitter:
+    """Inkrementalno dijeli tekst (npr. stream nacrta) na tvrdnje - rečenice ili stavke.
+
+    Vraćeni dijelovi zajedno s `flush()` točno čine ulazni tekst (razmaci ostaju uz
+    dio), pa se ispravljene tvrdnje mogu vratiti na isto mjesto. Prekratki dijelovi
+    (naslovi, "Evo odgovora:") spajaju se sa sljedećom tvrdnjom.
+    """
+
+    def __init__(self, min_chars: int = 30):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        out: List[str] = []
+        start = 0
+        for m in _BOUNDARY_RE.finditer(self._buf):
+            if len(self._buf[start : m.end()].strip()) >= self.min_chars:
+                out.append(self._buf[start : m.end()])
+                start = m.end()
+        self._buf = self._buf[start:]
+        return out
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf, ""
+        return [rest] if rest else []
@@ -1,39 +1,391 @@
 from __future__ import annotations
 
+import hashlib
+import io
+import json
+import multiprocessing
+import os
 import re
-from dataclasses import dataclass
+import shutil
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+import scipy.sparse as sp
+
+from src.tools.chunk_store import Chunk, ChunkStore, ChunkStoreWriter
+from src.tools.dense import DENSE_QUANTS, DENSE_SEARCHES, DenseIndex, make_embedder
+from src.tools.ranking import RETRIEVERS, Analyzer, fuse, fuse_rows, make_scorers
 
 # Korpusi su ai generirani: https://chatgpt.com/s/t_696d5791085c8191b8ecba099705f2eb
 #Ukredano iz vlastitog zavrsnog rada dostuponog na foi radovi
 
+INDEX_FORMAT = 5
+_BUILD_BLOCK_NNZ = 1 << 21  # najviše ne-nula matrice frekvencija u memoriji odjednom tijekom izgradnje
+
+_WS_RE = re.compile(r"\s+")
+_LINE_WS_RE = re.compile(r"[^\S\n]*\n\s*")  # razmaci s barem jednim novim retkom
+_SPACE_RE = re.compile(r"[^\S\n]+")
+# Početak sljedeće rečenice/retka: iza .!? (i navodnika/zagrade) razmak pa ne malo slovo, ili novi redak
+_SENTENCE_RE = re.compile(r"[.!?…][\"'»”)\]]*[ \n](?=[^a-zčćđšž])|\n")
+
+CHUNKING = ("sentence", "fixed")
+
+
 @dataclass
-class Chunk:
-    doc_id: str
-    chunk_id: int
-    text: str
+class IndexSnapshot:
+    """Nepromjenjivo stanje indeksa jedne generacije (učitano s diska ili tek izgrađeno)."""
+
+    generation: int
+    config: Dict[str, object]
+    manifest: Dict[str, dict]  # ime datoteke -> {mtime_ns, size, sha1, rows: [start, end]}
+    chunks: ChunkStore  # stupci + tekstovi; chunks[i] je `Chunk` pogled
+    vocab: Dict[str, int]
+    tf: sp.csr_matrix  # chunkovi x pojmovi, sirove frekvencije (osnova za sve težine i inkrementalni rebuild)
+    term_weights: Dict[str, np.ndarray]  # bodovanje -> težine pojmova (IDF)
+    postings: Dict[str, sp.csr_matrix]  # bodovanje -> invertirani indeks pojmovi x chunkovi (dijele strukturu)
+    dense: Optional[DenseIndex] = None  # samo za retriever="dense"
+    path: Optional[Path] = field(default=None, repr=False)
 
 
 class CorpusIndex:
-    """Vrlo mali lokalni indeks (TF-IDF preko chunka teksta).
+    """Vrlo mali lokalni indeks (TF-IDF / BM25 preko chunka teksta).
 
     Namijenjeno za prototip kolegija: stavi izvore kao .txt datoteke u data/corpus/.
+    `retriever` bira rangiranje: "tfidf", "bm25", "hybrid" (oba, skalirana i ponderirana s `hybrid_alpha`)
+    ili "dense" (ugradnje chunkova, vidi `src.tools.dense`).
+    Izgrađeni indeks sprema se u `index_dir` (zadano `<corpus_dir>/.index`) i pri
+    sljedećem pokretanju učitava (matrice kao memory-mapped .npy); ponovno se
+    obrađuju samo dodani, promijenjeni ili obrisani dokumenti.
+
+    `reload()` se smije zvati iz radne dretve: nova generacija se gradi sa strane i
+    zamjenjuje jednim pridruživanjem, a `search` radi na snimci koju je uzeo na početku.
+    S `read_only=True` indeks se ne gradi nego samo učitava generacija koju je izgradio
+    drugi proces (npr. više Istraživača nad istim `index_dir`).
+    Uz `build_workers > 1` dokumenti se čitaju, dijele i broje paralelno u zasebnim
+    procesima; rezultat je isti kao kod izgradnje u jednom procesu.
+
+    Datoteke se čitaju u blokovima od `block_chars` znakova i chunkaju usput, a tekstovi
+    chunkova odmah idu u pohranu na disku (`ChunkStore`), pa ni velika datoteka ni
+    cijeli korpus nisu u memoriji kao tekst; ni matrica frekvencija ni postinzi ne grade
+    se cijeli u memoriji (vidi `_fill`).
+    `chunking="sentence"` reže chunkove na kraju rečenice ili retka (najviše `chunk_chars`),
+    a preklapanje su cijele rečenice; "fixed" su prozori od točno `chunk_chars` znakova.
+
+    Rezultati zadnjih `query_cache_size` upita pamte se (LRU) dok se ne promijeni generacija;
+    ključ su poznati pojmovi upita, pa se upiti koji se razlikuju samo u interpunkciji,
+    velikim slovima ili stop-riječima računaju jednom.
     """
 
-    def __init__(self, corpus_dir: str, chunk_chars: int = 900, overlap: int = 150):
+    def __init__(
+        self,
+        corpus_dir: str,
+        chunk_chars: int = 900,
+        overlap: int = 150,
+        index_dir: Optional[str] = None,
+        retriever: str = "bm25",
+        stopwords: bool = True,
+        stemming: bool = False,
+        hybrid_alpha: float = 0.5,
+        bm25_k1: float = 1.2,
+        bm25_b: float = 0.75,
+        embedder: str = "hashing",
+        dense_dim: int = 256,
+        dense_quant: str = "int8",
+        dense_search: str = "exact",
+        ivf_nprobe: int = 8,
+        read_only: bool = False,
+        build_workers: int = 1,
+        block_chars: int = 1 << 20,
+        chunking: str = "sentence",
+        query_cache_size: int = 256,
+    ):
+        if retriever not in RETRIEVERS and retriever != "dense":
+            raise ValueError(f"Nepoznat retriever '{retriever}', dostupno: {', '.join([*RETRIEVERS, 'dense'])}")
+        if chunking not in CHUNKING:
+            raise ValueError(f"Nepoznat chunking '{chunking}', dostupno: {', '.join(CHUNKING)}")
+        if dense_quant not in DENSE_QUANTS:
+            raise ValueError(f"Nepoznata kvantizacija '{dense_quant}', dostupno: {', '.join(DENSE_QUANTS)}")
+        if dense_search not in DENSE_SEARCHES:
+            raise ValueError(f"Nepoznat dense_search '{dense_search}', dostupno: {', '.join(DENSE_SEARCHES)}")
         self.corpus_dir = Path(corpus_dir)
         self.chunk_chars = chunk_chars
         self.overlap = overlap
+        self.chunking = chunking
+        self.index_dir = Path(index_dir) if index_dir else self.corpus_dir / ".index"
+        self.retriever = retriever
+        self.hybrid_alpha = hybrid_alpha
+
+        self._analyzer = Analyzer(stopwords=stopwords, stemming=stemming)
+        self._scorers = make_scorers(k1=bm25_k1, b=bm25_b)
+        self._embedder = make_embedder(embedder, dim=dense_dim) if retriever == "dense" else None
+        self.dense_quant = dense_quant
+        self.dense_search = dense_search
+        self.ivf_nprobe = ivf_nprobe
+        self.read_only = read_only
+        self.build_workers = max(1, build_workers)
+        self.block_chars = max(1, block_chars)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._snap: Optional[IndexSnapshot] = None
+        # Prethodna generacija ostaje dostupna za `chunk_text` (reference poslane prije zamjene)
+        self._prev: Optional[IndexSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[tuple, List[Tuple[Chunk, float]]]" = OrderedDict()
+        self._query_cache_generation = 0
+        self._query_cache_lock = threading.Lock()
+        self.stats: Dict[str, float] = {
+            "generation": 0,
+            "reloads": 0,
+            "last_reload_s": 0.0,
+            "query_cache_hits": 0,
+            "query_cache_misses": 0,
+            "query_cache_invalidations": 0,
+        }
+
+    @property
+    def chunks(self) -> Sequence[Chunk]:
+        return self._snap.chunks if self._snap is not None else []
+
+    @property
+    def generation(self) -> int:
+        return self._snap.generation if self._snap is not None else 0
+
+    def build(self, force: bool = False) -> None:
+        """Učitaj indeks s diska i po potrebi ga inkrementalno osvježi (`force` = potpuna izgradnja)."""
+        if self.read_only:
+            self._follow()
+            return
+        files = self._corpus_files()
+        old = None if force else self._current_snapshot()
+        if old is not None and old.config != self._config():
+            old = None
+
+        manifest, reused = self._diff(files, old)
+        if old is not None and len(reused) == len(files) == len(old.manifest):
+            # Ništa se nije promijenilo (eventualno samo mtime); koristi postojeću generaciju
+            if manifest != old.manifest:
+                old.manifest = manifest
+                _write_json(old.path / "meta.json", self._meta(old))
+            self._use(old)
+        else:
+            snap = self._rebuild(files, manifest, reused, old)
+            self._save(snap)
+            self._use(snap)
+        self.stats["generation"] = self._snap.generation
+
+    def close(self) -> None:
+        """Ugasi procese za izgradnju (ako su pokrenuti)."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _follow(self) -> None:
+        """Samo čitanje: preuzmi generaciju na koju pokazuje CURRENT."""
+        snap = self._current_snapshot()
+        if snap is None:
+            raise FileNotFoundError(f"U {self.index_dir} još nema izgrađenog indeksa (read_only)")
+        if snap.config != self._config():
+            raise ValueError(f"Indeks u {self.index_dir} izgrađen je s drugačijim postavkama: {snap.config}")
+        self._use(snap)
+        self.stats["generation"] = snap.generation
+
+    def _use(self, snap: IndexSnapshot) -> None:
+        if snap is not self._snap:
+            self._prev = self._snap
+            self._snap = snap
 
-        self.chunks: List[Chunk] = []
-        self._vectorizer = TfidfVectorizer(stop_words=None)
-        self._X = None
+    def chunk_text(self, doc_id: str, chunk_id: int, generation: int) -> Optional[str]:
+        """Tekst chunka iz trenutne ili prethodne generacije; None ako ni jedna nije `generation`.
 
-    def build(self) -> None:
+        Agenti nad istim indeksom razmjenjuju dokaze kao (doc_id, chunk_id, generacija) umjesto
+        teksta (vidi `MessageCodec`). Čita samo već učitane generacije i ništa ne učitava; noviju
+        generaciju indeks samo za čitanje preuzima `reload` (MessageCodec.adecode to radi u
+        radnoj dretvi).
+        """
+        for snap in (self._snap, self._prev):
+            if snap is None or snap.generation != generation:
+                continue
+            entry = snap.manifest.get(f"{doc_id}.txt")
+            if entry is None or "rows" not in entry:
+                return None
+            start, end = entry["rows"]
+            row = start + chunk_id
+            if not start <= row < end:
+                return None
+            try:
+                return snap.chunks.text(row)
+            except (OSError, ValueError):  # generacija je upravo zamijenjena i zatvorena
+                return None
+        return None
+
+    def reload(self) -> bool:
+        """Osvježi indeks ako se korpus promijenio; vraća True ako je nova generacija u upotrebi."""
+        with self._reload_lock:
+            before = self._snap
+            t0 = time.perf_counter()
+            self.build()
+            if self._snap is before:
+                return False
+            self.stats["reloads"] += 1
+            self.stats["last_reload_s"] = time.perf_counter() - t0
+            return True
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[Chunk, float]]:
+        """Boduje samo chunkove koji dijele barem jedan pojam s upitom.
+
+        Posao raste s brojem pogođenih postinga, a ne s veličinom korpusa; chunkovi bez
+        zajedničkog pojma (rezultat 0) se ne vraćaju.
+        """
+        snap = self._snapshot()
+        if snap.dense is not None:
+            text = self._normalize(query)
+            hit = self._cached(snap, (text, top_k))
+            if hit is not None:
+                return hit
+            rows, scores = snap.dense.search(self._embedder.embed([text])[0], top_k)
+            return self._remember(snap, (text, top_k), _top_k(snap.chunks, rows, scores, top_k))
+        cols, counts = self._query_terms(snap, query)
+        key = (_terms_key(cols, counts), top_k)
+        hit = self._cached(snap, key)
+        if hit is not None:
+            return hit
+        rows = np.empty(0, dtype=np.int64)
+        parts = []
+        for name in RETRIEVERS[self.retriever]:
+            vals = self._scorers[name].query_weights(counts, snap.term_weights[name][cols])
+            # Svi postinzi dijele istu strukturu pa su i kandidati (rows) isti
+            rows, scores = _accumulate(snap.postings[name], cols, vals)
+            parts.append(scores)
+        return self._remember(snap, key, _top_k(snap.chunks, rows, fuse(parts, self.hybrid_alpha), top_k))
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[Chunk, float]]]:
+        """Kao `search` za više upita odjednom: jedno rijetko množenje (upiti x pojmovi) @ postinzi.
+
+        Upiti iz predmemorije i ponovljeni upiti unutar iste serije ne boduju se ponovno.
+        """
+        snap = self._snapshot()
+        if snap.dense is not None:
+            texts = [self._normalize(q) for q in queries]
+            keys = [(t, top_k) for t in texts]
+        else:
+            terms = [self._query_terms(snap, q) for q in queries]
+            keys = [(_terms_key(cols, counts), top_k) for cols, counts in terms]
+        results: Dict[tuple, List[Tuple[Chunk, float]]] = {}
+        todo: Dict[tuple, int] = {}  # ključ -> prvi upit s tim ključem
+        for i, key in enumerate(keys):
+            if key in results or key in todo:
+                with self._query_cache_lock:
+                    self.stats["query_cache_hits"] += 1  # ponovljen u istoj seriji
+                continue
+            hit = self._cached(snap, key)
+            if hit is not None:
+                results[key] = hit
+            else:
+                todo[key] = i
+        if todo and snap.dense is not None:
+            vecs = self._embedder.embed([texts[i] for i in todo.values()])
+            for key, v in zip(todo, vecs):
+                results[key] = self._remember(snap, key, _top_k(snap.chunks, *snap.dense.search(v, top_k), top_k))
+        elif todo:
+            batch = [terms[i] for i in todo.values()]
+            indptr = np.cumsum([0] + [len(cols) for cols, _ in batch])
+            indices = np.concatenate([cols for cols, _ in batch] or [np.empty(0, np.int32)])
+            parts = []
+            for name in RETRIEVERS[self.retriever]:
+                scorer, weights = self._scorers[name], snap.term_weights[name]
+                data = [scorer.query_weights(counts, weights[cols]) for cols, counts in batch]
+                Q = sp.csr_matrix(
+                    (np.concatenate(data or [np.empty(0, np.float32)]), indices, indptr),
+                    shape=(len(batch), len(snap.vocab)),
+                )
+                parts.append((Q @ snap.postings[name]).tocsr())
+            S = fuse_rows(parts, self.hybrid_alpha)
+            for i, key in enumerate(todo):
+                rows, scores = S.indices[S.indptr[i] : S.indptr[i + 1]], S.data[S.indptr[i] : S.indptr[i + 1]]
+                results[key] = self._remember(snap, key, _top_k(snap.chunks, rows, scores, top_k))
+        return [results[key] for key in keys]
+
+    def _cached(self, snap: IndexSnapshot, key: tuple) -> Optional[List[Tuple[Chunk, float]]]:
+        if self.query_cache_size <= 0:
+            return None
+        with self._query_cache_lock:
+            self._check_generation(snap)
+            hit = self._query_cache.get(key)
+            if hit is None:
+                self.stats["query_cache_misses"] += 1
+                return None
+            self._query_cache.move_to_end(key)
+            self.stats["query_cache_hits"] += 1
+            return list(hit)
+
+    def _remember(self, snap: IndexSnapshot, key: tuple, results: List[Tuple[Chunk, float]]):
+        if self.query_cache_size <= 0:
+            return results
+        with self._query_cache_lock:
+            self._check_generation(snap)
+            if self._query_cache_generation == snap.generation:
+                self._query_cache[key] = list(results)
+                self._query_cache.move_to_end(key)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return results
+
+    def _check_generation(self, snap: IndexSnapshot) -> None:
+        # Nova generacija poništava sve spremljene rezultate; pretraga koja je još na staroj
+        # snimci ih ne vraća natrag (poziva se pod _query_cache_lock)
+        if snap.generation > self._query_cache_generation:
+            if self._query_cache:
+                self.stats["query_cache_invalidations"] += 1
+            self._query_cache.clear()
+            self._query_cache_generation = snap.generation
+
+    @property
+    def query_cache_hit_rate(self) -> float:
+        lookups = self.stats["query_cache_hits"] + self.stats["query_cache_misses"]
+        return self.stats["query_cache_hits"] / lookups if lookups else 0.0
+
+    def _snapshot(self) -> IndexSnapshot:
+        snap = self._snap
+        if snap is None:
+            self.build()
+            snap = self._snap
+        return snap
+
+    @staticmethod #-> Github copilot je predlozio staticmethod ovdje
+    def _normalize(text: str) -> str:
+        text = text.replace("\r\n", "\n")
+        text = re.sub(r"\s+", " ", text).strip()
+        return text
+
+    def _chunk(self, text: str) -> List[str]:
+        return list(_iter_chunks(io.StringIO(text), self.chunk_chars, self.overlap, sentences=self.chunking == "sentence"))
+
+    # --- izgradnja ---
+
+    def _config(self) -> Dict[str, object]:
+        return {
+            "format": INDEX_FORMAT,
+            "chunk_chars": self.chunk_chars,
+            "overlap": self.overlap,
+            "chunking": self.chunking,
+            "stopwords": self._analyzer.stopwords,
+            "stemming": self._analyzer.stemming,
+            "bm25": [self._scorers["bm25"].k1, self._scorers["bm25"].b],
+            "dense": None
+            if self._embedder is None
+            else {"embedder": self._embedder.name, "quant": self.dense_quant, "search": self.dense_search},
+        }
+
+    def _corpus_files(self) -> List[Path]:
         files = sorted(self.corpus_dir.glob("*.txt"))
         if not files:
             # Kreiraj placeholder datoteku kako bi program radio.
@@ -46,43 +398,642 @@ class CorpusIndex:
                     encoding="utf-8",
                 )
             files = [placeholder]
+        return files
 
-        self.chunks = []
+    def _diff(self, files: List[Path], old: Optional[IndexSnapshot]) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """Usporedi datoteke s manifestom; vraća (novi manifest, nepromijenjeni unosi starog manifesta)."""
+        manifest: Dict[str, dict] = {}
+        reused: Dict[str, dict] = {}
+        old_manifest = old.manifest if old is not None else {}
         for f in files:
-            text = f.read_text(encoding="utf-8", errors="ignore")
-            text = self._normalize(text)
-            for i, chunk_text in enumerate(self._chunk(text)):
-                self.chunks.append(Chunk(doc_id=f.stem, chunk_id=i, text=chunk_text))
+            st = f.stat()
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+            prev = old_manifest.get(f.name)
+            if prev is not None and prev["mtime_ns"] == st.st_mtime_ns and prev["size"] == st.st_size:
+                entry["sha1"] = prev["sha1"]
+            else:
+                entry["sha1"] = _file_sha1(f)
+            if prev is not None and prev["sha1"] == entry["sha1"]:
+                entry["rows"] = prev["rows"]
+                reused[f.name] = prev
+            manifest[f.name] = entry
+        return manifest, reused
 
-        corpus_texts = [c.text for c in self.chunks]
-        self._X = self._vectorizer.fit_transform(corpus_texts)
+    def _rebuild(
+        self,
+        files: List[Path],
+        manifest: Dict[str, dict],
+        reused: Dict[str, dict],
+        old: Optional[IndexSnapshot],
+    ) -> IndexSnapshot:
+        generation = (old.generation if old is not None else self._last_generation()) + 1
+        staging = self._stage(generation)
+        writer = ChunkStoreWriter(staging)
+        try:
+            snap = self._fill(files, manifest, reused, old, writer, generation)
+        except BaseException:
+            writer.abort()
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        snap.path = staging
+        return snap
 
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[Chunk, float]]:
-        if self._X is None:
-            self.build()
-        q = self._vectorizer.transform([self._normalize(query)])
-        sims = cosine_similarity(q, self._X)[0]
-        idxs = sims.argsort()[::-1][:top_k]
-        out: List[Tuple[Chunk, float]] = []
-        for idx in idxs:
-            out.append((self.chunks[int(idx)], float(sims[int(idx)])))
+    def _fill(
+        self,
+        files: List[Path],
+        manifest: Dict[str, dict],
+        reused: Dict[str, dict],
+        old: Optional[IndexSnapshot],
+        writer: ChunkStoreWriter,
+        generation: int,
+    ) -> IndexSnapshot:
+        """Gradi generaciju u `writer.directory` s ograničenom memorijom.
+
+        Matrica frekvencija nikad nije cijela u memoriji: retci (redom datoteka) idu u
+        privremene datoteke, a zatim se u blokovima od najviše `_BUILD_BLOCK_NNZ` ne-nula
+        preslikavaju u konačne .npy datoteke i jednim prolazom razvrstavaju u postinge, po
+        rasponima pojmova. U memoriji su samo rječnik, brojači po pojmu i po retku te jedan blok.
+        Pojmovi koji se više ne pojavljuju ni u jednom chunku (obrisani ili promijenjeni
+        dokumenti) izbacuju se iz rječnika.
+        """
+        staging = writer.directory
+        vocab: Dict[str, int] = dict(old.vocab) if old is not None else {}
+        spill = _RowSpill(staging)
+        dense_parts: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+        embed_s = 0.0
+        embedded = 0
+
+        # Novi/promijenjeni dokumenti obrađuju se unaprijed (po potrebi paralelno), a spajaju
+        # se redom datoteka pa rječnik, retci i pohrana ispadaju isti kao kod slijedne izgradnje
+        fresh = [f for f in files if f.name not in reused]
+        t0 = time.perf_counter()
+        analyzed = self._analyze(fresh, writer)
+
+        for f in files:
+            row0 = len(writer)
+            prev = reused.get(f.name)
+            if prev is not None:
+                start, end = prev["rows"]
+                writer.copy_rows(old.chunks, start, end)
+                spill.copy_rows(old, start, end)
+                if self._embedder is not None:
+                    dense_parts.append(old.dense.rows(start, end))
+            else:
+                lengths, local_terms, data, indices, indptr = next(analyzed)
+                # Lokalni rječnik dokumenta -> globalni (novi pojmovi na kraj)
+                cols = np.fromiter((vocab.setdefault(t, len(vocab)) for t in local_terms), np.int32, len(local_terms))
+                spill.append(data, cols[indices], indptr, len(vocab))
+                if self._embedder is not None:
+                    t1 = time.perf_counter()
+                    for a in range(row0, len(writer), 512):
+                        texts = writer.texts(a, min(len(writer), a + 512))
+                        dense_parts.append(DenseIndex.quantize(self._embedder.embed(texts), self.dense_quant))
+                    embed_s += time.perf_counter() - t1
+                    embedded += len(writer) - row0
+            manifest[f.name]["rows"] = [row0, len(writer)]
+        if fresh:
+            build_s = max(time.perf_counter() - t0 - embed_s, 1e-9)
+            self.stats["build_docs_per_s"] = len(fresh) / build_s
+            self.stats["build_mb_per_s"] = sum(manifest[f.name]["size"] for f in fresh) / build_s / 1e6
+
+        # Rječnik samo sa živim pojmovima; stari stupci -> novi (redoslijed pojmova ostaje)
+        df = np.zeros(len(vocab), dtype=np.int64)
+        df[: len(spill.df)] = spill.df
+        live = df > 0
+        remap = (np.cumsum(live) - 1).astype(np.int32)
+        terms = [""] * len(vocab)
+        for term, col in vocab.items():
+            terms[col] = term
+        vocab = {t: i for i, t in enumerate(t for t, keep in zip(terms, live) if keep)}
+        del terms
+        self.stats["pruned_terms"] = int(len(live) - len(vocab))
+        spill.close()
+        _write_matrices(staging, spill, remap, df[live], self._scorers)
+        spill.remove()
+
+        dense = None
+        if self._embedder is not None:
+            dense = DenseIndex.from_parts(
+                dense_parts, self._embedder.dim, self.dense_quant, search=self.dense_search, nprobe=self.ivf_nprobe
+            )
+            if embedded:
+                self.stats["dense_build_chunks_per_s"] = embedded / max(embed_s, 1e-9)
+        chunks = writer.close()
+        tf, term_weights, postings = _open_matrices(staging, len(chunks), len(vocab), self._scorers)
+        return IndexSnapshot(
+            generation=generation,
+            config=self._config(),
+            manifest=manifest,
+            chunks=chunks,
+            vocab=vocab,
+            tf=tf,
+            term_weights=term_weights,
+            postings=postings,
+            dense=dense,
+        )
+
+    def _analyze(self, files: List[Path], writer: ChunkStoreWriter) -> Iterator[tuple]:
+        """`_analyze_document` za svaku datoteku, redom; uz više datoteka i `build_workers > 1` u procesima.
+
+        Slijedno se tekstovi dopisuju ravno u `writer`; procesi pišu svaki u svoju
+        privremenu datoteku, koja se prepiše u `writer` kad dođe red na taj dokument.
+        """
+        args = (self.chunk_chars, self.overlap, self._analyzer, self.block_chars, self.chunking == "sentence")
+        if self.build_workers <= 1 or len(files) < 2:
+            for f in files:
+                writer.flush()
+                result = _analyze_document(str(f), *args, str(writer.path))
+                writer.extend(f.stem, result[0])
+                yield result
+            return
+        if self._pool is None:
+            # spawn: reload se zove iz radne dretve, a fork procesa s dretvama nije siguran
+            self._pool = ProcessPoolExecutor(self.build_workers, mp_context=multiprocessing.get_context("spawn"))
+        n = len(files)
+        parts = [writer.directory / f"part-{i:06d}.bin" for i in range(n)]
+        results = self._pool.map(
+            _analyze_document,
+            [str(f) for f in files],
+            *([a] * n for a in args),
+            [str(p) for p in parts],
+            chunksize=max(1, n // (self.build_workers * 4)),
+        )
+        for f, part, result in zip(files, parts, results):
+            writer.append_file(part, f.stem, result[0])
+            part.unlink()
+            yield result
+
+    def _query_terms(self, snap: IndexSnapshot, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Stupci i frekvencije poznatih pojmova upita."""
+        counts = Counter(t for t in self._analyzer(self._normalize(query)) if t in snap.vocab)
+        cols = np.fromiter((snap.vocab[t] for t in counts), dtype=np.int32, count=len(counts))
+        return cols, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+    # --- spremanje / učitavanje ---
+
+    def _meta(self, snap: IndexSnapshot) -> dict:
+        return {
+            "generation": snap.generation,
+            "config": snap.config,
+            "manifest": snap.manifest,
+            "n_chunks": len(snap.chunks),
+            "n_terms": len(snap.vocab),
+        }
+
+    def _stage(self, generation: int) -> Path:
+        """Privremeni direktorij nove generacije (tekstovi chunkova pišu se u njega već tijekom izgradnje)."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_dir / f".gen-{generation:06d}-{uuid.uuid4().hex[:8]}.tmp"
+        tmp.mkdir()
+        return tmp
+
+    def _save(self, snap: IndexSnapshot) -> None:
+        """Dovrši generaciju u privremenom direktoriju i atomarno preusmjeri CURRENT na nju."""
+        tmp = snap.path
+        name = tmp.name[1 : -len(".tmp")]
+
+        terms = [""] * len(snap.vocab)
+        for term, col in snap.vocab.items():
+            terms[col] = term
+        _write_json(tmp / "vocab.json", terms)
+        # Matrice (tf, težine, postinzi) `_fill` je već zapisao u ovaj direktorij
+        if snap.dense is not None:
+            snap.dense.save(tmp)
+        _write_json(tmp / "meta.json", self._meta(snap))
+
+        final = self.index_dir / name
+        tmp.rename(final)
+        pointer = self.index_dir / f".CURRENT.{uuid.uuid4().hex[:8]}"
+        pointer.write_text(name, encoding="utf-8")
+        os.replace(pointer, self.index_dir / "CURRENT")
+        snap.path = final
+
+        # Zadrži samo trenutnu i prethodnu generaciju
+        gens = sorted((p for p in self.index_dir.glob("gen-*") if p.is_dir()), key=_gen_number)
+        for p in gens[:-2]:
+            if p != final:
+                shutil.rmtree(p, ignore_errors=True)
+
+    def _load_current(self) -> Optional[IndexSnapshot]:
+        try:
+            name = (self.index_dir / "CURRENT").read_text(encoding="utf-8").strip()
+            path = self.index_dir / name
+            meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+            if meta.get("config", {}).get("format") != INDEX_FORMAT:
+                return None
+            terms = json.loads((path / "vocab.json").read_text(encoding="utf-8"))
+            tf, term_weights, postings = _open_matrices(path, meta["n_chunks"], meta["n_terms"], self._scorers)
+            chunks = ChunkStore(path)
+            dense = DenseIndex.load(path, nprobe=self.ivf_nprobe) if meta["config"].get("dense") else None
+        except (OSError, ValueError, KeyError):
+            return None
+        return IndexSnapshot(
+            generation=int(meta["generation"]),
+            config=meta["config"],
+            manifest=meta["manifest"],
+            chunks=chunks,
+            vocab={t: i for i, t in enumerate(terms)},
+            tf=tf,
+            term_weights=term_weights,
+            postings=postings,
+            dense=dense,
+            path=path,
+        )
+
+    def _current_snapshot(self) -> Optional[IndexSnapshot]:
+        """Snimka u memoriji ako je još aktualna na disku, inače učitaj onu na koju pokazuje CURRENT."""
+        snap = self._snap
+        if snap is not None and snap.path is not None:
+            try:
+                if (self.index_dir / "CURRENT").read_text(encoding="utf-8").strip() == snap.path.name:
+                    return snap
+            except OSError:
+                pass
+        return self._load_current()
+
+    def _last_generation(self) -> int:
+        gens = [_gen_number(p) for p in self.index_dir.glob("gen-*")]
+        return max(gens, default=0)
+
+
+def _chunk_text(text: str, chunk_chars: int, overlap: int) -> List[str]:
+    chunks: List[str] = []
+    n = len(text)
+    start = 0
+    while start < n:
+        end = min(n, start + chunk_chars)
+        chunk = text[start:end]
+        chunks.append(chunk)
+        if end == n:
+            break
+        start = max(0, end - overlap)
+    return chunks
+
+
+def _normalized_blocks(src: TextIO, block_chars: int, keep_lines: bool = False) -> Iterator[str]:
+    """Blokovi teksta normalizirani kao `CorpusIndex._normalize`; uz `keep_lines` razmaci s novim retkom postaju "\n"."""
+    pending = ""  # razmak na kraju pročitanog; ulazi u tekst tek ako iza njega dođe još nešto
+    started = False
+    while block := src.read(block_chars):
+        text = _SPACE_RE.sub(" ", _LINE_WS_RE.sub("\n", block)) if keep_lines else _WS_RE.sub(" ", block)
+        if text[0] in " \n":
+            pending = "\n" if "\n" in (pending, text[0]) else " "
+            text = text[1:]
+        if not text:
+            continue
+        if pending and started:
+            text = pending + text
+        started = True
+        pending = ""
+        if text[-1] in " \n":
+            pending, text = text[-1], text[:-1]
+        yield text
+
+
+def _iter_chunks(
+    src: TextIO, chunk_chars: int, overlap: int, block_chars: int = 1 << 20, sentences: bool = False
+) -> Iterator[str]:
+    """Chunkovi teksta čitanjem u blokovima; u memoriji je najviše jedan blok i započeti chunk.
+
+    Bez `sentences` isti su kao `_chunk_text(CorpusIndex._normalize(src.read()), ...)`.
+    """
+    step = chunk_chars - overlap
+    buf = ""
+    for text in _normalized_blocks(src, block_chars, keep_lines=sentences):
+        buf += text
+        pos = 0
+        while len(buf) - pos > chunk_chars:
+            if sentences:
+                cut, nxt = _sentence_cut(buf, pos, chunk_chars, overlap)
+                if buf[pos:cut].strip():
+                    yield buf[pos:cut].strip()
+                pos = nxt
+            else:
+                # Chunk koji ne završava na kraju teksta dug je točno chunk_chars; sljedeći počinje `step` dalje
+                yield buf[pos : pos + chunk_chars]
+                pos += step
+        buf = buf[pos:]
+    if sentences:
+        buf = buf.strip()
+    if buf:
+        yield buf
+
+
+def _sentence_cut(buf: str, pos: int, chunk_chars: int, overlap: int) -> Tuple[int, int]:
+    """Kraj chunka koji počinje na `pos` i početak sljedećeg (preklapanje od cijelih rečenica).
+
+    Kraj je zadnja granica rečenice/retka u drugoj polovici prozora, inače zadnji razmak,
+    inače tvrdi rez na `chunk_chars`; sljedeći chunk počinje na prvoj granici unutar
+    zadnjih `overlap` znakova (inače na prvoj riječi tamo), pa riječi nisu prerezane.
+    """
+    limit = pos + chunk_chars
+    bounds = [m.end() for m in _SENTENCE_RE.finditer(buf, pos, limit + 1) if m.end() <= limit]
+    lo = pos + chunk_chars // 2
+    cut = next((b for b in reversed(bounds) if b >= lo), 0)
+    if not cut:
+        space = max(buf.rfind(" ", lo, limit), buf.rfind("\n", lo, limit))
+        cut = space + 1 if space >= 0 else limit
+    start = max(pos + 1, cut - overlap)
+    nxt = next((b for b in bounds if start <= b < cut), 0)
+    if not nxt:
+        space = min((i for i in (buf.find(" ", start, cut), buf.find("\n", start, cut)) if i >= 0), default=-1)
+        nxt = space + 1 if space >= 0 else cut
+    return cut, nxt
+
+
+def _count_terms(
+    texts: Iterable[str], vocab: Dict[str, int], analyzer: Analyzer
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Frekvencije pojmova po chunku (CSR dijelovi); nove pojmove dodaje na kraj rječnika."""
+    # array umjesto liste: 4-8 bajta po stavci umjesto Python objekta
+    data = array("i")
+    indices = array("i")
+    indptr = array("q", [0])
+    for text in texts:
+        for term, cnt in Counter(analyzer(text)).items():
+            col = vocab.get(term)
+            if col is None:
+                col = vocab[term] = len(vocab)
+            indices.append(col)
+            data.append(cnt)
+        indptr.append(len(indices))
+    return (
+        np.frombuffer(data, dtype=np.int32),
+        np.frombuffer(indices, dtype=np.int32),
+        np.frombuffer(indptr, dtype=np.int64),
+    )
+
+
+def _analyze_document(
+    path: str, chunk_chars: int, overlap: int, analyzer: Analyzer, block_chars: int, sentences: bool, out_path: str
+):
+    """Čitanje u blokovima, normalizacija, chunkanje i brojanje pojmova jednog dokumenta (može u drugom procesu).
+
+    Tekstove chunkova dopisuje na kraj `out_path` (UTF-8); vraća (duljine chunkova u bajtovima,
+    lokalni rječnik redom pojavljivanja, data, indices, indptr).
+    """
+    lengths: List[int] = []
+
+    def spill(texts: Iterable[str]) -> Iterator[str]:
+        for text in texts:
+            encoded = text.encode("utf-8")
+            out.write(encoded)
+            lengths.append(len(encoded))
+            yield text
+
+    local: Dict[str, int] = {}
+    with open(path, encoding="utf-8", errors="ignore") as src, open(out_path, "ab") as out:
+        chunks = _iter_chunks(src, chunk_chars, overlap, block_chars, sentences)
+        data, indices, indptr = _count_terms(spill(chunks), local, analyzer)
+    return np.asarray(lengths, dtype=np.int64), list(local), data, indices, indptr
+
+
+class _RowSpill:
+    """Retci matrice frekvencija tijekom izgradnje: stupci i frekvencije u privremenim datotekama.
+
+    U memoriji su samo brojači: ne-nule po retku, broj chunkova po pojmu (df) i zbroj frekvencija.
+    """
+
+    def __init__(self, directory: Path):
+        self.cols_path = directory / "spill_cols.bin"
+        self.data_path = directory / "spill_tf.bin"
+        self._cols = open(self.cols_path, "wb")
+        self._data = open(self.data_path, "wb")
+        self.row_nnz = array("q")
+        self.df = np.zeros(0, dtype=np.int64)
+        self.total = 0
+
+    def append(self, data: np.ndarray, cols: np.ndarray, indptr: np.ndarray, n_terms: int) -> None:
+        cols = np.asarray(cols, dtype=np.int32)
+        data = np.asarray(data, dtype=np.int32)
+        self._cols.write(cols.tobytes())
+        self._data.write(data.tobytes())
+        self.row_nnz.frombytes(np.diff(indptr).astype(np.int64).tobytes())
+        if len(self.df) < n_terms:
+            self.df = np.concatenate([self.df, np.zeros(n_terms - len(self.df), dtype=np.int64)])
+        self.df += np.bincount(cols, minlength=len(self.df))
+        self.total += int(data.sum(dtype=np.int64))
+
+    def copy_rows(self, snap: IndexSnapshot, start: int, end: int) -> None:
+        """Retci [start, end) prethodne generacije, čitani iz njezinih datoteka u blokovima (ne kroz mmap)."""
+        indptr = np.asarray(snap.tf.indptr[start : end + 1], dtype=np.int64)
+        with _NpyReader(snap.path / "indices.npy") as indices, _NpyReader(snap.path / "tf.npy") as data:
+            for a, b in _row_blocks(indptr):
+                lo, hi = int(indptr[a]), int(indptr[b])
+                self.append(data.read(lo, hi), indices.read(lo, hi), indptr[a : b + 1] - lo, len(snap.vocab))
+
+    def indptr(self) -> np.ndarray:
+        out = np.zeros(len(self.row_nnz) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.row_nnz, dtype=np.int64), out=out[1:])
         return out
 
-    @staticmethod #-> Github copilot je predlozio staticmethod ovdje 
-    def _normalize(text: str) -> str:
-        text = text.replace("\r\n", "\n")
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+    def close(self) -> None:
+        self._cols.close()
+        self._data.close()
 
-    def _chunk(self, text: str) -> List[str]:
-        chunks: List[str] = []
-        n = len(text)
-        start = 0
-        while start < n:
-            end = min(n, start + self.chunk_chars)
-            chunk = text[start:end]
-            chunks.append(chunk)
-            if end == n:
-                break
-            start = max(0, end - self.overlap)
-        return chunks
+    def remove(self) -> None:
+        self.cols_path.unlink(missing_ok=True)
+        self.data_path.unlink(missing_ok=True)
+
+
+class _NpyWriter:
+    """1-D .npy datoteka poznate duljine koja se puni redom, blok po blok."""
+
+    def __init__(self, path: Path, dtype, length: int):
+        self.dtype = np.dtype(dtype)
+        self._fh = open(path, "wb")
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (length,)}
+        np.lib.format.write_array_header_1_0(self._fh, header)
+
+    def write(self, values: np.ndarray) -> None:
+        self._fh.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+
+    def __enter__(self) -> "_NpyWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._fh.close()
+
+
+class _NpyReader:
+    """Dio 1-D .npy datoteke običnim čitanjem (bez mmap-a, pa pročitano ne ostaje u RSS-u procesa)."""
+
+    def __init__(self, path: Path):
+        self._fh = open(path, "rb")
+        version = np.lib.format.read_magic(self._fh)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        _, _, self.dtype = read_header(self._fh)
+        self._offset = self._fh.tell()
+
+    def read(self, lo: int, hi: int) -> np.ndarray:
+        self._fh.seek(self._offset + lo * self.dtype.itemsize)
+        return np.frombuffer(self._fh.read((hi - lo) * self.dtype.itemsize), dtype=self.dtype)
+
+    def __enter__(self) -> "_NpyReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._fh.close()
+
+
+def _row_blocks(indptr: np.ndarray) -> Iterator[Tuple[int, int]]:
+    """Rasponi redaka [a, b) s najviše `_BUILD_BLOCK_NNZ` ne-nula (barem jedan redak)."""
+    n = len(indptr) - 1
+    a = 0
+    while a < n:
+        b = int(np.searchsorted(indptr, indptr[a] + _BUILD_BLOCK_NNZ, side="right")) - 1
+        b = min(max(b, a + 1), n)
+        yield a, b
+        a = b
+
+
+def _write_matrices(directory: Path, spill: _RowSpill, remap: np.ndarray, df: np.ndarray, scorers: Dict[str, object]) -> None:
+    """Iz retaka u `spill` zapiši tf (CSR), IDF i postinge svih bodovanja kao .npy, u blokovima.
+
+    Postinzi se transponiraju sortiranjem prebrojavanjem u dvije razine: `df` unaprijed daje
+    mjesto svakog pojma, pa jedini prolaz po retcima (novi stupci, težine) razvrstava ne-nule
+    po rasponima pojmova u privremenu datoteku, svaki raspon u svoj unaprijed poznat dio.
+    Zatim se svaki raspon (najviše `_BUILD_BLOCK_NNZ` ne-nula ili jedan pojam) pročita jednom
+    i stabilno sortira po pojmu, pa su retci unutar pojma rastući kao kod sortiranja cijele matrice.
+    """
+    indptr = spill.indptr()
+    n_rows, nnz, n_terms = len(indptr) - 1, int(indptr[-1]), len(df)
+    avg_len = spill.total / n_rows if n_rows and spill.total > 0 else 1.0
+    np.save(directory / "indptr.npy", indptr)
+    idf = {name: scorer.term_weights(df, n_rows) for name, scorer in scorers.items()}
+    for name, weights in idf.items():
+        np.save(directory / f"idf_{name}.npy", weights)
+    post_ptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(df, out=post_ptr[1:])
+    np.save(directory / "post_ptr.npy", post_ptr)
+
+    bounds = [0]
+    while bounds[-1] < n_terms:
+        lo = bounds[-1]
+        hi = int(np.searchsorted(post_ptr, post_ptr[lo] + _BUILD_BLOCK_NNZ, side="right")) - 1
+        bounds.append(min(max(hi, lo + 1), n_terms))
+    bounds = np.asarray(bounds, dtype=np.int64)
+    # Zapis ne-nule u privremenoj datoteci: pojam, redak i težina svakog bodovanja
+    record = np.dtype([("col", np.int32), ("row", np.int32)] + [(f"w_{name}", np.float32) for name in scorers])
+    buckets_path = directory / "post_buckets.bin"
+
+    # 1) Retci: stupci novog rječnika, frekvencije i težine; ne-nule razvrstane po rasponima pojmova
+    cursor = post_ptr[bounds[:-1]].copy()
+    with ExitStack() as stack:
+        cols_in = stack.enter_context(open(spill.cols_path, "rb"))
+        data_in = stack.enter_context(open(spill.data_path, "rb"))
+        indices_out = stack.enter_context(_NpyWriter(directory / "indices.npy", np.int32, nnz))
+        tf_out = stack.enter_context(_NpyWriter(directory / "tf.npy", np.int32, nnz))
+        buckets = stack.enter_context(open(buckets_path, "wb"))
+        for a, b in _row_blocks(indptr):
+            n = int(indptr[b] - indptr[a])
+            cols = remap[np.frombuffer(cols_in.read(4 * n), dtype=np.int32)]
+            data = np.frombuffer(data_in.read(4 * n), dtype=np.int32)
+            block = sp.csr_matrix((data, cols, indptr[a : b + 1] - indptr[a]), shape=(b - a, n_terms))
+            indices_out.write(cols)
+            tf_out.write(data)
+            entries = np.empty(n, dtype=record)
+            entries["col"] = cols
+            entries["row"] = np.repeat(np.arange(a, b, dtype=np.int32), np.diff(indptr[a : b + 1]))
+            for name, scorer in scorers.items():
+                entries[f"w_{name}"] = scorer.doc_weights(block, idf[name], avg_len)
+            part = np.searchsorted(bounds, cols, side="right") - 1
+            entries = entries[np.argsort(part, kind="stable")]
+            counts = np.bincount(part, minlength=len(cursor))
+            offset = 0
+            for r in np.flatnonzero(counts):
+                buckets.seek(int(cursor[r]) * record.itemsize)
+                buckets.write(entries[offset : offset + counts[r]].tobytes())
+                offset += int(counts[r])
+                cursor[r] += counts[r]
+
+    # 2) Postinzi: svaki raspon pojmova jednom iz privremene datoteke, sortiran po pojmu
+    with ExitStack() as stack:
+        buckets = stack.enter_context(open(buckets_path, "rb"))
+        rows_out = stack.enter_context(_NpyWriter(directory / "post_rows.npy", np.int32, nnz))
+        post_out = {
+            name: stack.enter_context(_NpyWriter(directory / f"post_w_{name}.npy", np.float32, nnz)) for name in scorers
+        }
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            start, end = int(post_ptr[lo]), int(post_ptr[hi])
+            buckets.seek(start * record.itemsize)
+            entries = np.frombuffer(buckets.read((end - start) * record.itemsize), dtype=record)
+            entries = entries[np.argsort(entries["col"], kind="stable")]
+            rows_out.write(entries["row"])
+            for name, writer in post_out.items():
+                writer.write(entries[f"w_{name}"])
+    buckets_path.unlink()
+
+
+def _open_matrices(
+    path: Path, n_chunks: int, n_terms: int, scorers: Dict[str, object]
+) -> Tuple[sp.csr_matrix, Dict[str, np.ndarray], Dict[str, sp.csr_matrix]]:
+    """tf, IDF i postinzi generacije u `path` (matrice kao memory-mapped .npy)."""
+    indptr = np.load(path / "indptr.npy", mmap_mode="r")
+    indices = np.load(path / "indices.npy", mmap_mode="r")
+    shape = (n_chunks, n_terms)
+    tf = sp.csr_matrix((np.load(path / "tf.npy", mmap_mode="r"), indices, indptr), shape=shape, copy=False)
+    post_rows = np.load(path / "post_rows.npy", mmap_mode="r")
+    post_ptr = np.load(path / "post_ptr.npy", mmap_mode="r")
+    term_weights = {name: np.load(path / f"idf_{name}.npy") for name in scorers}
+    postings = {
+        name: sp.csr_matrix(
+            (np.load(path / f"post_w_{name}.npy", mmap_mode="r"), post_rows, post_ptr),
+            shape=(shape[1], shape[0]),
+            copy=False,
+        )
+        for name in scorers
+    }
+    return tf, term_weights, postings
+
+
+def _accumulate(postings: sp.csr_matrix, cols: np.ndarray, vals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Zbroji doprinose pojmova upita po chunkovima; čita samo postinge tih pojmova."""
+    if len(cols) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    rows = []
+    weights = []
+    for col, val in zip(cols, vals):
+        start, end = postings.indptr[col], postings.indptr[col + 1]
+        rows.append(postings.indices[start:end])
+        weights.append(postings.data[start:end] * val)
+    uniq, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+    return uniq, np.bincount(inverse, weights=np.concatenate(weights))
+
+
+def _terms_key(cols: np.ndarray, counts: np.ndarray) -> tuple:
+    """Ključ predmemorije upita: poznati pojmovi (stupci) i njihove frekvencije, neovisno o redoslijedu."""
+    return tuple(sorted(zip(cols.tolist(), counts.tolist())))
+
+
+def _top_k(chunks: ChunkStore, rows: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[Chunk, float]]:
+    """Djelomični odabir (argpartition) najboljih k kandidata, pa sortiranje samo njih."""
+    if top_k <= 0 or len(scores) == 0:
+        return []
+    if len(scores) > top_k:
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.lexsort((rows[best], -scores[best]))]  # jednaki rezultati: redoslijed u korpusu
+    return [(chunks[int(rows[i])], float(scores[i])) for i in best]
+
+
+def _file_sha1(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        while block := fh.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _gen_number(path: Path) -> int:
+    try:
+        return int(path.name.split("-")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _write_json(path: Path, obj) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from spade.message import Message
+
+Key = Tuple[str, str, str]  # (conversation-id, role, claim-id)
+
+
+class ReplyCorrelator:
+    """Povezuje dolazne odgovore s razgovorima koji ih čekaju.
+
+    Svaki čekatelj dobiva vlastiti `asyncio.Future` pod ključem (conversation-id, role,
+    claim-id), pa se budi čim odgovor stigne i ima točan rok. `claim-id` je prazan osim
+    kad jedan razgovor ima više istovremenih zahtjeva iste uloge (provjera po tvrdnjama). Odgovor koji stigne prije nego što
+    ga netko čeka (ili izvan redoslijeda) čuva se ograničeno vrijeme u međuspremniku.
+    """
+
+    def __init__(self, buffer_ttl: float = 30.0, max_buffered: int = 256, logger: Optional[logging.Logger] = None):
+        self.buffer_ttl = buffer_ttl
+        self.max_buffered = max_buffered
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._pending: Dict[Key, asyncio.Future] = {}
+        self._buffer: "OrderedDict[Key, Tuple[Message, float]]" = OrderedDict()
+
+    @staticmethod
+    def key_of(msg: Message) -> Key:
+        md = msg.metadata
+        return (md.get("conversation-id", ""), md.get("role", ""), md.get("claim-id", ""))
+
+    def deliver(self, msg: Message) -> bool:
+        """Preusmjeri poruku čekatelju. Vraća False ako je poruka samo spremljena/odbačena."""
+        key = self.key_of(msg)
+        fut = self._pending.pop(key, None)
+        if fut is not None and not fut.done():
+            fut.set_result(msg)
+            return True
+
+        self._expire()
+        if key in self._buffer:
+            self.logger.warning("Dupli odgovor odbačen: conversation_id=%s role=%s claim_id=%s", *key)
+            return False
+        self._buffer[key] = (msg, time.monotonic() + self.buffer_ttl)
+        while len(self._buffer) > self.max_buffered:
+            old_key, _ = self._buffer.popitem(last=False)
+            self.logger.warning("Međuspremnik pun, odbačen odgovor: conversation_id=%s role=%s claim_id=%s", *old_key)
+        return False
+
+    async def wait(self, conversation_id: str, role: str, timeout: float, claim_id: str = "") -> Optional[Message]:
+        """Čekaj odgovor (conversation_id, role, claim_id) najviše `timeout` sekundi."""
+        key = (conversation_id, role, claim_id)
+        buffered = self._buffer.pop(key, None)
+        if buffered is not None and buffered[1] >= time.monotonic():
+            return buffered[0]
+
+        fut = self._pending.get(key)
+        if fut is None or fut.done():
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[key] = fut
+        try:
+            return await asyncio.wait_for(fut, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if self._pending.get(key) is fut:
+                del self._pending[key]
+
+    def discard(self, conversation_id: str) -> None:
+        """Zaboravi sve čekatelje i spremljene odgovore završenog razgovora."""
+        for key in [k for k in self._pending if k[0] == conversation_id]:
+            self._pending.pop(key).cancel()
+        for key in [k for k in self._buffer if k[0] == conversation_id]:
+            del self._buffer[key]
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._buffer:
+            key, (_, expires) = next(iter(self._buffer.items()))
+            if expires >= now:
+                break
+            del self._buffer[key]
+            self.logger.warning("Istekao nepreuzeti odgovor: conversation_id=%s role=%s claim_id=%s", *key)
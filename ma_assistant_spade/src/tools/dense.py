@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.tools.ranking import Analyzer
+
+# Gusto (dense) pretraživanje za CorpusIndex: ugradnje chunkova (lokalni model ili
+# deterministički hashing), kvantizirane na disku (float16/int8) i mapirane u memoriju.
+
+DENSE_QUANTS = ("int8", "float16")
+DENSE_SEARCHES = ("exact", "ivf")
+
+try:  # opcionalno: mali CPU model, ako je paket instaliran
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - ovisi o okruženju
+    SentenceTransformer = None
+
+
+@lru_cache(maxsize=200_000)
+def _hashed_features(token: str, dim: int, ngram: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Indeksi i predznaci za riječ i njezine znakovne n-grame (stabilno između procesa)."""
+    padded = f"<{token}>"
+    feats = [token] + [padded[i : i + ngram] for i in range(max(1, len(padded) - ngram + 1))]
+    idx: List[int] = []
+    sign: List[float] = []
+    for f in feats:
+        h = int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+        idx.append(h % dim)
+        sign.append(1.0 if (h >> 63) & 1 else -1.0)
+    return tuple(idx), tuple(sign)
+
+
+class HashingEmbedder:
+    """Deterministička lokalna ugradnja: hashing riječi i znakovnih n-grama u `dim` dimenzija.
+
+    Znakovni n-grami hvataju različite oblike iste riječi (padeži), pa pomaže i bez modela.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3, analyzer: Optional[Analyzer] = None):
+        self.dim = dim
+        self.ngram = ngram
+        self.analyzer = analyzer or Analyzer(stopwords=True, stemming=False)
+        self.name = f"hashing-{dim}-{ngram}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            idx: List[int] = []
+            sign: List[float] = []
+            for token in self.analyzer(text):
+                i, s = _hashed_features(token, self.dim, self.ngram)
+                idx.extend(i)
+                sign.extend(s)
+            if idx:
+                out[row] = np.bincount(idx, weights=sign, minlength=self.dim)
+        return _l2(out)
+
+
+class SentenceTransformerEmbedder:
+    """Mali CPU model (npr. paraphrase-multilingual-MiniLM-L12-v2) preko sentence-transformers."""
+
+    def __init__(self, model_name: str):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.name = f"st:{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = self.model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vecs, dtype=np.float32)
+
+
+def make_embedder(spec: str, dim: int = 256):
+    """`hashing` ili ime sentence-transformers modela.
+
+    Bez paketa model se ne zamjenjuje tiho hashing ugradnjom: indeks izgrađen jednom, a
+    pretraživan drugom ugradnjom vraćao bi besmislene rezultate.
+    """
+    if not spec or spec == "hashing":
+        return HashingEmbedder(dim=dim)
+    if SentenceTransformer is None:
+        raise ValueError(
+            f"EMBEDDER={spec} zahtijeva paket sentence-transformers (pip install sentence-transformers) ili EMBEDDER=hashing"
+        )
+    return SentenceTransformerEmbedder(spec)
+
+
+class DenseIndex:
+    """Kvantizirani vektori chunkova s točnim (brute-force) ili IVF pretraživanjem.
+
+    int8: kod po elementu + float32 skala po retku; float16: vektori izravno. Skalarni
+    produkt računa se u blokovima kako bi privremena memorija ostala ograničena.
+    """
+
+    BLOCK = 65_536
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray],
+        centroids: Optional[np.ndarray] = None,
+        ivf_ptr: Optional[np.ndarray] = None,
+        ivf_rows: Optional[np.ndarray] = None,
+        nprobe: int = 8,
+    ):
+        self.codes = codes
+        self.scales = scales
+        self.centroids = centroids
+        self.ivf_ptr = ivf_ptr
+        self.ivf_rows = ivf_rows
+        self.nprobe = nprobe
+        self.stats: Dict[str, float] = {"queries": 0, "last_query_ms": 0.0, "total_query_ms": 0.0}
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def quant(self) -> str:
+        return "int8" if self.scales is not None else "float16"
+
+    @staticmethod
+    def quantize(vectors: np.ndarray, quant: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if quant == "float16":
+            return vectors.astype(np.float16), None
+        if quant != "int8":
+            raise ValueError(f"Nepoznata kvantizacija '{quant}' (int8|float16)")
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, np.float32)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    @classmethod
+    def from_parts(
+        cls,
+        parts: List[Tuple[np.ndarray, Optional[np.ndarray]]],
+        dim: int,
+        quant: str,
+        search: str = "exact",
+        nprobe: int = 8,
+    ) -> "DenseIndex":
+        """Spoji kvantizirane dijelove (npr. stari + novi dokumenti) i po potrebi izgradi IVF."""
+        dtype = np.int8 if quant == "int8" else np.float16
+        codes = np.concatenate([c for c, _ in parts]) if parts else np.empty((0, dim), dtype=dtype)
+        scales = None
+        if quant == "int8":
+            scales = np.concatenate([s for _, s in parts]) if parts else np.empty(0, np.float32)
+        index = cls(codes, scales, nprobe=nprobe)
+        if search == "ivf" and len(index) > 0:
+            index._build_ivf()
+        return index
+
+    def rows(self, start: int, end: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return np.asarray(self.codes[start:end]), (None if self.scales is None else np.asarray(self.scales[start:end]))
+
+    def _dequantize(self, rows) -> np.ndarray:
+        block = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def _build_ivf(self, sample: int = 20_000, iters: int = 10, seed: int = 0) -> None:
+        """Sferni k-means (nlist ~ sqrt(n)) na uzorku, pa invertirane liste po centroidu."""
+        n = len(self)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        train = self._dequantize(np.sort(rng.choice(n, size=min(n, sample), replace=False)))
+        centroids = train[rng.choice(len(train), size=min(nlist, len(train)), replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _l2(sums)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, self.BLOCK):
+            end = min(n, start + self.BLOCK)
+            assign[start:end] = np.argmax(self._dequantize(slice(start, end)) @ centroids.T, axis=1)
+        self.centroids = centroids.astype(np.float32)
+        self.ivf_rows = np.argsort(assign, kind="stable").astype(np.int64)
+        self.ivf_ptr = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))]).astype(np.int64)
+
+    def search(self, q: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Kandidati (retci, skalarni produkti); za točnu pretragu već svedeni na top_k."""
+        t0 = time.perf_counter()
+        if self.centroids is not None:
+            probe = np.argsort(self.centroids @ q)[::-1][: self.nprobe]
+            rows = np.sort(np.concatenate([self.ivf_rows[self.ivf_ptr[c] : self.ivf_ptr[c + 1]] for c in probe]))
+            scores = self._dequantize(rows) @ q if len(rows) else np.empty(0, np.float32)
+        else:
+            n = len(self)
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, self.BLOCK):
+                end = min(n, start + self.BLOCK)
+                scores[start:end] = self._dequantize(slice(start, end)) @ q
+            rows = np.arange(n)
+            if n > top_k > 0:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                rows, scores = rows[best], scores[best]
+        ms = (time.perf_counter() - t0) * 1000
+        self.stats["queries"] += 1
+        self.stats["last_query_ms"] = ms
+        self.stats["total_query_ms"] += ms
+        return rows, scores
+
+    def save(self, path: Path) -> None:
+        np.save(path / "dense_codes.npy", np.asarray(self.codes))
+        if self.scales is not None:
+            np.save(path / "dense_scales.npy", np.asarray(self.scales))
+        if self.centroids is not None:
+            np.save(path / "ivf_centroids.npy", self.centroids)
+            np.save(path / "ivf_ptr.npy", self.ivf_ptr)
+            np.save(path / "ivf_rows.npy", self.ivf_rows)
+
+    @classmethod
+    def load(cls, path: Path, nprobe: int = 8) -> "DenseIndex":
+        def opt(name: str, mmap: bool = True) -> Optional[np.ndarray]:
+            p = path / name
+            return np.load(p, mmap_mode="r" if mmap else None) if p.exists() else None
+
+        return cls(
+            codes=np.load(path / "dense_codes.npy", mmap_mode="r"),
+            scales=opt("dense_scales.npy"),
+            centroids=opt("ivf_centroids.npy", mmap=False),
+            ivf_ptr=opt("ivf_ptr.npy", mmap=False),
+            ivf_rows=opt("ivf_rows.npy"),
+            nprobe=nprobe,
+        )
+
+
+def _l2(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.divide(x, norms, out=np.zeros_like(x), where=norms > 0)
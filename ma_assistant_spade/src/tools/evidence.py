@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Set, Tuple
+
+from src.tools.claims import split_sentences
+from src.tools.ranking import Analyzer
+
+# Pakiranje dokaza za prompt: što više relevantnog teksta unutar zadanog broja tokena,
+# bez ponavljanja preklapanja susjednih chunkova istog dokumenta.
+
+CHARS_PER_TOKEN = 4.0  # gruba procjena bez tokenizatora modela
+_GAP = " … "
+
+_analyzer = Analyzer(stopwords=True, stemming=True)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def evidence_line(e: dict) -> str:
+    return f"- [{e.get('doc_id')}:{e.get('chunk_id')}] {e.get('text', '')}"
+
+
+def evidence_tokens(evidence: List[dict]) -> int:
+    return sum(estimate_tokens(evidence_line(e)) for e in evidence)
+
+
+def pack_evidence(passages: List[dict], query: str, budget_tokens: int, min_tokens: int = 24) -> List[dict]:
+    """Dokazi (redom relevantnosti) skraćeni tako da zajedno stanu u `budget_tokens`.
+
+    Tekst koji susjedni chunk istog dokumenta (chunk_id ± 1) već sadrži izbacuje se, ponovljeni
+    chunk preskače, a dokaz koji ne stane cijeli svodi se na rečenice s najviše pojmova upita.
+    Vraća nove rječnike s istim ključevima; `budget_tokens <= 0` znači bez ograničenja.
+    """
+    terms = set(_analyzer(query))
+    taken: Dict[Tuple[str, int], dict] = {}
+    out: List[dict] = []
+    left = budget_tokens if budget_tokens > 0 else math.inf
+    for p in passages:
+        key = _key(p)
+        if key in taken:
+            continue
+        text = str(p.get("text", ""))
+        prev, nxt = taken.get((key[0], key[1] - 1)), taken.get((key[0], key[1] + 1))
+        if prev is not None:
+            text = text[_overlap(prev["text"], text) :]
+        if nxt is not None:
+            text = text[: len(text) - _overlap(text, nxt["text"])]
+        text = text.strip()
+        if not text:
+            continue
+        entry = dict(p, text=text)
+        cost = estimate_tokens(evidence_line(entry))
+        if cost > left:
+            room = left - (cost - estimate_tokens(text))
+            if room < min_tokens:
+                continue
+            entry["text"] = _trim(text, terms, int(room))
+            cost = estimate_tokens(evidence_line(entry))
+        left -= cost
+        taken[key] = entry
+        out.append(entry)
+    return out
+
+
+def _overlap(a: str, b: str, min_chars: int = 20) -> int:
+    """Duljina najduljeg kraja `a` kojim `b` počinje (preklapanje susjednih chunkova)."""
+    probe = b[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    i = a.find(probe)
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i
+        i = a.find(probe, i + 1)
+    return 0
+
+
+def _trim(text: str, terms: Set[str], tokens: int) -> str:
+    """Rečenice teksta s najviše pojmova upita (redom kojim su u tekstu) unutar `tokens`."""
+    sentences = [s.strip() for s in split_sentences(text)]
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(terms.intersection(_analyzer(sentences[i]))), i))
+    keep: List[int] = []
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + estimate_tokens(_GAP)
+        if used + cost <= tokens:
+            keep.append(i)
+            used += cost
+    if not keep:
+        # Ni jedna rečenica ne stane cijela: reži na granici riječi
+        cut = text[: int(tokens * CHARS_PER_TOKEN) - len(_GAP)]
+        return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + _GAP.rstrip()
+    keep.sort()
+    parts: List[str] = []
+    for n, i in enumerate(keep):
+        if n and i != keep[n - 1] + 1:
+            parts.append(_GAP.strip())
+        parts.append(sentences[i])
+    if keep[0] > 0:
+        parts.insert(0, _GAP.strip())
+    if keep[-1] < len(sentences) - 1:
+        parts.append(_GAP.strip())
+    return " ".join(parts)
+
+
+def _key(e: dict) -> Tuple[str, int]:
+    try:
+        return str(e.get("doc_id")), int(e.get("chunk_id"))
+    except (TypeError, ValueError):
+        return str(e.get("doc_id")), -1
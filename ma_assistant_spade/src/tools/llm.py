@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 #Ukredano iz vlastitog zavrsnog rada dostuponog na foi radovi + prilagodba uz Github Copilota
 
@@ -13,32 +21,227 @@ class LLMConfig:
     model: str
     temperature: float = 0.2
     max_output_tokens: int = 800
+    timeout: float = 60.0  # sekunde po pojedinom pozivu
+    max_retries: int = 4
+    backoff_base: float = 0.6
+
+
+class CompletionCache:
+    """Memoizacija odgovora modela po sažetku (model, parametri, promptovi).
+
+    Ograničeni LRU u memoriji ispred SQLite datoteke koja preživljava ponovno pokretanje.
+    Dijeli se između agenata; svaki agent sam odlučuje koristi li je (vidi `LLMClient`).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    @staticmethod
+    def key(config: LLMConfig, system_prompt: str, user_prompt: str) -> str:
+        payload = [config.model, config.temperature, config.max_output_tokens, system_prompt, user_prompt]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return value
+
+    def get(self, key: str) -> Optional[str]:
+        """Memorija pa disk; promašaj se broji ovdje. Disk čita blokirajuće - iz asynca zvati kroz dretvu."""
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[0])
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._remember(key, value)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, value, created) VALUES (?, ?, ?)", (key, value, time.time())
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: str) -> None:
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
 
 
 class LLMClient:
-    """Omotač za OpenAI Responses API s minimalnim ponovnim pokušajima (retry/backoff)."""
+    """Omotač za OpenAI Responses API s minimalnim ponovnim pokušajima (retry/backoff).
 
-    def __init__(self, config: LLMConfig, client: Optional[OpenAI] = None):
+    Agenti koriste `acomplete` (AsyncOpenAI + asyncio.sleep) kako jedan spori poziv
+    ne bi blokirao event loop SPADE-a; `complete` ostaje za sinkroni kod (skripte, testovi).
+    `astream` vraća tekst u dijelovima kako model piše (za prikaz uživo).
+    Uz `cache` isti (model, parametri, promptovi) ne šalje se ponovno API-ju.
+    """
+
+    def __init__(
+        self,
+        config: LLMConfig,
+        client: Optional[OpenAI] = None,
+        async_client: Optional[AsyncOpenAI] = None,
+        cache: Optional[CompletionCache] = None,
+    ):
         self.config = config
         self.client = client or OpenAI()
+        self.async_client = async_client or AsyncOpenAI()
+        self.cache = cache
+
+    def _request(self, system_prompt: str, user_prompt: str) -> dict:
+        return {
+            "model": self.config.model,
+            "input": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": self.config.temperature,
+            "max_output_tokens": self.config.max_output_tokens,
+            "timeout": self.config.timeout,
+        }
+
+    def _backoff(self, attempt: int) -> float:
+        # Eksponencijalni backoff s "full jitter" da se istovremeni pokušaji ne sinkroniziraju
+        return random.uniform(0, self.config.backoff_base * (2 ** attempt))
 
     def complete(self, system_prompt: str, user_prompt: str) -> str:
-        """Sinkroni dovršetak (completion). Koristi u dretvama ako je potrebno."""
+        """Sinkroni dovršetak (completion). Ne zvati iz asyncio ponašanja - koristi `acomplete`."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.config, system_prompt, user_prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         # Jednostavni retry/backoff za prolazne greške
         last_err: Optional[Exception] = None
-        for attempt in range(4):
+        for attempt in range(self.config.max_retries):
+            try:
+                resp = self.client.responses.create(**self._request(system_prompt, user_prompt))
+                text = getattr(resp, "output_text", "") or ""
+                if key is not None and text:
+                    self.cache.put(key, text)
+                return text
+            except Exception as e:  # noqa: BLE001
+                last_err = e
+                time.sleep(self._backoff(attempt))
+        raise RuntimeError(f"LLM call failed after retries: {last_err}")
+
+    async def _cached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        cached = self.cache.get_memory(key)
+        if cached is None:
+            # SQLite je blokirajući pa ide u dretvu
+            cached = await asyncio.to_thread(self.cache.get, key) if self.cache.persistent else self.cache.get(key)
+        return cached
+
+    async def _store(self, key: Optional[str], text: str) -> None:
+        if key is None or not text:
+            return
+        if self.cache.persistent:
+            await asyncio.to_thread(self.cache.put, key, text)
+        else:
+            self.cache.put(key, text)
+
+    async def acomplete(self, system_prompt: str, user_prompt: str) -> str:
+        """Asinkroni dovršetak; čekanje (mreža i backoff) ne blokira event loop."""
+        key = self.cache.key(self.config, system_prompt, user_prompt) if self.cache is not None else None
+        cached = await self._cached(key)
+        if cached is not None:
+            return cached
+        last_err: Optional[BaseException] = None
+        for attempt in range(self.config.max_retries):
+            try:
+                # wait_for je tvrda granica i za slučaj da HTTP klijent ne poštuje timeout
+                resp = await asyncio.wait_for(
+                    self.async_client.responses.create(**self._request(system_prompt, user_prompt)),
+                    timeout=self.config.timeout,
+                )
+                text = getattr(resp, "output_text", "") or ""
+                await self._store(key, text)
+                return text
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                last_err = e
+                if attempt + 1 < self.config.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+        raise RuntimeError(f"LLM call failed after retries: {last_err}")
+
+    async def astream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Dovršetak u dijelovima (događaji `response.output_text.delta`) kako pristižu.
+
+        Ponovni pokušaj samo dok još ništa nije vraćeno; pogodak predmemorije dolazi odjednom.
+        `timeout` vrijedi za cijeli odgovor, kao i kod `acomplete`.
+        """
+        key = self.cache.key(self.config, system_prompt, user_prompt) if self.cache is not None else None
+        cached = await self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        loop = asyncio.get_running_loop()
+        last_err: Optional[BaseException] = None
+        for attempt in range(self.config.max_retries):
+            parts: List[str] = []
+            stream = None
             try:
-                resp = self.client.responses.create(
-                    model=self.config.model,
-                    input=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    temperature=self.config.temperature,
-                    max_output_tokens=self.config.max_output_tokens,
+                deadline = loop.time() + self.config.timeout
+                stream = await asyncio.wait_for(
+                    self.async_client.responses.create(**self._request(system_prompt, user_prompt), stream=True),
+                    timeout=self.config.timeout,
                 )
-                return getattr(resp, "output_text", "") or ""
+                events = stream.__aiter__()
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    if getattr(event, "type", "") == "response.output_text.delta" and event.delta:
+                        parts.append(event.delta)
+                        yield event.delta
+            except asyncio.CancelledError:
+                raise
             except Exception as e:  # noqa: BLE001
+                if parts:
+                    # Dio je već prikazan - ponavljanje bi ga udvostručilo
+                    raise RuntimeError(f"LLM stream interrupted: {e}") from e
                 last_err = e
-                time.sleep(0.6 * (2 ** attempt))
+                if attempt + 1 < self.config.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                continue
+            finally:
+                if stream is not None and hasattr(stream, "close"):
+                    await stream.close()
+            await self._store(key, "".join(parts))
+            return
         raise RuntimeError(f"LLM call failed after retries: {last_err}")
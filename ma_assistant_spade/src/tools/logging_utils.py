@@ -1,14 +1,49 @@
 from __future__ import annotations
 
+import atexit
+import gzip
+import hashlib
 import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import threading
+import time
+import zlib
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
+# Logovi ne smiju blokirati event loop agenata: logger samo stavlja zapis u ograničeni red
+# (QueueHandler; pun red = zapis se odbacuje i broji), a zasebna dretva ih u serijama
+# formatira i piše u konzolu i u JSONL datoteku koja se rotira (po želji uz gzip).
+# Poruke među agentima (`log_msg`) serijaliziraju se tek u toj dretvi, uz tijelo cijelo,
+# skraćeno ili samo sažetak, i mogu se uzorkovati po razgovoru.
 
-def setup_logger(log_dir: str, name: str = "ma_assistant") -> logging.Logger:
+BODY_MODES = ("full", "truncate", "hash")
+
+_BATCH = 256  # najviše zapisa po seriji zapisivanja
+_FLUSH_INTERVAL = 0.5  # sekunde; datoteka se prazni barem ovako često
+_RESERVED = 0.1  # udio reda koji poruke agenata ne smiju zauzeti (ostaje za upozorenja i greške)
+_pipelines: Dict[str, "LogPipeline"] = {}
+
+
+def setup_logger(
+    log_dir: str,
+    name: str = "ma_assistant",
+    *,
+    body: str = "truncate",
+    body_chars: int = 500,
+    sample: float = 1.0,
+    queue_size: int = 10_000,
+    max_bytes: int = 50 * 1024 * 1024,
+    backups: int = 5,
+    compress: bool = False,
+) -> logging.Logger:
+    if body not in BODY_MODES:
+        raise ValueError(f"Nepoznat LOG_BODY '{body}', dostupno: {', '.join(BODY_MODES)}")
     Path(log_dir).mkdir(parents=True, exist_ok=True)
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
@@ -17,24 +52,38 @@ def setup_logger(log_dir: str, name: str = "ma_assistant") -> logging.Logger:
         return logger
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_path = os.path.join(log_dir, f"{name}_{ts}.log")
+    log_path = os.path.join(log_dir, f"{name}_{ts}.jsonl")
 
-    fmt = logging.Formatter("%(asctime)s\t%(levelname)s\t%(message)s")
-
-    fh = logging.FileHandler(log_path, encoding="utf-8")
-    fh.setFormatter(fmt)
+    fh = _JsonlFileHandler(log_path, max_bytes=max_bytes, backups=backups, compress=compress)
+    fh.setFormatter(_JsonFormatter(body, body_chars))
 
     sh = logging.StreamHandler()
-    sh.setFormatter(fmt)
+    sh.setFormatter(_TextFormatter(body, body_chars))
 
-    logger.addHandler(fh)
-    logger.addHandler(sh)
+    pipeline = LogPipeline([fh, sh], queue_size=queue_size, sample=sample)
+    _pipelines[name] = pipeline
+    logger.addHandler(pipeline.handler)
     logger.propagate = False
-    logger.info("log_file=%s", log_path)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    logger.info("log_file=%s body=%s sample=%.3g queue_size=%d", log_path, body, sample, queue_size)
     return logger
 
 
+def close_logger(logger: logging.Logger) -> Dict[str, int]:
+    """Zabilježi statistiku, isprazni red i zatvori datoteke; vraća statistiku (npr. odbačeni zapisi)."""
+    pipeline = _pipelines.pop(logger.name, None)
+    if pipeline is None:
+        return {}
+    logger.info("log_pipeline stats=%s", pipeline.stats)
+    pipeline.stop()
+    logger.removeHandler(pipeline.handler)
+    return dict(pipeline.stats)
+
+
 def log_msg(logger: logging.Logger, direction: str, sender: str, to: str, metadata: Dict[str, Any], body: str) -> None:
+    if not logger.isEnabledFor(logging.INFO):
+        return
     rec = {
         "direction": direction,  # send|recv
         "from": sender,
@@ -42,4 +91,198 @@ def log_msg(logger: logging.Logger, direction: str, sender: str, to: str, metada
         "metadata": metadata,
         "body": body,
     }
-    logger.info(json.dumps(rec, ensure_ascii=False))
+    # Zapis ide u red kao rječnik; JSON i politika tijela primjenjuju se u dretvi za pisanje
+    logger.info("message", extra={"message_record": rec})
+
+
+class LogPipeline:
+    """Red zapisa i dretva koja ih u serijama predaje handlerima (konzola, datoteka)."""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10_000, sample: float = 1.0):
+        self.handlers = handlers
+        self.queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(maxsize=max(1, queue_size))
+        # Poruke agenata pune red samo do ove granice; ostatak je rezerva za ostale zapise
+        self.message_limit = max(1, self.queue.maxsize - max(1, int(self.queue.maxsize * _RESERVED)))
+        self.stats: Dict[str, int] = {"written": 0, "dropped": 0, "sampled_out": 0, "batches": 0}
+        self.handler = _DroppingQueueHandler(self)
+        self.handler.addFilter(_ConversationSampler(sample, self.stats))
+        self._thread: Optional[threading.Thread] = None
+        self._reported_drops = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self.queue.put(None)  # blokira samo dok dretva ne oslobodi mjesto; sve prije se zapisuje
+        thread.join()
+        for h in self.handlers:
+            h.close()
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        done = False
+        while not done:
+            # Čeka prvi zapis, a zatim uzima sve što je već u redu (do _BATCH)
+            batch: List[logging.LogRecord] = []
+            try:
+                record = self.queue.get(timeout=_FLUSH_INTERVAL)
+                while record is not None:
+                    batch.append(record)
+                    if len(batch) >= _BATCH:
+                        break
+                    record = self.queue.get_nowait()
+                done = record is None
+            except queue.Empty:
+                pass
+            dropped = self.stats["dropped"]
+            if dropped > self._reported_drops:
+                # Odbačeni zapisi vidljivi su i u samom logu, ne samo u završnoj statistici
+                new = dropped - self._reported_drops
+                batch.append(_record(logging.WARNING, "log_dropped total=%d new=%d", dropped, new))
+                self._reported_drops = dropped
+            for record in batch:
+                for h in self.handlers:
+                    if record.levelno >= h.level:
+                        h.handle(record)
+            self.stats["written"] += len(batch)
+            if batch:
+                self.stats["batches"] += 1
+            now = time.monotonic()
+            if done or now - last_flush >= _FLUSH_INTERVAL:
+                for h in self.handlers:
+                    h.flush()
+                last_flush = now
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Nijedan zapis ne čeka na mjesto u redu: pun red znači odbačen i prebrojen zapis.
+    Poruke agenata (`log_msg`, velik promet) smiju zauzeti samo dio reda do
+    `message_limit`, pa ostali, rijetki zapisi (statistika, upozorenja, greške) imaju
+    rezervirano mjesto i ne gube se zbog navale poruka.
+
+    `prepare` (QueueHandler) poruku s argumentima formatira odmah, jer su argumenti često
+    rječnici statistike koji se još mijenjaju; rječnik poruke agenta putuje neserijaliziran.
+    """
+
+    def __init__(self, pipeline: LogPipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if hasattr(record, "message_record") and self.queue.qsize() >= self.pipeline.message_limit:
+            self.pipeline.stats["dropped"] += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline.stats["dropped"] += 1
+
+
+class _ConversationSampler(logging.Filter):
+    """Uzorkovanje poruka agenata po conversation-id: razgovor se bilježi cijeli ili nikako, u svim procesima isto."""
+
+    def __init__(self, sample: float, stats: Dict[str, int]):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, sample)) * 0xFFFFFFFF)
+        self.stats = stats
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rec = getattr(record, "message_record", None)
+        if rec is None or self.threshold >= 0xFFFFFFFF:
+            return True
+        cid = str(rec.get("metadata", {}).get("conversation-id", ""))
+        if zlib.crc32(cid.encode("utf-8")) <= self.threshold:
+            return True
+        self.stats["sampled_out"] += 1
+        return False
+
+
+class _JsonFormatter(logging.Formatter):
+    """Jedan JSON objekt po retku: vrijeme, razina, poruka ili polja poruke agenta."""
+
+    def __init__(self, body: str, body_chars: int):
+        super().__init__()
+        self.body = body
+        self.body_chars = body_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+        }
+        rec = getattr(record, "message_record", None)
+        if rec is not None:
+            out.update(_apply_body(rec, self.body, self.body_chars))
+        else:
+            out["msg"] = record.getMessage()  # uz iznimku već sadrži traceback (QueueHandler.prepare)
+        return json.dumps(out, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    """Konzola kao i prije (vrijeme, razina, poruka); poruka agenta kao JSON uz istu politiku tijela."""
+
+    def __init__(self, body: str, body_chars: int):
+        super().__init__("%(asctime)s\t%(levelname)s\t%(message)s")
+        self.body = body
+        self.body_chars = body_chars
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        rec = getattr(record, "message_record", None)
+        if rec is not None:
+            record.message = json.dumps(_apply_body(rec, self.body, self.body_chars), ensure_ascii=False)
+        return super().formatMessage(record)
+
+
+class _JsonlFileHandler(logging.handlers.RotatingFileHandler):
+    """JSONL datoteka koja se rotira po veličini (stare kao .1, .2, ... ili .1.gz uz `compress`).
+
+    Ne prazni se nakon svakog zapisa nego kad `LogPipeline` završi seriju.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, compress: bool):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = _gzip_rotator
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record) + self.terminator
+            size = len(line.encode("utf-8"))
+            if self.maxBytes > 0 and self._size and self._size + size > self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(line)
+            self._size += size
+        except Exception:  # noqa: BLE001
+            self.handleError(record)
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _apply_body(rec: Dict[str, Any], mode: str, chars: int) -> Dict[str, Any]:
+    body = rec.get("body") or ""
+    if mode == "full":
+        return rec
+    out = {k: v for k, v in rec.items() if k != "body"}
+    out["body_bytes"] = len(body.encode("utf-8"))
+    if mode == "hash":
+        out["body_sha1"] = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    else:
+        out["body"] = body if len(body) <= chars else body[:chars] + "…"
+    return out
+
+
+def _record(level: int, msg: str, *args: Any) -> logging.LogRecord:
+    return logging.LogRecord("ma_assistant.logging", level, __file__, 0, msg, args, None)
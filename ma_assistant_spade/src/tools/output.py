@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sys
+from typing import Dict, List, Optional, TextIO
+
+
+class ConsoleSink:
+    """Ispis odgovora Koordinatora na konzolu, dio po dio kako pristižu.
+
+    Razgovori teku istovremeno, pa uživo ide samo jedan; ostali se spremaju i ispisuju
+    redom čim prethodni završi, kako se tekstovi različitih odgovora ne bi ispremiješali.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stdout
+        self._live: Optional[str] = None
+        self._pending: Dict[str, List[str]] = {}  # redoslijed = redoslijed početka
+        self._done: set[str] = set()
+
+    def begin(self, conversation_id: str, user_text: str, cached: bool = False) -> None:
+        self._pending[conversation_id] = []
+        if self._live is None:
+            self._promote()
+        self.write(conversation_id, f"\n=== ODGOVOR === ({user_text}){' [predmemorija]' if cached else ''}\n\n")
+
+    def write(self, conversation_id: str, text: str) -> None:
+        if conversation_id == self._live:
+            self.stream.write(text)
+            self.stream.flush()
+        elif conversation_id in self._pending:
+            self._pending[conversation_id].append(text)
+
+    def end(self, conversation_id: str) -> None:
+        """Zatvara blok odgovora; bez učinka ako razgovor nije ni počeo ispis."""
+        if conversation_id not in self._pending:
+            return
+        self.write(conversation_id, "\n\n==============\n\n")
+        if conversation_id != self._live:
+            self._done.add(conversation_id)
+            return
+        del self._pending[conversation_id]
+        self._live = None
+        self._promote()
+
+    def _promote(self) -> None:
+        # Ispiši završene odgovore na čekanju, a prvi nezavršeni postaje živi
+        for cid in list(self._pending):
+            self.stream.write("".join(self._pending[cid]))
+            self._pending[cid].clear()
+            if cid in self._done:
+                self._done.discard(cid)
+                del self._pending[cid]
+                continue
+            self._live = cid
+            break
+        self.stream.flush()
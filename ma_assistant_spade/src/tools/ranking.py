@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Leksičko rangiranje za CorpusIndex: tokenizacija (hrvatske stop-riječi, lagano
+# korjenovanje) i bodovanje nad rijetkom matricom frekvencija (TF-IDF, BM25).
+
+RETRIEVERS: Dict[str, Tuple[str, ...]] = {
+    "tfidf": ("tfidf",),
+    "bm25": ("bm25",),
+    "hybrid": ("tfidf", "bm25"),
+}
+
+# Isti uzorak kao zadani `token_pattern` u TfidfVectorizeru (riječi od barem 2 znaka)
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+HR_STOPWORDS = frozenset(
+    """
+    a ako ali bi bih bila bile bili bilo bio biste bismo biti bude budu da dakle do dok dva
+    ga gdje god i ih ili im ima imaju imati iz između iznad ispod ja je jedan jedna jedne jedni
+    jedno jer jesam jesi jesmo jest jeste jesu još joj ju kad kada kako kao koja koje koji kojeg
+    kojem kojemu kojih kojim kojima kojoj koju kroz li me mene meni mi mnogo moj moja moje može
+    mogu mu na nad nakon nam nama nas naš naša naše ne nego neka neki neko nekoliko nešto ni
+    nije nijedan nikad nisam nisi nismo niste nisu niti no o od oko on ona one oni ono onaj onda
+    ova ovaj ovdje ove ovi ovo ovog ovom pa po pod pored prema pri prije s sa sam sama same sami
+    samo se sebe sebi si smo ste su sva sve svi svih svim svoj svoja svoje svojih svojim ta tada
+    taj tako također tamo te tek ti tih tijekom tim to toga tome tu tvoj u uz već vi vrlo za
+    zbog što će ćemo ćete ćeš ću čak čiji čija čije
+    """.split()
+)
+
+# Najčešći padežni/glagolski nastavci, od najduljeg prema najkraćem
+_HR_SUFFIXES = (
+    "ovima", "evima", "anjem", "enjem", "ijama", "ijom", "ovih", "evih", "skog", "skom",
+    "ima", "ama", "ovi", "evi", "ova", "eva", "ski", "ska", "sko", "om", "em", "og", "eg",
+    "oj", "ih", "im", "a", "e", "i", "o", "u",
+)
+
+
+def light_stem(token: str, min_stem: int = 3) -> str:
+    """Lagano korjenovanje: skini jedan nastavak ako ostane barem `min_stem` znakova."""
+    for suffix in _HR_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= min_stem:
+            return token[: -len(suffix)]
+    return token
+
+
+class Analyzer:
+    """Tokenizator za indeks i upite (mala slova, opcionalno stop-riječi i korjenovanje)."""
+
+    def __init__(self, stopwords: bool = True, stemming: bool = False):
+        self.stopwords = stopwords
+        self.stemming = stemming
+
+    def __call__(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        if self.stopwords:
+            tokens = [t for t in tokens if t not in HR_STOPWORDS]
+        if self.stemming:
+            tokens = [light_stem(t) for t in tokens]
+        return tokens
+
+
+class TfidfScorer:
+    """Kosinusna sličnost TF-IDF vektora (iste formule kao TfidfVectorizer: smooth_idf, norm='l2')."""
+
+    name = "tfidf"
+
+    def term_weights(self, df: np.ndarray, n_docs: int) -> np.ndarray:
+        """Težine pojmova (IDF) iz broja chunkova u kojima se pojam pojavljuje."""
+        return (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+
+    def doc_weights(self, tf: sp.csr_matrix, idf: np.ndarray, avg_len: float) -> np.ndarray:
+        """Težine poravnate s `tf.data`; `tf` su cijeli retci (chunkovi), ne nužno cijeli korpus."""
+        n_docs = tf.shape[0]
+        data = tf.data.astype(np.float32) * idf[tf.indices]
+        # L2 norma po retku (chunku); bez sklearn-a, kojeg bi inače uvozio svaki proces za izgradnju
+        rows = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data.astype(np.float64) ** 2, minlength=n_docs)).astype(np.float32)
+        return data / np.where(norms > 0, norms, 1.0)[rows]
+
+    def query_weights(self, counts: np.ndarray, term_weights: np.ndarray) -> np.ndarray:
+        vals = counts.astype(np.float32) * term_weights
+        norm = float(np.linalg.norm(vals))
+        return vals / norm if norm > 0 else vals
+
+
+class BM25Scorer:
+    """Okapi BM25; doprinos pojma u chunku unaprijed je izračunat pa je upit samo zbroj postinga."""
+
+    name = "bm25"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def term_weights(self, df: np.ndarray, n_docs: int) -> np.ndarray:
+        return np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def doc_weights(self, tf: sp.csr_matrix, idf: np.ndarray, avg_len: float) -> np.ndarray:
+        lengths = np.asarray(tf.sum(axis=1), dtype=np.float32).ravel()
+        row_len = np.repeat(lengths, np.diff(tf.indptr))
+        freq = tf.data.astype(np.float32)
+        denom = freq + self.k1 * (1 - self.b + self.b * row_len / avg_len)
+        return idf[tf.indices] * freq * (self.k1 + 1) / denom
+
+    def query_weights(self, counts: np.ndarray, term_weights: np.ndarray) -> np.ndarray:
+        return counts.astype(np.float32)
+
+
+def make_scorers(k1: float = 1.2, b: float = 0.75) -> Dict[str, object]:
+    return {"tfidf": TfidfScorer(), "bm25": BM25Scorer(k1=k1, b=b)}
+
+
+def fuse(scores: List[np.ndarray], alpha: float) -> np.ndarray:
+    """Hibridni rezultat: rezultati svakog bodovanja skalirani na [0, 1], pa ponderirani zbroj."""
+    if len(scores) == 1:
+        return scores[0]
+    out = np.zeros_like(scores[0], dtype=np.float64)
+    for s, w in zip(scores, (alpha, 1.0 - alpha)):
+        top = float(s.max()) if len(s) else 0.0
+        if top > 0:
+            out += w * (s / top)
+    return out
+
+
+def fuse_rows(scores: List[sp.csr_matrix], alpha: float) -> sp.csr_matrix:
+    """Kao `fuse`, ali po redovima matrice rezultata (batch upiti)."""
+    if len(scores) == 1:
+        return scores[0]
+    out = None
+    for S, w in zip(scores, (alpha, 1.0 - alpha)):
+        top = S.max(axis=1).toarray().ravel()
+        scale = np.divide(w, top, out=np.zeros_like(top, dtype=np.float64), where=top > 0)
+        part = sp.diags(scale) @ S
+        out = part if out is None else out + part
+    return out.tocsr()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.tools.dense import HashingEmbedder
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    verdict: str
+    issues: List[str]
+    generation: int
+    created: float = field(default_factory=time.monotonic)
+    vector: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+def normalize_question(text: str) -> str:
+    """Mala slova, bez interpunkcije i višestrukih razmaka (ključ za točno podudaranje)."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class ResponseCache:
+    """LRU/TTL predmemorija konačnih (provjerenih) odgovora Koordinatora.
+
+    Ključ je normalizirano pitanje + generacija indeksa korpusa + sažetak konteksta
+    (povijest razgovora o kojoj je odgovor ovisio), pa se odgovor na "a koliko stanovnika
+    ima?" ne vraća u drugom razgovoru. Kad Istraživač javi novu generaciju, stari unosi
+    se brišu. Uz `similarity > 0` pogodak je i pitanje čija je (hashing) ugradnja
+    dovoljno slična već spremljenom, uz isti kontekst.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, similarity: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._embedder = HashingEmbedder() if similarity > 0 else None
+        self._entries: "OrderedDict[Tuple[str, int, str], CachedAnswer]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "semantic_hits": 0, "misses": 0, "invalidated": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, question: str, generation: int, context: str = "") -> Optional[CachedAnswer]:
+        self._expire()
+        norm = normalize_question(question)
+        key = (norm, generation, _context_key(context))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+        if self._embedder is not None and self._entries:
+            keys = [k for k in self._entries if k[1:] == key[1:]]
+            if keys:
+                q = self._embedder.embed([norm])[0]
+                sims = np.stack([self._entries[k].vector for k in keys]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity:
+                    self._entries.move_to_end(keys[best])
+                    self.stats["semantic_hits"] += 1
+                    return self._entries[keys[best]]
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(
+        self, question: str, generation: int, answer: str, verdict: str, issues: List[str], context: str = ""
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        norm = normalize_question(question)
+        key = (norm, generation, _context_key(context))
+        vector = self._embedder.embed([norm])[0] if self._embedder is not None else None
+        self._entries[key] = CachedAnswer(answer, verdict, list(issues), generation, vector=vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, generation: int) -> int:
+        """Obriši sve unose koji ne pripadaju zadanoj (trenutnoj) generaciji korpusa."""
+        stale = [k for k in self._entries if k[1] != generation]
+        for k in stale:
+            del self._entries[k]
+        self.stats["invalidated"] += len(stale)
+        return len(stale)
+
+    def _expire(self) -> None:
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        for k in [k for k, e in self._entries.items() if now - e.created > self.ttl]:
+            del self._entries[k]
+
+
+def _context_key(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest() if context else ""
@@ -0,0 +1,366 @@
+"""Praćenje vremena pitanja kroz agente: span po fazi, trace = conversation-id.
+
+Spanovi se pišu u JSONL, jedan OTLP/JSON zahtjev (`resourceSpans`) po retku - isti oblik
+kao datoteka koju piše OpenTelemetry Collector (`file` exporter), pa se može i uvesti u njega.
+Kontekst putuje u metapodacima poruke (vidi `make_metadata`): `span-id` roditeljskog spana
+i `sent-ns` trenutak slanja; primatelj bilježi `recv-ns` (vidi `mark_received`), iz čega su
+skok poruke (`hop.<role>`) i čekanje u redu ponašanja (`queue_wait_ms`). Vremena su zidni sat
+(`time.time_ns`), pa je skok između računala točan koliko i usklađenost njihovih satova.
+
+Sažetak p50/p95/p99 po fazi:
+
+    python -m src.tools.tracing logs/traces.jsonl [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import contextvars
+import json
+import math
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+SPAN_ID = "span-id"
+SENT_NS = "sent-ns"
+RECV_NS = "recv-ns"
+
+_SCOPE = "ma-assistant"
+_BATCH = 256  # najviše spanova po retku (OTLP zahtjevu)
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Jedna faza; kao `with` blok postaje roditelj spanova otvorenih unutar njega (i u zadacima koje pokrene)."""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: str, start_ns: int, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        # Isključeno praćenje: prazan id, pa ni metapodaci poruka ne rastu
+        self.span_id = secrets.token_hex(8) if tracer.enabled else ""
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns
+        self.end_ns = 0
+        self.attributes = attributes
+        self._token = None
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        self.end()
+
+
+class Tracer:
+    """Stvara spanove i piše završene u `path` (bez putanje spanovi se ne zapisuju).
+
+    Kao i logovi (`LogPipeline`), završeni span samo ide u ograničeni red (pun red = span se
+    odbacuje i broji), a zasebna dretva ih u serijama serijalizira i piše - jedna serija je
+    jedan OTLP zahtjev u jednom retku.
+    """
+
+    def __init__(self, path: Optional[str] = None, service: str = "ma-assistant", queue_size: int = 10_000):
+        self.path = path
+        self.service = service
+        self.stats: Dict[str, int] = {"exported": 0, "dropped": 0, "batches": 0}
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._fh = None
+        self._thread: Optional[threading.Thread] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(path, "a", encoding="utf-8")
+            self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    @property
+    def enabled(self) -> bool:
+        return self._fh is not None
+
+    def span(
+        self,
+        name: str,
+        conversation_id: str = "",
+        parent: Union["Span", str, None] = None,
+        start_ns: Optional[int] = None,
+        **attributes: Any,
+    ) -> Span:
+        """Otvori span; bez `parent` roditelj je trenutni span (`with`), a `parent` može biti i id iz poruke."""
+        if parent is None:
+            parent = _current.get()
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = _trace_id(conversation_id), parent or ""
+        if conversation_id:
+            attributes.setdefault("conversation_id", conversation_id)
+        return Span(self, name, trace_id, parent_id, start_ns or time.time_ns(), attributes)
+
+    def record(self, name: str, start_ns: int, end_ns: int, conversation_id: str = "", parent=None, **attributes) -> Span:
+        """Već završena faza (npr. pretraga cijele serije zahtjeva, zabilježena po zahtjevu)."""
+        span = self.span(name, conversation_id, parent, start_ns, **attributes)
+        span.end(end_ns)
+        return span
+
+    def hop(self, msg) -> Optional[Span]:
+        """Skok poruke od slanja do primitka (`hop.<role>`); None ako pošiljatelj ne prati."""
+        md = msg.metadata
+        if not md.get(SENT_NS) or not md.get(SPAN_ID):
+            return None
+        sent = int(md[SENT_NS])
+        recv = int(md.get(RECV_NS) or time.time_ns())
+        return self.record(
+            f"hop.{md.get('role', 'message')}",
+            sent,
+            max(sent, recv),
+            md.get("conversation-id", ""),
+            md[SPAN_ID],
+            sender=str(msg.sender),
+            to=str(msg.to),
+            body_bytes=len((msg.body or "").encode("utf-8")),
+        )
+
+    def serve(self, msg, name: str, **attributes: Any) -> Span:
+        """Span obrade primljene poruke: dijete skoka poruke, s čekanjem u redu ponašanja."""
+        parent = self.hop(msg)
+        return self.span(
+            name,
+            msg.metadata.get("conversation-id", ""),
+            parent or msg.metadata.get(SPAN_ID, ""),
+            queue_wait_ms=round(queue_wait_ms(msg), 3),
+            **attributes,
+        )
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def close(self) -> None:
+        """Zapiši sve spanove iz reda i zatvori datoteku."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)  # blokira samo dok dretva ne oslobodi mjesto
+        thread.join()
+        self._fh.close()
+        self._fh = None
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            # Čeka prvi span, a zatim uzima sve što je već u redu (do _BATCH)
+            batch: List[Span] = []
+            span = self._queue.get()
+            try:
+                while span is not None:
+                    batch.append(span)
+                    if len(batch) >= _BATCH:
+                        break
+                    span = self._queue.get_nowait()
+                done = span is None
+            except queue.Empty:
+                pass
+            if not batch:
+                continue
+            self._fh.write(json.dumps(self._otlp(batch), ensure_ascii=False) + "\n")
+            self._fh.flush()
+            self.stats["exported"] += len(batch)
+            self.stats["batches"] += 1
+
+    def _otlp(self, spans: List[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_attr("service.name", self.service)]},
+                    "scopeSpans": [{"scope": {"name": _SCOPE}, "spans": [_otlp_span(s) for s in spans]}],
+                }
+            ]
+        }
+
+
+NULL_TRACER = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def mark_received(msg) -> None:
+    """Trenutak primitka poruke koja nosi kontekst praćenja (poziva se u `Agent.dispatch`)."""
+    if SENT_NS in msg.metadata:
+        msg.set_metadata(RECV_NS, str(time.time_ns()))
+
+
+def queue_wait_ms(msg) -> float:
+    recv = msg.metadata.get(RECV_NS)
+    return max(0.0, (time.time_ns() - int(recv)) / 1e6) if recv else 0.0
+
+
+def _trace_id(conversation_id: str) -> str:
+    """conversation-id (uuid4) je već 128-bitni id; inače slučajni."""
+    hex_id = conversation_id.replace("-", "").lower()
+    if len(hex_id) == 32 and all(c in "0123456789abcdef" for c in hex_id):
+        return hex_id
+    return secrets.token_hex(16)
+
+
+def _attr(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}  # OTLP/JSON: int64 kao string
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+def _otlp_span(span: Span) -> dict:
+    out = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attr(k, v) for k, v in span.attributes.items() if v is not None],
+    }
+    if "error" in span.attributes:
+        out["status"] = {"code": 2, "message": str(span.attributes["error"])}  # STATUS_CODE_ERROR
+    return out
+
+
+# --- sažetak po fazama -------------------------------------------------------------------
+
+
+def read_spans(paths: Iterable[str]) -> Iterator[dict]:
+    """Spanovi iz JSONL datoteka kao rječnici: name, duration_ms i atributi (vrijednosti raspakirane)."""
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # npr. nedovršen zadnji redak
+                for rs in request.get("resourceSpans", []):
+                    for ss in rs.get("scopeSpans", []):
+                        for s in ss.get("spans", []):
+                            attrs = {a["key"]: _value(a.get("value", {})) for a in s.get("attributes", [])}
+                            yield {
+                                "name": s.get("name", ""),
+                                "trace_id": s.get("traceId", ""),
+                                "duration_ms": (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6,
+                                **attrs,
+                            }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil metodom najbližeg ranga (vrijednost koja se stvarno pojavila)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(spans: Iterable[dict]) -> Dict[str, Dict[str, float]]:
+    """p50/p95/p99 trajanja po fazi; čekanje u redu kao zasebna faza `<ime>:queue_wait`."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    tokens: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for s in spans:
+        durations[s["name"]].append(s["duration_ms"])
+        if "queue_wait_ms" in s:
+            durations[f"{s['name']}:queue_wait"].append(float(s["queue_wait_ms"]))
+        tokens[s["name"]][0] += int(s.get("input_tokens", 0) or 0)
+        tokens[s["name"]][1] += int(s.get("output_tokens", 0) or 0)
+    out: Dict[str, Dict[str, float]] = {}
+    for name in sorted(durations):
+        values = durations[name]
+        row = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(max(values), 2),
+        }
+        if name in tokens and any(tokens[name]):
+            row["avg_input_tokens"] = round(tokens[name][0] / len(values), 1)
+            row["avg_output_tokens"] = round(tokens[name][1] / len(values), 1)
+        out[name] = row
+    return out
+
+
+def format_table(rows: Dict[str, Dict[str, float]]) -> str:
+    width = max([len(name) for name in rows] + [5])
+    lines = [f"{'faza':<{width}} {'n':>6} {'p50_ms':>10} {'p95_ms':>10} {'p99_ms':>10} {'max_ms':>10} {'tok_in':>8} {'tok_out':>8}"]
+    for name, r in rows.items():
+        lines.append(
+            f"{name:<{width}} {r['count']:>6} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} "
+            f"{r['max_ms']:>10.2f} {r.get('avg_input_tokens', ''):>8} {r.get('avg_output_tokens', ''):>8}"
+        )
+    return "\n".join(lines)
+
+
+def _value(v: dict) -> Any:
+    if "intValue" in v:
+        return int(v["intValue"])
+    if "doubleValue" in v:
+        return float(v["doubleValue"])
+    if "boolValue" in v:
+        return bool(v["boolValue"])
+    return v.get("stringValue", "")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="+", help="JSONL datoteke spanova (TRACE_PATH)")
+    parser.add_argument("--json", action="store_true", help="ispiši sažetak kao JSON")
+    args = parser.parse_args(argv)
+
+    rows = summarize(read_spans(args.paths))
+    if args.json:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    main()
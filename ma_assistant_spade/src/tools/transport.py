@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import spade
+from spade.agent import Agent
+from spade.message import Message
+
+# Prijenos poruka među agentima: XMPP (poslužitelj, agenti u različitim procesima/računalima)
+# ili lokalni sandučići kad su svi agenti u istom procesu - bez poslužitelja i prijave.
+# Primatelj poruku i dalje dobiva kroz `Agent.dispatch`, pa Template i metapodaci vrijede isto.
+
+TRANSPORTS = ("xmpp", "local")
+# Privatni dijelovi SPADE agenta o kojima ovisi lokalni prijenos (provjereno sa spade==3.3.3, requirements.txt)
+_SPADE_PRIVATE = ("_async_register", "_async_connect", "_async_stop", "_alive")
+
+
+class LocalBus:
+    """Sandučić (asyncio.Queue) po agentu u istom procesu; zamjenjuje XMPP poslužitelj.
+
+    Agent ga koristi umjesto SPADE kontejnera (`send(msg, behaviour)`): poruka se kopira
+    (pošiljatelj je poslije slanja može mijenjati kao da je otišla mrežom) i stavlja u
+    primateljev sandučić, a zaseban zadatak po agentu predaje ih redom u `dispatch`.
+    Poruka za nepoznat JID odbacuje se kao kod XMPP-a (broji se u `stats`).
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._mailboxes: Dict[str, asyncio.Queue] = {}
+        self._pumps: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, int] = {"delivered": 0, "undeliverable": 0}
+
+    def register(self, agent: Agent) -> None:
+        jid = str(agent.jid.bare())
+        mailbox: asyncio.Queue = asyncio.Queue()
+        self._mailboxes[jid] = mailbox
+        self._pumps[jid] = asyncio.create_task(self._pump(agent, mailbox))
+
+    async def unregister(self, agent: Agent) -> None:
+        jid = str(agent.jid.bare())
+        self._mailboxes.pop(jid, None)
+        pump = self._pumps.pop(jid, None)
+        if pump is not None:
+            pump.cancel()
+            try:
+                await pump
+            except asyncio.CancelledError:
+                pass
+
+    async def send(self, msg: Message, behaviour=None) -> None:
+        to = str(msg.to.bare()) if msg.to else ""
+        mailbox = self._mailboxes.get(to)
+        if mailbox is None:
+            self.stats["undeliverable"] += 1
+            self.logger.warning("local_bus undeliverable to=%s from=%s", to, msg.sender)
+            return
+        mailbox.put_nowait(_copy(msg))
+        self.stats["delivered"] += 1
+
+    async def _pump(self, agent: Agent, mailbox: asyncio.Queue) -> None:
+        while True:
+            agent.dispatch(await mailbox.get())
+
+
+class TransportAgent(Agent):
+    """SPADE agent s prijenosom po konfiguraciji: bez `bus` XMPP, s `bus` lokalni sandučići."""
+
+    def __init__(self, jid: str, password: str, bus: Optional[LocalBus] = None):
+        super().__init__(jid, password)
+        self.bus = bus
+        if bus is not None:
+            # Nadogradnja SPADE-a ne smije tiho pokvariti lokalni prijenos: bez ovih dijelova odmah greška
+            missing = [name for name in _SPADE_PRIVATE if not hasattr(self, name)]
+            if missing:
+                raise RuntimeError(
+                    f"TRANSPORT=local nije prilagođen SPADE-u {spade.__version__} (nedostaje {', '.join(missing)}); "
+                    "vidi requirements.txt"
+                )
+            # Behaviour.send šalje kroz agent.container.send - sve poruke idu u sandučiće
+            self.set_container(bus)
+
+    async def _async_register(self) -> None:
+        if self.bus is None:
+            await super()._async_register()
+
+    async def _async_connect(self) -> None:
+        if self.bus is None:
+            await super()._async_connect()
+            return
+        self.bus.register(self)
+
+    async def _async_stop(self) -> None:
+        if self.bus is None:
+            await super()._async_stop()
+            return
+        for behaviour in self.behaviours:
+            behaviour.kill()
+        if self.web.is_started():
+            await self.web.runner.cleanup()
+        await self.bus.unregister(self)
+        self._alive.clear()
+
+
+def _copy(msg: Message) -> Message:
+    return Message(
+        to=str(msg.to),
+        sender=str(msg.sender) if msg.sender else None,
+        body=msg.body,
+        thread=msg.thread,
+        metadata=dict(msg.metadata),
+    )
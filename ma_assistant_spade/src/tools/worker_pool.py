@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass
+class WorkerState:
+    jid: str
+    outstanding: int = 0  # poslani zahtjevi bez odgovora
+    failures: int = 0  # uzastopni izostali odgovori
+    down_until: float = 0.0
+    served: int = 0
+    timeouts: int = 0
+    last_latency_s: float = 0.0
+    last_pick: int = 0
+
+
+class WorkerPool:
+    """Agenti iste uloge (npr. više Istraživača) između kojih Koordinator dijeli zahtjeve.
+
+    Bira se zdravi agent s najmanje neodgovorenih zahtjeva (least outstanding requests),
+    a kod jednakog broja onaj koji je najdulje čekao. Agent koji `max_failures` puta
+    zaredom ne odgovori isključuje se na `cooldown` sekundi (svaki sljedeći put dvostruko,
+    najviše `max_cooldown`), nakon čega dobiva probni zahtjev; prvi odgovor ga vraća.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        jids: Iterable[str],
+        max_failures: int = 1,
+        cooldown: float = 10.0,
+        max_cooldown: float = 300.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.name = name
+        self._workers: Dict[str, WorkerState] = {jid: WorkerState(jid) for jid in dict.fromkeys(jids)}
+        if not self._workers:
+            raise ValueError(f"Skup '{name}' nema nijednog agenta")
+        self.max_failures = max(1, max_failures)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.logger = logger or logging.getLogger(__name__)
+        self._ticks = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    @property
+    def jids(self) -> List[str]:
+        return list(self._workers)
+
+    def healthy(self, jid: str) -> bool:
+        return self._workers[jid].down_until <= time.monotonic()
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Odaberi agenta i zabilježi zahtjev kao neodgovoren (zatvara ga `finish`)."""
+        excluded = set(exclude)
+        candidates = [w for w in self._workers.values() if w.jid not in excluded]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        healthy = [w for w in candidates if w.down_until <= now]
+        if healthy:
+            worker = min(healthy, key=lambda w: (w.outstanding, w.last_pick))
+        else:
+            # Svi su isključeni - pokušaj s onim kojem isključenje najprije ističe
+            worker = min(candidates, key=lambda w: w.down_until)
+        worker.outstanding += 1
+        worker.last_pick = next(self._ticks)
+        return worker.jid
+
+    def finish(self, jid: str, ok: Optional[bool], latency_s: float = 0.0) -> None:
+        """Zatvori zahtjev: ok=True odgovor, False izostanak odgovora, None prekinuto (bez ocjene)."""
+        worker = self._workers[jid]
+        worker.outstanding = max(0, worker.outstanding - 1)
+        if ok is None:
+            return
+        if ok:
+            if worker.failures:
+                self.logger.info("worker_up pool=%s jid=%s", self.name, jid)
+            worker.failures = 0
+            worker.down_until = 0.0
+            worker.served += 1
+            worker.last_latency_s = latency_s
+            return
+        worker.failures += 1
+        worker.timeouts += 1
+        if worker.failures >= self.max_failures:
+            down_for = min(self.max_cooldown, self.cooldown * 2 ** (worker.failures - self.max_failures))
+            worker.down_until = time.monotonic() + down_for
+            self.logger.warning(
+                "worker_down pool=%s jid=%s failures=%d down_for_s=%.1f", self.name, jid, worker.failures, down_for
+            )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        now = time.monotonic()
+        return {
+            w.jid: {
+                "outstanding": w.outstanding,
+                "served": w.served,
+                "timeouts": w.timeouts,
+                "healthy": w.down_until <= now,
+                "last_latency_s": round(w.last_latency_s, 3),
+            }
+            for w in self._workers.values()
+        }
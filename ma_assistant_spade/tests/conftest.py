@@ -0,0 +1,16 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # `src.` paketi kao kod `python -m src.main`
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    """Kopija data/corpus bez izgrađenog indeksa."""
+    target = tmp_path / "corpus"
+    shutil.copytree(ROOT / "data" / "corpus", target, ignore=shutil.ignore_patterns(".index"))
+    return target
@@ -0,0 +1,62 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.tools.chunk_store import Chunk, ChunkStoreWriter
+
+
+def _append(writer: ChunkStoreWriter, tmp_path: Path, doc_id: str, texts) -> None:
+    raw = [t.encode("utf-8") for t in texts]
+    part = tmp_path / f"{doc_id}.part"
+    part.write_bytes(b"".join(raw))
+    writer.append_file(part, doc_id, np.array([len(r) for r in raw], dtype=np.int64))
+
+
+def test_columns_and_views(tmp_path):
+    first = tmp_path / "gen1"
+    first.mkdir()
+    writer = ChunkStoreWriter(first)
+    _append(writer, tmp_path, "a", ["Prvi čvor.", "Drugi"])
+    _append(writer, tmp_path, "b", ["žuto"])
+    assert writer.texts(1, 3) == ["Drugi", "žuto"]
+    store = writer.close()
+
+    assert len(store) == 3
+    assert store.docs == ["a", "b"]
+    rows = [(c.doc_id, c.chunk_id, c.text) for c in store]
+    assert rows == [("a", 0, "Prvi čvor."), ("a", 1, "Drugi"), ("b", 0, "žuto")]
+    assert store[-1] == Chunk(store, 2)
+    assert bytes(store.view(0)) == "Prvi čvor.".encode("utf-8")
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_copy_rows_reinterns_documents(tmp_path):
+    old_dir, new_dir = tmp_path / "gen1", tmp_path / "gen2"
+    old_dir.mkdir()
+    new_dir.mkdir()
+    writer = ChunkStoreWriter(old_dir)
+    _append(writer, tmp_path, "a", ["a0", "a1"])
+    _append(writer, tmp_path, "b", ["b0", "b1", "b2"])
+    old = writer.close()
+
+    writer = ChunkStoreWriter(new_dir)
+    _append(writer, tmp_path, "c", ["c0"])
+    writer.copy_rows(old, 2, 5)
+    new = writer.close()
+    assert new.docs == ["c", "b"]
+    rows = [(c.doc_id, c.chunk_id, c.text) for c in new]
+    assert rows == [("c", 0, "c0"), ("b", 0, "b0"), ("b", 1, "b1"), ("b", 2, "b2")]
+    # Isti (doc_id, chunk_id) u dvije generacije je isti chunk (npr. ključ u skupu)
+    assert {old[2], new[1]} == {new[1]}
+
+    shutil.rmtree(old_dir)
+    assert old[4].text == "b2"
+
+
+def test_empty_store(tmp_path):
+    store = ChunkStoreWriter(tmp_path).close()
+    assert len(store) == 0
+    assert list(store) == []
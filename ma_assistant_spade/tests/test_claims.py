@@ -0,0 +1,37 @@
+from src.tools.claims import ClaimSplitter, cited_evidence, citations, split_sentences
+
+EVIDENCE = [
+    {"doc_id": "VARAZDIN_01", "chunk_id": 0, "text": "Varaždin je grad na sjeveru Hrvatske, smješten uz rijeku Dravu."},
+    {"doc_id": "VARAZDIN_02", "chunk_id": 3, "text": "Stari grad Varaždin utvrda je iz 14. stoljeća i danas je muzej."},
+]
+
+
+def test_citations_in_order_without_repeats():
+    text = "Prvo [VARAZDIN_02:3]. Drugo [VARAZDIN_01:0] i opet [VARAZDIN_02:3]."
+    assert citations(text) == [("VARAZDIN_02", 3), ("VARAZDIN_01", 0)]
+
+
+def test_cited_evidence():
+    assert cited_evidence("Utvrda je muzej [VARAZDIN_02:3].", EVIDENCE) == EVIDENCE[1:]
+    assert cited_evidence("Bez citata.", EVIDENCE) == EVIDENCE
+    assert cited_evidence("Nepoznat [X:1].", EVIDENCE) == []
+
+
+def test_splitter_pieces_rebuild_stream():
+    text = (
+        "Evo odgovora:\nVaraždin leži uz Dravu [VARAZDIN_01:0]. Utvrda potječe iz 14. stoljeća [VARAZDIN_02:3]. "
+        "Danas je u njoj muzej."
+    )
+    splitter = ClaimSplitter()
+    pieces = []
+    for i in range(0, len(text), 7):  # kao stream u malim dijelovima
+        pieces += splitter.feed(text[i : i + 7])
+    pieces += splitter.flush()
+    assert "".join(pieces) == text
+    assert len(pieces) == 3
+    assert pieces[0].startswith("Evo odgovora:") and pieces[0].rstrip().endswith("[VARAZDIN_01:0].")
+    assert "14. stoljeća [VARAZDIN_02:3]." in pieces[1]
+
+
+def test_split_sentences_keeps_ordinals():
+    assert len(split_sentences("Utvrda je iz 14. stoljeća. Danas je muzej.")) == 2
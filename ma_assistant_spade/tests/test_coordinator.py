@@ -0,0 +1,23 @@
+import pytest
+from spade.message import Message
+from spade.template import Template
+
+from src.agents.coordinator import _reply_template
+from src.protocol import ONTOLOGY
+
+
+def _message(role: str, ontology: str = ONTOLOGY) -> Message:
+    msg = Message(to="coordinator@localhost", sender="researcher@localhost")
+    msg.metadata = {"ontology": ontology, "role": role}
+    return msg
+
+
+@pytest.mark.parametrize("role", ["research_result", "verify_result", "index_update"])
+def test_replies_go_to_dispatcher_only(role):
+    assert _reply_template().match(_message(role))
+    assert not (~Template()).match(_message(role))  # orkestrator ne prima poruke
+
+
+@pytest.mark.parametrize("msg", [_message("research"), _message("research_result", ontology="drugo")])
+def test_other_messages_are_not_replies(msg):
+    assert not _reply_template().match(msg)
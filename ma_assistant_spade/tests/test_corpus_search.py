@@ -0,0 +1,208 @@
+import random
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.tools.corpus_search as corpus_search
+from src.tools.corpus_search import CorpusIndex
+
+_WORDS = [
+    "grad", "rijeka", "utvrda", "muzej", "barok", "glazba", "festival", "knjižnica", "tvrđava", "most",
+    "trg", "crkva", "palača", "vrt", "groblje", "kazalište", "škola", "sveučilište", "tvornica", "luka",
+]
+
+
+def _document(seed: int, sentences: int = 40) -> str:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(sentences):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 14))]
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+def _write_corpus(directory: Path, docs: dict) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, text in docs.items():
+        (directory / f"{name}.txt").write_text(text, encoding="utf-8")
+    return directory
+
+
+def _term_counts(index: CorpusIndex) -> dict:
+    """(doc_id, chunk_id) -> {pojam: frekvencija}, neovisno o redoslijedu redaka i rječnika."""
+    snap = index._snap
+    terms = {col: term for term, col in snap.vocab.items()}
+    out = {}
+    for row in range(snap.tf.shape[0]):
+        chunk = snap.chunks[row]
+        lo, hi = snap.tf.indptr[row], snap.tf.indptr[row + 1]
+        out[(chunk.doc_id, chunk.chunk_id)] = {
+            terms[int(c)]: float(v) for c, v in zip(snap.tf.indices[lo:hi], snap.tf.data[lo:hi])
+        }
+    return out
+
+
+def _results(index: CorpusIndex, queries, top_k: int = 5):
+    return [[(c.doc_id, c.chunk_id, round(s, 6)) for c, s in index.search(q, top_k)] for q in queries]
+
+
+QUERIES = ["utvrda muzej", "barok glazba festival", "most na rijeci", "zmajoglavac", "knjižnica i škola"]
+
+
+@pytest.fixture(params=[None, 50], ids=["blok", "mali-blok"])
+def block_nnz(request, monkeypatch):
+    """Zadani blok izgradnje i vrlo mali blok (više prolaza transpozicije)."""
+    if request.param is not None:
+        monkeypatch.setattr(corpus_search, "_BUILD_BLOCK_NNZ", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("retriever", ["bm25", "tfidf"])
+def test_incremental_rebuild_matches_full_build(tmp_path, block_nnz, retriever):
+    docs = {f"doc{i}": _document(i) for i in range(6)}
+    live = _write_corpus(tmp_path / "live", docs)
+    incremental = CorpusIndex(str(live), chunk_chars=300, overlap=50, retriever=retriever, query_cache_size=0)
+    incremental.build()
+    first = incremental.generation
+
+    (live / "doc1.txt").write_text(_document(101) + " Zmajoglavac.", encoding="utf-8")  # izmijenjen
+    (live / "doc4.txt").unlink()  # obrisan
+    (live / "doc9.txt").write_text(_document(9), encoding="utf-8")  # novi
+    assert incremental.reload()
+    assert incremental.generation > first
+
+    fresh = tmp_path / "fresh"
+    shutil.copytree(live, fresh, ignore=shutil.ignore_patterns(".index"))
+    full = CorpusIndex(str(fresh), chunk_chars=300, overlap=50, retriever=retriever, query_cache_size=0)
+    full.build(force=True)
+
+    assert _term_counts(incremental) == _term_counts(full)
+    assert _results(incremental, QUERIES) == _results(full, QUERIES)
+
+
+def test_deleted_document_terms_are_pruned(tmp_path, block_nnz):
+    docs = {"a": _document(1), "b": _document(2) + " Zmajoglavac i zmajoglavac."}
+    live = _write_corpus(tmp_path / "live", docs)
+    index = CorpusIndex(str(live), chunk_chars=300, overlap=50)
+    index.build()
+    assert "zmajoglavac" in index._snap.vocab
+    assert index.search("zmajoglavac")
+
+    (live / "b.txt").unlink()
+    assert index.reload()
+    assert "zmajoglavac" not in index._snap.vocab
+    assert index.stats["pruned_terms"] > 0
+    assert index.search("zmajoglavac") == []
+    assert {c.doc_id for c in index.chunks} == {"a"}
+
+
+def test_unchanged_corpus_keeps_generation(tmp_path):
+    live = _write_corpus(tmp_path / "live", {"a": _document(1)})
+    index = CorpusIndex(str(live))
+    index.build()
+    assert not index.reload()
+
+    reopened = CorpusIndex(str(live))
+    reopened.build()
+    assert reopened.generation == index.generation
+    assert _results(reopened, QUERIES) == _results(index, QUERIES)
+
+
+def test_read_only_index_follows_new_generation(tmp_path):
+    live = _write_corpus(tmp_path / "live", {"a": _document(1)})
+    writer = CorpusIndex(str(live), chunk_chars=300, overlap=50)
+    writer.build()
+    reader = CorpusIndex(str(live), chunk_chars=300, overlap=50, read_only=True)
+    reader.build()
+    old = reader.generation
+    old_text = reader.chunk_text("a", 0, old)
+
+    (live / "b.txt").write_text("Zmajoglavac živi uz rijeku. " * 20, encoding="utf-8")
+    assert writer.reload()
+    assert not reader.search("zmajoglavac")
+    assert reader.reload()
+    assert reader.generation == writer.generation > old
+    assert {c.doc_id for c, _ in reader.search("zmajoglavac")} == {"b"}
+    assert reader.chunk_text("a", 0, old) == old_text  # prethodna generacija ostaje čitljiva
+    assert not reader.reload()
+
+
+def test_read_only_index_rejects_other_settings(tmp_path):
+    live = _write_corpus(tmp_path / "live", {"a": _document(1)})
+    with pytest.raises(FileNotFoundError):
+        CorpusIndex(str(live), read_only=True).build()
+    CorpusIndex(str(live), chunk_chars=300).build()
+    with pytest.raises(ValueError):
+        CorpusIndex(str(live), chunk_chars=500, read_only=True).build()
+
+
+def test_top_k_matches_full_ranking(tmp_path):
+    live = _write_corpus(tmp_path / "live", {f"doc{i}": _document(i) for i in range(5)})
+    index = CorpusIndex(str(live), chunk_chars=300, overlap=50, query_cache_size=0)
+    index.build()
+    snap = index._snap
+    for query in QUERIES:
+        cols, counts = index._query_terms(snap, query)
+        vals = index._scorers["bm25"].query_weights(counts, snap.term_weights["bm25"][cols])
+        full = np.asarray(snap.postings["bm25"][cols].T @ vals).ravel()  # svi chunkovi, kao prije
+        expected = sorted((s for s in full if s > 0), reverse=True)[:3]
+        assert [s for _, s in index.search(query, top_k=3)] == pytest.approx(expected)
+
+
+def test_parallel_build_matches_sequential(tmp_path):
+    docs = {f"doc{i}": _document(i) for i in range(6)}
+    sequential = CorpusIndex(str(_write_corpus(tmp_path / "seq", docs)), chunk_chars=300, overlap=50)
+    sequential.build()
+    parallel = CorpusIndex(str(_write_corpus(tmp_path / "par", docs)), chunk_chars=300, overlap=50, build_workers=2)
+    try:
+        parallel.build()
+    finally:
+        parallel.close()
+    assert _term_counts(parallel) == _term_counts(sequential)
+    assert _results(parallel, QUERIES) == _results(sequential, QUERIES)
+
+
+def test_small_read_blocks_give_same_chunks(tmp_path):
+    corpus = _write_corpus(tmp_path / "c", {f"doc{i}": _document(i) for i in range(3)})
+    chunks = {}
+    for block_chars in (1 << 20, 97):
+        index_dir = str(tmp_path / f"index{block_chars}")
+        index = CorpusIndex(str(corpus), chunk_chars=300, overlap=50, index_dir=index_dir, block_chars=block_chars)
+        index.build()
+        chunks[block_chars] = [(c.doc_id, c.chunk_id, c.text) for c in index.chunks]
+        index.close()
+    assert chunks[97] == chunks[1 << 20]
+    assert all(len(text) <= 300 for _, _, text in chunks[97])
+
+
+@pytest.mark.parametrize("retriever", ["bm25", "tfidf", "hybrid"])
+def test_search_batch_matches_search(tmp_path, retriever):
+    live = _write_corpus(tmp_path / "live", {f"doc{i}": _document(i) for i in range(4)})
+    index = CorpusIndex(str(live), chunk_chars=300, overlap=50, retriever=retriever, query_cache_size=0)
+    index.build()
+    for query, batch in zip(QUERIES, index.search_batch(QUERIES, top_k=4)):
+        single = index.search(query, top_k=4)
+        # Gotovo jednaki rezultati mogu zamijeniti mjesta (zbrajanje u drugom redoslijedu)
+        assert [s for _, s in batch] == pytest.approx([s for _, s in single], rel=1e-6)
+        top = {(c.doc_id, c.chunk_id): s for c, s in single}
+        for chunk, score in batch:
+            key = (chunk.doc_id, chunk.chunk_id)
+            assert key in top or score == pytest.approx(single[-1][1], rel=1e-6)
+
+
+def test_query_cache_hits_normalized_query_until_new_generation(tmp_path):
+    live = _write_corpus(tmp_path / "live", {f"doc{i}": _document(i) for i in range(3)})
+    index = CorpusIndex(str(live), chunk_chars=300, overlap=50)
+    index.build()
+    first = index.search("utvrda muzej")
+    # Ista prepoznata riječ uz drukčiju interpunkciju i velika slova
+    assert index.search("Muzej, utvrda!") == first
+    assert index.stats["query_cache_hits"] == 1
+
+    (live / "doc9.txt").write_text(_document(9), encoding="utf-8")
+    assert index.reload()
+    index.search("utvrda muzej")
+    assert index.stats["query_cache_hits"] == 1
+    assert index.stats["query_cache_invalidations"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+from spade.message import Message
+
+from src.tools.correlator import ReplyCorrelator
+
+
+def _reply(conversation_id: str, role: str = "research", claim_id: str = "", body: str = "") -> Message:
+    msg = Message(to="coordinator@localhost", sender="researcher@localhost", body=body)
+    msg.metadata = {"conversation-id": conversation_id, "role": role}
+    if claim_id:
+        msg.metadata["claim-id"] = claim_id
+    return msg
+
+
+def test_waiter_gets_reply():
+    async def scenario():
+        corr = ReplyCorrelator()
+        waiting = asyncio.create_task(corr.wait("c1", "research", timeout=1.0))
+        await asyncio.sleep(0)
+        assert corr.deliver(_reply("c1", body="ok"))
+        return await waiting
+
+    assert asyncio.run(scenario()).body == "ok"
+
+
+def test_early_reply_is_buffered():
+    async def scenario():
+        corr = ReplyCorrelator()
+        assert not corr.deliver(_reply("c1", body="rano"))
+        return await corr.wait("c1", "research", timeout=0.1)
+
+    assert asyncio.run(scenario()).body == "rano"
+
+
+def test_buffered_reply_expires():
+    async def scenario():
+        corr = ReplyCorrelator(buffer_ttl=0.0)
+        corr.deliver(_reply("c1"))
+        await asyncio.sleep(0.01)
+        return await corr.wait("c1", "research", timeout=0.05)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_expired_replies_leave_buffer():
+    async def scenario():
+        corr = ReplyCorrelator(buffer_ttl=0.0)
+        corr.deliver(_reply("c1"))
+        await asyncio.sleep(0.01)
+        corr.deliver(_reply("c2"))
+        return list(corr._buffer)
+
+    assert asyncio.run(scenario()) == [("c2", "research", "")]
+
+
+def test_buffer_is_bounded_and_drops_oldest():
+    corr = ReplyCorrelator(max_buffered=2)
+    for cid in ("c1", "c2", "c3"):
+        corr.deliver(_reply(cid))
+    assert [k[0] for k in corr._buffer] == ["c2", "c3"]
+
+
+def test_duplicate_reply_is_dropped():
+    corr = ReplyCorrelator()
+    corr.deliver(_reply("c1", body="prvi"))
+    assert not corr.deliver(_reply("c1", body="drugi"))
+    assert corr._buffer[("c1", "research", "")][0].body == "prvi"
+
+
+def test_claim_id_separates_replies():
+    async def scenario():
+        corr = ReplyCorrelator()
+        corr.deliver(_reply("c1", "verify", "2", body="dva"))
+        corr.deliver(_reply("c1", "verify", "1", body="jedan"))
+        return [(await corr.wait("c1", "verify", 0.1, claim_id=c)).body for c in ("1", "2")]
+
+    assert asyncio.run(scenario()) == ["jedan", "dva"]
+
+
+def test_wait_times_out_and_forgets_waiter():
+    async def scenario():
+        corr = ReplyCorrelator()
+        result = await corr.wait("c1", "research", timeout=0.01)
+        return result, corr._pending
+
+    assert asyncio.run(scenario()) == (None, {})
+
+
+def test_discard_cancels_waiters_and_buffer():
+    async def scenario():
+        corr = ReplyCorrelator()
+        corr.deliver(_reply("c1", "verify"))
+        waiting = asyncio.create_task(corr.wait("c1", "research", timeout=1.0))
+        await asyncio.sleep(0)
+        corr.discard("c1")
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            return dict(corr._buffer), corr._pending
+        raise AssertionError("čekatelj nije otkazan")
+
+    assert asyncio.run(scenario()) == ({}, {})
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import src.tools.dense as dense
+from src.tools.corpus_search import CorpusIndex
+from src.tools.dense import DenseIndex, HashingEmbedder, make_embedder
+
+
+def _vectors(n: int = 300, dim: int = 32, seed: int = 0) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    emb = HashingEmbedder(dim=64)
+    a = emb.embed(["Stari grad Varaždin", ""])
+    assert np.array_equal(a, HashingEmbedder(dim=64).embed(["Stari grad Varaždin", ""]))
+    assert np.linalg.norm(a[0]) == pytest.approx(1.0)
+    assert not a[1].any()
+
+
+def test_hashing_embedder_matches_word_forms():
+    v = HashingEmbedder().embed(["utvrda u gradu", "utvrdi u gradovima", "festival barokne glazbe"])
+    assert v[0] @ v[1] > v[0] @ v[2]
+
+
+@pytest.mark.parametrize("quant, tol", [("int8", 0.02), ("float16", 1e-3)])
+def test_quantized_scores_stay_close(quant, tol):
+    x = _vectors()
+    index = DenseIndex.from_parts([DenseIndex.quantize(x, quant)], x.shape[1], quant)
+    q = x[7]
+    rows, scores = index.search(q, top_k=5)
+    assert rows[np.argmax(scores)] == 7
+    assert scores == pytest.approx(x[rows] @ q, abs=tol)
+
+
+def test_ivf_with_all_lists_equals_exact():
+    x = _vectors()
+    parts = [DenseIndex.quantize(x[:100], "int8"), DenseIndex.quantize(x[100:], "int8")]
+    exact = DenseIndex.from_parts(parts, x.shape[1], "int8")
+    ivf = DenseIndex.from_parts(parts, x.shape[1], "int8", search="ivf")
+    ivf.nprobe = len(ivf.centroids)
+    q = x[42]
+    e_rows, e_scores = exact.search(q, top_k=10)
+    i_rows, i_scores = ivf.search(q, top_k=10)
+    best = np.argsort(-i_scores)[:10]
+    assert set(i_rows[best]) == set(e_rows)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    x = _vectors()
+    index = DenseIndex.from_parts([DenseIndex.quantize(x, "int8")], x.shape[1], "int8", search="ivf")
+    index.save(tmp_path)
+    loaded = DenseIndex.load(tmp_path, nprobe=3)
+    assert isinstance(loaded.codes, np.memmap)
+    assert loaded.quant == "int8" and loaded.nprobe == 3
+    assert np.array_equal(loaded.rows(10, 20)[0], index.rows(10, 20)[0])
+    assert np.array_equal(loaded.search(x[3], 5)[0], DenseIndex(**_ivf_args(index, 3)).search(x[3], 5)[0])
+
+
+def _ivf_args(index: DenseIndex, nprobe: int) -> dict:
+    return dict(
+        codes=index.codes, scales=index.scales, centroids=index.centroids,
+        ivf_ptr=index.ivf_ptr, ivf_rows=index.ivf_rows, nprobe=nprobe,
+    )
+
+
+def test_model_without_package_is_an_error(monkeypatch):
+    monkeypatch.setattr(dense, "SentenceTransformer", None)
+    assert isinstance(make_embedder("hashing"), HashingEmbedder)
+    with pytest.raises(ValueError, match="sentence-transformers"):
+        make_embedder("paraphrase-multilingual-MiniLM-L12-v2")
+
+
+def test_dense_retriever_in_corpus_index(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "utvrda.txt").write_text("Stari grad je utvrda s muzejom i obrambenim zidinama. " * 10, encoding="utf-8")
+    (corpus / "glazba.txt").write_text("Festival barokne glazbe održava se svake jeseni. " * 10, encoding="utf-8")
+    index = CorpusIndex(str(corpus), retriever="dense", dense_dim=128, chunk_chars=200, overlap=40)
+    index.build()
+    assert index.search("muzej u utvrdi", top_k=1)[0][0].doc_id == "utvrda"
+    assert index.search("barokni festival", top_k=1)[0][0].doc_id == "glazba"
+    with pytest.raises(ValueError):
+        CorpusIndex(str(corpus), retriever="dense", dense_quant="int4")
+    with pytest.raises(ValueError):
+        CorpusIndex(str(corpus), retriever="dense", dense_search="hnsw")
@@ -0,0 +1,45 @@
+from src.tools.evidence import evidence_tokens, pack_evidence
+
+_TEXT = (
+    "Varaždin je grad na sjeveru Hrvatske. Stari grad je utvrda iz 14. stoljeća. "
+    "Danas je u utvrdi Gradski muzej. Grad je poznat po baroknoj glazbi i festivalu Špancirfest."
+)
+
+
+def _passage(doc_id: str, chunk_id: int, text: str) -> dict:
+    return {"doc_id": doc_id, "chunk_id": chunk_id, "text": text, "score": 1.0}
+
+
+def test_unlimited_budget_keeps_order_and_keys():
+    passages = [_passage("a", 0, _TEXT), _passage("b", 2, "Drugi dokaz o Dravi.")]
+    packed = pack_evidence(passages, "utvrda", 0)
+    assert packed == passages
+    assert packed[0] is not passages[0]
+
+
+def test_repeated_chunk_is_skipped():
+    passages = [_passage("a", 0, _TEXT), _passage("a", 0, _TEXT)]
+    assert len(pack_evidence(passages, "utvrda", 0)) == 1
+
+
+def test_overlap_with_neighbouring_chunk_is_removed():
+    overlap = "Grad je poznat po baroknoj glazbi i festivalu Špancirfest. "
+    first = _passage("a", 0, _TEXT)
+    second = _passage("a", 1, overlap + "Održava se svake godine krajem kolovoza.")
+    packed = pack_evidence([first, second], "festival", 0)
+    assert packed[1]["text"] == "Održava se svake godine krajem kolovoza."
+
+
+def test_budget_trims_to_query_sentences():
+    passages = [_passage("a", 0, _TEXT), _passage("b", 0, " ".join([_TEXT] * 4))]
+    budget = evidence_tokens(passages[:1]) + 40
+    packed = pack_evidence(passages, "muzej utvrda", budget)
+    assert evidence_tokens(packed) <= budget
+    assert packed[0]["text"] == _TEXT
+    assert "muzej" in packed[1]["text"] and len(packed[1]["text"]) < len(passages[1]["text"])
+
+
+def test_leftover_below_min_tokens_is_dropped():
+    passages = [_passage("a", 0, _TEXT), _passage("b", 0, " ".join([_TEXT] * 4))]
+    budget = evidence_tokens(passages[:1]) + 10
+    assert [e["doc_id"] for e in pack_evidence(passages, "muzej", budget, min_tokens=24)] == ["a"]
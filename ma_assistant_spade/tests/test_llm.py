@@ -0,0 +1,234 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from src.tools.llm import CompletionCache, LLMClient, LLMConfig
+from src.tools.output import ConsoleSink
+
+
+class _Backend:
+    """Umjesto OpenAI klijenta: `responses.create` redom vraća ili baca zadane ishode."""
+
+    def __init__(self, outcomes, delay: float = 0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.requests = []
+        self.responses = self
+
+    def _next(self, request):
+        self.requests.append(request)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def create(self, **request):
+        return SimpleNamespace(output_text=self._next(request))
+
+
+class _AsyncBackend(_Backend):
+    async def create(self, **request):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(output_text=self._next(request))
+
+
+def _client(outcomes=(), async_outcomes=(), delay=0.0, **config) -> LLMClient:
+    config = {"model": "test", "backoff_base": 0.0, **config}
+    return LLMClient(LLMConfig(**config), client=_Backend(outcomes), async_client=_AsyncBackend(async_outcomes, delay))
+
+
+def test_complete_retries_transient_errors():
+    llm = _client([ConnectionError("mreža"), "odgovor"])
+    assert llm.complete("sustav", "pitanje") == "odgovor"
+    request = llm.client.requests[-1]
+    assert request["input"] == [{"role": "system", "content": "sustav"}, {"role": "user", "content": "pitanje"}]
+
+
+def test_acomplete_retries_then_gives_up():
+    llm = _client(async_outcomes=[ConnectionError("a"), "ok"])
+    assert asyncio.run(llm.acomplete("s", "u")) == "ok"
+
+    failing = _client(async_outcomes=[ConnectionError(str(i)) for i in range(3)], max_retries=3)
+    with pytest.raises(RuntimeError, match="after retries"):
+        asyncio.run(failing.acomplete("s", "u"))
+    assert len(failing.async_client.requests) == 3
+
+
+def test_acomplete_timeout_counts_as_failed_attempt():
+    llm = _client(async_outcomes=["kasno", "kasno"], delay=0.2, timeout=0.01, max_retries=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(llm.acomplete("s", "u"))
+
+
+def test_acomplete_does_not_block_event_loop():
+    llm = _client(async_outcomes=["ok"], delay=0.1)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        text = await llm.acomplete("s", "u")
+        task.cancel()
+        return text, ticks
+
+    text, ticks = asyncio.run(scenario())
+    assert text == "ok" and ticks >= 5
+
+
+def test_backoff_is_bounded_full_jitter():
+    llm = _client(backoff_base=0.5)
+    for attempt in range(4):
+        delays = [llm._backoff(attempt) for _ in range(50)]
+        assert all(0 <= d <= 0.5 * 2**attempt for d in delays)
+
+
+def test_cache_key_covers_model_parameters_and_prompts():
+    base = CompletionCache.key(LLMConfig(model="a"), "s", "u")
+    assert base == CompletionCache.key(LLMConfig(model="a", timeout=5.0), "s", "u")  # timeout ne mijenja odgovor
+    assert base != CompletionCache.key(LLMConfig(model="b"), "s", "u")
+    assert base != CompletionCache.key(LLMConfig(model="a", temperature=0.7), "s", "u")
+    assert base != CompletionCache.key(LLMConfig(model="a"), "s", "u2")
+
+
+def test_memory_cache_is_bounded_lru():
+    cache = CompletionCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1"
+    assert cache.stats["memory_hits"] == 2 and cache.stats["misses"] == 1
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache" / "completions.sqlite")
+    CompletionCache(path).put("k", "odgovor")
+    reopened = CompletionCache(path)
+    assert reopened.persistent
+    assert reopened.get("k") == "odgovor"
+    assert reopened.stats["disk_hits"] == 1
+    assert reopened.get_memory("k") == "odgovor"  # disk puni memoriju
+
+
+@pytest.mark.parametrize("path", [None, "completions.sqlite"])
+def test_client_calls_model_once_per_prompt(tmp_path, path):
+    cache = CompletionCache(str(tmp_path / path) if path else None)
+    llm = LLMClient(
+        LLMConfig(model="test", backoff_base=0.0),
+        client=_Backend(["jednom"]),
+        async_client=_AsyncBackend(["asinkrono"]),
+        cache=cache,
+    )
+    assert llm.complete("s", "u") == llm.complete("s", "u") == "jednom"
+    assert asyncio.run(llm.acomplete("s", "u")) == "jednom"  # isti ključ kao sinkroni poziv
+    assert asyncio.run(llm.acomplete("s", "drugo")) == "asinkrono"
+    assert asyncio.run(llm.acomplete("s", "drugo")) == "asinkrono"
+    assert len(llm.client.requests) == len(llm.async_client.requests) == 1
+
+
+def test_empty_answer_is_not_cached():
+    cache = CompletionCache()
+    llm = LLMClient(LLMConfig(model="test"), client=_Backend(["", "drugi"]), async_client=_AsyncBackend([]), cache=cache)
+    assert llm.complete("s", "u") == ""
+    assert llm.complete("s", "u") == "drugi"
+
+
+class _Stream:
+    def __init__(self, items, delay: float = 0.0):
+        self.items = list(items)
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            raise StopAsyncIteration
+        item = self.items.pop(0)
+        if isinstance(item, BaseException):
+            raise item
+        await asyncio.sleep(self.delay)
+        if isinstance(item, str):
+            return SimpleNamespace(type="response.output_text.delta", delta=item)
+        return item
+
+    async def close(self):
+        self.closed = True
+
+
+class _StreamBackend(_AsyncBackend):
+    """`stream=True`: svaki ishod je popis dijelova teksta (ili iznimaka usred streama)."""
+
+    async def create(self, stream=False, **request):
+        outcome = self._next(request)
+        self.streams = getattr(self, "streams", []) + [_Stream(outcome, self.delay)]
+        return self.streams[-1]
+
+
+def _streaming(outcomes, cache=None, delay=0.0, **config) -> LLMClient:
+    config = {"model": "test", "backoff_base": 0.0, **config}
+    return LLMClient(
+        LLMConfig(**config), client=_Backend([]), async_client=_StreamBackend(outcomes, delay), cache=cache
+    )
+
+
+async def _collect(llm: LLMClient, user: str = "u"):
+    return [part async for part in llm.astream("s", user)]
+
+
+def test_astream_yields_deltas_and_closes_stream():
+    done = SimpleNamespace(type="response.completed", delta="")
+    llm = _streaming([["Vara", "ždin ", done, "je grad."]])
+    assert asyncio.run(_collect(llm)) == ["Vara", "ždin ", "je grad."]
+    assert llm.async_client.streams[0].closed
+
+
+def test_astream_retries_only_before_first_delta():
+    llm = _streaming([[ConnectionError("prije")], ["ok"]])
+    assert asyncio.run(_collect(llm)) == ["ok"]
+
+    broken = _streaming([["prvi dio", ConnectionError("usred")], ["ponovno"]])
+    with pytest.raises(RuntimeError, match="interrupted"):
+        asyncio.run(_collect(broken))
+    assert len(broken.async_client.requests) == 1  # prikazani dio se ne ponavlja
+
+
+def test_astream_timeout_covers_whole_answer():
+    # Svaki dio stiže na vrijeme, ali cijeli odgovor ne
+    llm = _streaming([["a"] * 10, ["b"] * 10], delay=0.05, timeout=0.12, max_retries=2)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        asyncio.run(_collect(llm))
+    assert len(llm.async_client.requests) == 1
+
+
+def test_astream_cache_stores_full_text_and_replays_at_once():
+    cache = CompletionCache()
+    llm = _streaming([["Prvi ", "odgovor."]], cache=cache)
+    assert asyncio.run(_collect(llm)) == ["Prvi ", "odgovor."]
+    assert asyncio.run(_collect(llm)) == ["Prvi odgovor."]
+    assert len(llm.async_client.requests) == 1
+
+
+def test_console_sink_keeps_concurrent_answers_apart():
+    out = io.StringIO()
+    sink = ConsoleSink(out)
+    sink.begin("a", "prvo")
+    sink.begin("b", "drugo")
+    sink.write("b", "B1 ")
+    sink.write("a", "A1 ")
+    sink.end("b")  # završen, ali čeka da se ispiše prvi
+    assert "B1" not in out.getvalue()
+    sink.write("a", "A2")
+    sink.end("a")
+    text = out.getvalue()
+    assert text.index("A1 A2") < text.index("(drugo)") < text.index("B1")
+    sink.end("nepoznat")
@@ -0,0 +1,112 @@
+import gzip
+import json
+import logging
+import zlib
+
+from src.tools.logging_utils import (
+    LogPipeline,
+    _apply_body,
+    _JsonFormatter,
+    _JsonlFileHandler,
+    close_logger,
+    log_msg,
+    setup_logger,
+)
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _pipeline_logger(pipeline: LogPipeline, name: str) -> logging.Logger:
+    logger = logging.Logger(name)  # izvan logging.getLogger, pa ne dijeli handlere s drugim testovima
+    logger.addHandler(pipeline.handler)
+    return logger
+
+
+def _message(logger: logging.Logger, conversation_id: str, body: str = "tijelo") -> None:
+    log_msg(logger, "send", "a@localhost", "b@localhost", {"conversation-id": conversation_id}, body)
+
+
+def test_body_modes():
+    rec = {"direction": "send", "metadata": {}, "body": "čćž" * 4}
+    assert _apply_body(rec, "full", 5) is rec
+    short = _apply_body(rec, "truncate", 5)
+    assert short["body"] == "čćžčć…" and short["body_bytes"] == 24
+    hashed = _apply_body(rec, "hash", 5)
+    assert "body" not in hashed and len(hashed["body_sha1"]) == 40 and hashed["body_bytes"] == 24
+    assert _apply_body(rec, "truncate", 100)["body"] == rec["body"]
+
+
+def test_default_logger_truncates_bodies(tmp_path):
+    logger = setup_logger(str(tmp_path), "test_default_body")
+    _message(logger, "c1", "x" * 2000)
+    stats = close_logger(logger)
+    (log_file,) = tmp_path.glob("*.jsonl")
+    lines = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    (message,) = [line for line in lines if line.get("direction") == "send"]
+    assert message["body"] == "x" * 500 + "…"
+    assert message["body_bytes"] == 2000
+    assert stats["dropped"] == 0
+
+
+def test_messages_are_dropped_before_warnings():
+    pipeline = LogPipeline([], queue_size=10)
+    assert pipeline.message_limit == 9
+    logger = _pipeline_logger(pipeline, "test_drop")
+    for i in range(20):
+        _message(logger, f"c{i}")
+    assert pipeline.queue.qsize() == 9
+    assert pipeline.stats["dropped"] == 11
+    # Rezervirano mjesto: upozorenje ulazi i kad su poruke popunile svoj dio reda
+    logger.warning("index_missing")
+    assert pipeline.queue.qsize() == 10
+    logger.warning("drugo")  # red je pun: ni upozorenje ne čeka
+    assert pipeline.stats["dropped"] == 12
+
+    out = _Collect()
+    pipeline.handlers = [out]
+    pipeline.start()
+    pipeline.stop()
+    messages = [r.getMessage() for r in out.records]
+    assert messages[-2:] == ["index_missing", "log_dropped total=12 new=12"]
+    assert pipeline.stats["written"] == 11
+
+
+def test_sampling_keeps_whole_conversations():
+    pipeline = LogPipeline([], queue_size=10_000, sample=0.5)
+    logger = _pipeline_logger(pipeline, "test_sample")
+    conversations = [f"c{i}" for i in range(200)]
+    for cid in conversations:
+        for _ in range(3):
+            _message(logger, cid)
+    logger.info("nije poruka agenta")
+    records = [r for r in list(pipeline.queue.queue) if hasattr(r, "message_record")]
+    kept = {r.message_record["metadata"]["conversation-id"] for r in records}
+    expected = {cid for cid in conversations if zlib.crc32(cid.encode("utf-8")) <= int(0.5 * 0xFFFFFFFF)}
+    assert kept == expected
+    assert 0 < len(kept) < len(conversations)
+    assert pipeline.queue.qsize() == 3 * len(kept) + 1
+    assert pipeline.stats["sampled_out"] == 3 * (len(conversations) - len(kept))
+
+
+def test_rotation_compresses_old_files(tmp_path):
+    path = tmp_path / "log.jsonl"
+    handler = _JsonlFileHandler(str(path), max_bytes=300, backups=2, compress=True)
+    handler.setFormatter(_JsonFormatter("full", 500))
+    for i in range(40):
+        handler.emit(logging.LogRecord("t", logging.INFO, __file__, 0, "zapis %03d", (i,), None))
+    handler.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["log.jsonl", "log.jsonl.1.gz", "log.jsonl.2.gz"]
+    assert path.stat().st_size <= 300
+    rotated = gzip.decompress((tmp_path / "log.jsonl.1.gz").read_bytes()).decode("utf-8").splitlines()
+    assert sum(len(line.encode("utf-8")) + 1 for line in rotated) <= 300
+    newest = [json.loads(line)["msg"] for line in rotated + path.read_text(encoding="utf-8").splitlines()]
+    assert newest[-1] == "zapis 039"
+    assert newest == sorted(newest)  # .1 je najnovija rotirana datoteka, prije trenutne
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+
+import pytest
+from spade.message import Message
+
+from src.protocol import ENCODING, MessageCodec, decode_body, encode_body, unresolved_evidence
+from src.tools.corpus_search import CorpusIndex
+
+_LOGGER = logging.getLogger("test_protocol")
+
+
+@pytest.mark.parametrize("encoding", ["json", "json+zlib"])
+def test_body_round_trip(encoding):
+    payload = {"query": "Varaždin " * 200, "evidence": [{"doc_id": "a", "chunk_id": 1, "text": "č" * 300}]}
+    body, used = encode_body(payload, encoding)
+    assert used == encoding
+    assert decode_body(body, used) == payload
+
+
+def test_short_body_stays_plain_json():
+    body, used = encode_body({"q": "kratko"}, "json+zlib")
+    assert used == "json"
+    assert decode_body(body, used) == {"q": "kratko"}
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        MessageCodec("xml")
+    with pytest.raises(ValueError):
+        decode_body("e30=", "xml")
+
+
+def _message(body: str, md: dict, sender: str = "researcher@localhost") -> Message:
+    msg = Message(to="verifier@localhost", sender=sender, body=body)
+    msg.metadata = md
+    return msg
+
+
+def _send(sender: MessageCodec, payload: dict) -> Message:
+    body, md = sender.encode(payload, "verifier@localhost/res")
+    return _message(body, md)
+
+
+@pytest.fixture
+def indexes(corpus):
+    writer = CorpusIndex(str(corpus))
+    writer.build()
+    reader = CorpusIndex(str(corpus), read_only=True, query_cache_size=0)
+    reader.build()
+    return writer, reader
+
+
+def _codecs(writer: CorpusIndex, reader: CorpusIndex):
+    sender = MessageCodec("json", True, writer, _LOGGER)
+    receiver = MessageCodec("json", True, reader, _LOGGER)
+    sender._body(_message("{}", receiver.advertise(), "verifier@localhost/res"))  # oglas primatelja (evidence-refs)
+    return sender, receiver
+
+
+def test_evidence_ref_round_trip(indexes):
+    writer, reader = indexes
+    sender, receiver = _codecs(writer, reader)
+    chunk = writer.chunks[0]
+    text = writer.chunk_text(chunk.doc_id, chunk.chunk_id, writer.generation)
+    evidence = [
+        {"doc_id": chunk.doc_id, "chunk_id": chunk.chunk_id, "text": text},
+        {"doc_id": chunk.doc_id, "chunk_id": chunk.chunk_id, "text": text[10:60]},
+        {"doc_id": "izvan", "chunk_id": 0, "text": "Tekst koji nije u indeksu."},
+    ]
+    msg = _send(sender, {"evidence": evidence})
+    assert sender.stats == {"evidence_refs": 2, "evidence_texts": 1, "unresolved_refs": 0}
+    assert text not in msg.body
+    assert receiver.decode(msg)["evidence"] == evidence
+
+
+def test_peer_without_refs_gets_texts(indexes):
+    writer, _ = indexes
+    sender = MessageCodec("json", True, writer, _LOGGER)
+    chunk = writer.chunks[0]
+    evidence = [{"doc_id": chunk.doc_id, "chunk_id": chunk.chunk_id, "text": "nešto"}]
+    body, md = sender.encode({"evidence": evidence}, "verifier@localhost")
+    assert ENCODING not in md
+    assert decode_body(body) == {"evidence": evidence}
+
+
+def test_newer_generation_is_loaded_by_adecode(indexes, corpus):
+    writer, reader = indexes
+    sender, receiver = _codecs(writer, reader)
+    (corpus / "novi.txt").write_text("Novi dokument o Osijeku i Dravi. " * 30, encoding="utf-8")
+    assert writer.reload()
+    text = writer.chunk_text("novi", 0, writer.generation)
+    msg = _send(sender, {"evidence": [{"doc_id": "novi", "chunk_id": 0, "text": text}]})
+
+    # decode čita samo već učitane generacije
+    assert unresolved_evidence(receiver.decode(msg)["evidence"])
+    assert reader.generation < writer.generation
+
+    resolved = asyncio.run(receiver.adecode(msg))["evidence"]
+    assert resolved == [{"doc_id": "novi", "chunk_id": 0, "text": text}]
+    assert reader.generation == writer.generation
+
+
+def test_malformed_refs_become_unresolved_markers(indexes):
+    writer, reader = indexes
+    _, receiver = _codecs(writer, reader)
+    msg = _message('{"evidence": [["novi", "x", 99], ["novi"], [], ["novi", 0, 1, "a", "b"]]}', {})
+    evidence = asyncio.run(receiver.adecode(msg))["evidence"]
+    assert len(unresolved_evidence(evidence)) == len(evidence) == 4
+    assert all(e["text"] == "" for e in evidence)
+    assert receiver.stats["unresolved_refs"] == 4
+
+
+def test_receiver_without_index_marks_refs_unresolved():
+    receiver = MessageCodec("json", True, None, _LOGGER)
+    evidence = receiver.decode(_message('{"evidence": [["doc", 0, 1]]}', {}))["evidence"]
+    assert evidence == [{"doc_id": "doc", "chunk_id": 0, "generation": 1, "text": "", "unresolved": True}]
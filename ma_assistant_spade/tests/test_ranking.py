@@ -0,0 +1,85 @@
+import math
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from src.tools.ranking import Analyzer, BM25Scorer, TfidfScorer, fuse, light_stem
+
+# Tri chunka nad četiri pojma (sirove frekvencije)
+TF = sp.csr_matrix(np.array([[3, 1, 0, 0], [1, 0, 2, 0], [0, 0, 1, 6]], dtype=np.float32))
+DF = np.array([2, 1, 2, 1])
+
+
+def test_analyzer_stopwords_and_stemming():
+    assert Analyzer()("Varaždin je grad u Hrvatskoj i ima 45 tisuća stanovnika.") == [
+        "varaždin", "grad", "hrvatskoj", "45", "tisuća", "stanovnika",
+    ]
+    assert "je" in Analyzer(stopwords=False)("Grad je star.")
+    assert Analyzer(stemming=True)("gradovima gradova gradu") == ["grad", "grad", "grad"]
+
+
+def test_light_stem_keeps_short_stems():
+    assert light_stem("kuća") == "kuć"
+    assert light_stem("ulica") == "ulic"
+    assert light_stem("om") == "om"
+
+
+def test_bm25_matches_formula():
+    k1, b = 1.2, 0.75
+    scorer = BM25Scorer(k1=k1, b=b)
+    idf = scorer.term_weights(DF, 3)
+    assert idf[0] == pytest.approx(math.log(1 + (3 - 2 + 0.5) / (2 + 0.5)))
+    lengths = np.asarray(TF.sum(axis=1)).ravel()
+    avg = float(lengths.mean())
+    weights = scorer.doc_weights(TF, idf, avg)
+    expected = []
+    for row in range(3):
+        for col, f in zip(TF[row].indices, TF[row].data):
+            expected.append(idf[col] * f * (k1 + 1) / (f + k1 * (1 - b + b * lengths[row] / avg)))
+    assert weights == pytest.approx(expected, rel=1e-5)
+
+
+def test_bm25_term_frequency_saturates():
+    scorer = BM25Scorer()
+    idf = np.ones(1, dtype=np.float32)
+    tf = sp.csr_matrix(np.array([[1], [2], [20]], dtype=np.float32))
+    w = scorer.doc_weights(tf, idf, avg_len=1.0)
+    assert w[0] < w[1] < w[2] < scorer.k1 + 1
+    assert w[2] - w[1] < (w[1] - w[0]) * 18
+
+
+def test_tfidf_rows_are_unit_length():
+    scorer = TfidfScorer()
+    weights = scorer.doc_weights(TF, scorer.term_weights(DF, 3), 0.0)
+    rows = sp.csr_matrix((weights, TF.indices, TF.indptr), shape=TF.shape)
+    assert np.asarray(rows.multiply(rows).sum(axis=1)).ravel() == pytest.approx([1, 1, 1])
+
+
+def test_tfidf_matches_sklearn():
+    sklearn_text = pytest.importorskip("sklearn.feature_extraction.text")
+    docs = ["grad rijeka grad", "rijeka most", "most most trg grad"]
+    vec = sklearn_text.TfidfVectorizer()
+    expected = vec.fit_transform(docs).toarray()
+    vocab = vec.vocabulary_
+    rows, cols, data = [], [], []
+    for i, doc in enumerate(docs):
+        for term in set(doc.split()):
+            rows.append(i)
+            cols.append(vocab[term])
+            data.append(doc.split().count(term))
+    tf = sp.csr_matrix((np.array(data, dtype=np.float32), (rows, cols)), shape=expected.shape)
+    tf.sort_indices()
+    scorer = TfidfScorer()
+    idf = scorer.term_weights(np.diff(tf.tocsc().indptr), len(docs))
+    weights = scorer.doc_weights(tf, idf, 0.0)
+    got = sp.csr_matrix((weights, tf.indices, tf.indptr), shape=tf.shape).toarray()
+    assert got == pytest.approx(expected, rel=1e-5)
+
+
+def test_fuse_scales_each_ranking():
+    tfidf = np.array([0.2, 0.4, 0.1])
+    bm25 = np.array([6.0, 1.0, 3.0])
+    assert fuse([tfidf], 0.5) is tfidf
+    assert fuse([tfidf, bm25], 0.5) == pytest.approx([0.75, 0.5 + 1 / 12, 0.125 + 0.25])
+    assert fuse([np.zeros(2), bm25[:2]], 0.5) == pytest.approx([0.5, 1 / 12])
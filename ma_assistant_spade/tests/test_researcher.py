@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+from spade.message import Message
+
+from src.agents.researcher import ResearcherAgent, _ResearchBehaviour
+from src.protocol import ResearchRequest, make_metadata
+from src.tools.corpus_search import CorpusIndex
+from src.tools.llm import LLMClient, LLMConfig
+from src.tools.transport import LocalBus
+
+
+def _behaviour(index: CorpusIndex) -> _ResearchBehaviour:
+    behaviour = _ResearchBehaviour()
+    behaviour.agent = SimpleNamespace(index=index)
+    return behaviour
+
+
+def test_search_reports_generation_it_searched(tmp_path):
+    (tmp_path / "a.txt").write_text("Stari grad je utvrda s muzejom. " * 20, encoding="utf-8")
+    index = CorpusIndex(str(tmp_path), chunk_chars=200, overlap=40)
+    index.build()
+    first = index.generation
+    search = index.search
+    calls = []
+
+    def swapped_during_search(query, top_k=5):
+        results = search(query, top_k)
+        if not calls:
+            # Nova generacija stiže dok pretraga još traje
+            (tmp_path / "b.txt").write_text("Muzej u utvrdi ima novu zbirku. " * 20, encoding="utf-8")
+            index.reload()
+        calls.append(query)
+        return results
+
+    index.search = swapped_during_search
+    generation, results = _behaviour(index)._search([ResearchRequest(query="muzej", top_k=5)])
+    assert generation == index.generation > first
+    assert len(calls) == 2
+    assert "b" in {chunk.doc_id for chunk, _ in results[0]}
+
+
+def test_batch_search_trims_each_request(tmp_path):
+    (tmp_path / "a.txt").write_text("Stari grad je utvrda s muzejom. " * 40, encoding="utf-8")
+    index = CorpusIndex(str(tmp_path), chunk_chars=200, overlap=40)
+    index.build()
+    requests = [ResearchRequest(query="grad", top_k=1), ResearchRequest(query="utvrda", top_k=3)]
+    generation, results = _behaviour(index)._search(requests)
+    assert generation == index.generation
+    assert [len(r) for r in results] == [1, 3]
+
+
+class _SlowModel:
+    """`responses.create` koji odgovara nakon `delay` sekundi i broji istovremene pozive."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.responses = self
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, **request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(output_text="Sažetak [a:0].")
+
+
+async def _research(corpus, n: int, max_concurrency: int, delay: float = 0.2):
+    bus = LocalBus()
+    model = _SlowModel(delay)
+    researcher = ResearcherAgent(
+        "researcher@localhost",
+        "test",
+        corpus_dir=str(corpus),
+        top_k=2,
+        llm_model="test",
+        logger=logging.getLogger("test_researcher"),
+        reload_interval=0,
+        search_workers=1,
+        max_concurrency=max_concurrency,
+        llm_client=LLMClient(LLMConfig(model="test"), client=SimpleNamespace(), async_client=model),
+        bus=bus,
+    )
+    replies = []
+    coordinator = SimpleNamespace(jid=Message(to="coordinator@localhost").to, dispatch=replies.append)
+    await researcher.start(auto_register=False)
+    bus.register(coordinator)
+    try:
+        started = time.perf_counter()
+        for i in range(n):
+            msg = Message(to="researcher@localhost", sender="coordinator@localhost")
+            msg.metadata = make_metadata("request", f"c{i}", {"role": "research"})
+            msg.body = json.dumps({"query": "utvrda", "top_k": 2})
+            await bus.send(msg)
+            # Svaki zahtjev stiže nakon prozora serije, dok se prethodni sažetak još piše
+            await asyncio.sleep(0.03)
+        while len(replies) < n and time.perf_counter() - started < 5:
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started, replies, model.peak
+    finally:
+        await bus.unregister(coordinator)
+        await researcher.stop()
+
+
+def test_research_keeps_receiving_while_summaries_run(tmp_path):
+    (tmp_path / "a.txt").write_text("Stari grad je utvrda s muzejom. " * 20, encoding="utf-8")
+    elapsed, replies, peak = asyncio.run(_research(tmp_path, 3, max_concurrency=8))
+    assert sorted(r.metadata["conversation-id"] for r in replies) == ["c0", "c1", "c2"]
+    assert all(r.metadata["role"] == "research_result" for r in replies)
+    assert peak == 3
+    assert elapsed < 0.5  # jedan po jedan bi trajalo barem 0.6 s
+
+
+def test_research_concurrency_is_bounded(tmp_path):
+    (tmp_path / "a.txt").write_text("Stari grad je utvrda s muzejom. " * 20, encoding="utf-8")
+    elapsed, replies, peak = asyncio.run(_research(tmp_path, 3, max_concurrency=1, delay=0.1))
+    assert len(replies) == 3
+    assert peak == 1
+    assert elapsed >= 0.3
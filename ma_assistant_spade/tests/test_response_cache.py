@@ -0,0 +1,46 @@
+from src.tools.response_cache import ResponseCache
+
+
+def test_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.put("Gdje je Varaždin?", 1, "Na sjeveru.", "PASS", [])
+    entry = cache.get("gdje  je varaždin", 1)
+    assert entry.answer == "Na sjeveru."
+    assert cache.stats["hits"] == 1
+
+
+def test_context_is_part_of_key():
+    cache = ResponseCache()
+    cache.put("A koliko stanovnika ima?", 1, "Oko 45 000.", "PASS", [], context="Korisnik: Gdje je Varaždin?")
+    assert cache.get("A koliko stanovnika ima?", 1) is None
+    assert cache.get("A koliko stanovnika ima?", 1, context="Korisnik: Gdje je Osijek?") is None
+    assert cache.get("A koliko stanovnika ima?", 1, context="Korisnik: Gdje je Varaždin?") is not None
+
+
+def test_new_generation_invalidates_entries():
+    cache = ResponseCache()
+    cache.put("Pitanje jedan", 1, "a", "PASS", [])
+    cache.put("Pitanje dva", 2, "b", "PASS", [])
+    assert cache.invalidate(2) == 1
+    assert cache.get("Pitanje jedan", 1) is None
+    assert cache.get("Pitanje dva", 2) is not None
+
+
+def test_lru_and_ttl():
+    cache = ResponseCache(max_entries=2)
+    for q in ("prvo", "drugo", "treće"):
+        cache.put(q, 1, q, "PASS", [])
+    assert cache.get("prvo", 1) is None
+    assert len(cache) == 2
+
+    expired = ResponseCache(ttl=1e-9)
+    expired.put("prvo", 1, "a", "PASS", [])
+    assert expired.get("prvo", 1) is None
+
+
+def test_similar_question_hits_only_with_same_context():
+    cache = ResponseCache(similarity=0.8)
+    cache.put("Koje su glavne znamenitosti Varaždina?", 1, "Stari grad.", "PASS", [], context="k1")
+    assert cache.get("Koje su glavne znamenitosti Varaždina danas?", 1, context="k1") is not None
+    assert cache.stats["semantic_hits"] == 1
+    assert cache.get("Koje su glavne znamenitosti Varaždina danas?", 1, context="k2") is None
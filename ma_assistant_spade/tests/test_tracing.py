@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+import uuid
+
+from spade.message import Message
+
+from src.protocol import make_metadata
+from src.tools.tracing import NULL_TRACER, Tracer, format_table, mark_received, percentile, read_spans, summarize
+
+
+class _GatedFile:
+    """Umjesto datoteke spanova: `write` čeka dok test ne otvori vrata (pisač zastane s punim redom)."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.lines = []
+
+    def write(self, line: str) -> None:
+        self.entered.set()
+        self.gate.wait(5)
+        self.lines.append(line)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_nested_spans_are_written_as_otlp(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path), service="test")
+    conversation = str(uuid.uuid4())
+    with tracer.span("coord.question", conversation) as root:
+        with tracer.span("coord.draft", input_tokens=120) as child:
+            child.set(output_tokens=30)
+        try:
+            with tracer.span("coord.verify"):
+                raise ValueError("x")
+        except ValueError:
+            pass
+    tracer.close()
+
+    request = json.loads(path.read_text(encoding="utf-8").splitlines()[0])
+    resource = request["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test"}}]
+    raw = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+    assert raw["coord.question"]["traceId"] == conversation.replace("-", "")
+    assert raw["coord.draft"]["parentSpanId"] == root.span_id
+    assert raw["coord.verify"]["status"] == {"code": 2, "message": "ValueError"}
+
+    spans = {s["name"]: s for s in read_spans([str(path)])}
+    assert spans["coord.draft"]["input_tokens"] == 120 and spans["coord.draft"]["output_tokens"] == 30
+    assert spans["coord.question"]["conversation_id"] == conversation
+    assert tracer.stats == {"exported": 3, "dropped": 0, "batches": 1}
+
+
+def test_message_hop_and_queue_wait(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.span("coord.research", "c1") as parent:
+        msg = Message(to="researcher@localhost", sender="coordinator@localhost")
+        msg.metadata = make_metadata("request", "c1", {"role": "research"}, parent.span_id)
+    mark_received(msg)
+    time.sleep(0.01)
+    with tracer.serve(msg, "research.handle"):
+        pass
+    tracer.close()
+
+    spans = {s["name"]: s for s in read_spans([str(path)])}
+    assert set(spans) == {"coord.research", "hop.research", "research.handle"}
+    assert spans["hop.research"]["sender"] == "coordinator@localhost"
+    assert spans["research.handle"]["queue_wait_ms"] >= 10
+
+
+def test_full_queue_drops_spans_and_close_drains(tmp_path):
+    tracer = Tracer(str(tmp_path / "traces.jsonl"), queue_size=1)
+    tracer._fh.close()
+    gated = tracer._fh = _GatedFile()
+    tracer.record("a", 1, 2)
+    assert gated.entered.wait(5)  # pisač drži prvi span, red je prazan
+    tracer.record("b", 1, 2)
+    tracer.record("c", 1, 2)  # red (1) je pun: odbacuje se bez čekanja
+    assert tracer.stats["dropped"] == 1
+    gated.gate.set()
+    tracer.close()
+    assert tracer.stats["exported"] == 2
+    names = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] for line in gated.lines]
+    assert names == ["a", "b"]
+
+
+def test_disabled_tracer_writes_nothing():
+    assert not NULL_TRACER.enabled
+    with NULL_TRACER.span("x", "c1") as span:
+        pass
+    assert span.span_id == ""
+    assert NULL_TRACER.stats == {"exported": 0, "dropped": 0, "batches": 0}
+    msg = Message(to="a@localhost")
+    msg.metadata = make_metadata("request", "c1", {"role": "research"}, span.span_id)
+    assert "span-id" not in msg.metadata
+
+
+def test_summary_percentiles():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert percentile(list(range(1, 101)), 99) == 99
+    spans = [{"name": "llm", "duration_ms": float(ms), "input_tokens": 10, "queue_wait_ms": 1.0} for ms in (10, 20, 30)]
+    rows = summarize(spans)
+    assert rows["llm"]["count"] == 3 and rows["llm"]["p50_ms"] == 20.0 and rows["llm"]["max_ms"] == 30.0
+    assert rows["llm"]["avg_input_tokens"] == 10.0
+    assert rows["llm:queue_wait"]["p99_ms"] == 1.0
+    assert format_table(rows).splitlines()[1].split()[:3] == ["llm", "3", "20.00"]
@@ -0,0 +1,114 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+from spade.template import Template
+
+import src.tools.transport as transport
+from src.tools.transport import LocalBus, TransportAgent
+
+
+class _Echo(CyclicBehaviour):
+    async def run(self):
+        msg = await self.receive(timeout=1)
+        if msg:
+            reply = msg.make_reply()
+            reply.body = f"echo {msg.body}"
+            await self.send(reply)
+
+
+class _Collect(CyclicBehaviour):
+    def __init__(self):
+        super().__init__()
+        self.received = []
+
+    async def run(self):
+        msg = await self.receive(timeout=1)
+        if msg:
+            self.received.append(msg)
+
+
+async def _wait_for(predicate, timeout: float = 2.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_agents_exchange_messages_without_server():
+    async def scenario():
+        bus = LocalBus()
+        echo = TransportAgent("echo@localhost", "test", bus=bus)
+        client = TransportAgent("client@localhost", "test", bus=bus)
+        template = Template()
+        template.set_metadata("role", "ping")
+        echo.add_behaviour(_Echo(), template)
+        collect = _Collect()
+        client.add_behaviour(collect)
+        await echo.start(auto_register=False)
+        await client.start(auto_register=False)
+        try:
+            ignored = Message(to="echo@localhost", sender="client@localhost", body="x", metadata={"role": "other"})
+            await bus.send(ignored)
+            msg = Message(to="echo@localhost/res", sender="client@localhost", body="a", metadata={"role": "ping"})
+            await bus.send(msg)
+            msg.body = "izmijenjeno nakon slanja"
+            await _wait_for(lambda: collect.received)
+            return bus.stats, [(str(m.sender.bare()), m.body) for m in collect.received]
+        finally:
+            await client.stop()
+            await echo.stop()
+
+    stats, received = asyncio.run(scenario())
+    # Poruka je kopirana pri slanju; ona koja ne odgovara Templateu ne dolazi do ponašanja
+    assert received == [("echo@localhost", "echo a")]
+    assert stats == {"delivered": 3, "undeliverable": 0}
+
+
+def test_unknown_recipient_is_counted_not_raised():
+    async def scenario():
+        bus = LocalBus()
+        await bus.send(Message(to="nobody@localhost", sender="client@localhost", body="x"))
+        return bus.stats
+
+    assert asyncio.run(scenario()) == {"delivered": 0, "undeliverable": 1}
+
+
+def test_stopped_agent_no_longer_receives():
+    async def scenario():
+        bus = LocalBus()
+        agent = TransportAgent("a@localhost", "test", bus=bus)
+        await agent.start(auto_register=False)
+        assert agent.is_alive()
+        await agent.stop()
+        await bus.send(Message(to="a@localhost", body="x"))
+        return agent.is_alive(), bus.stats
+
+    alive, stats = asyncio.run(scenario())
+    assert not alive
+    assert stats["undeliverable"] == 1
+
+
+def test_bus_pump_dispatches_in_order():
+    async def scenario():
+        bus = LocalBus()
+        seen = []
+        agent = SimpleNamespace(jid=Message(to="a@localhost").to, dispatch=lambda m: seen.append(m.body))
+        bus.register(agent)
+        for body in "abc":
+            await bus.send(Message(to="a@localhost", body=body))
+        await _wait_for(lambda: len(seen) == 3)
+        await bus.unregister(agent)
+        return seen
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+
+
+def test_missing_spade_internals_fail_fast(monkeypatch):
+    monkeypatch.setattr(transport, "_SPADE_PRIVATE", (*transport._SPADE_PRIVATE, "_nepostojeci_dio"))
+    with pytest.raises(RuntimeError, match="_nepostojeci_dio"):
+        TransportAgent("a@localhost", "test", bus=LocalBus())
+    # XMPP prijenos ne ovisi o tim dijelovima
+    assert TransportAgent("a@localhost", "test").bus is None
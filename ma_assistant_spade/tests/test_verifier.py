@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+from spade.message import Message
+
+from src.agents.verifier import VerifierAgent, precheck
+from src.protocol import as_int, make_metadata
+from src.tools.llm import LLMClient, LLMConfig
+from src.tools.transport import LocalBus
+
+_VERDICT = json.dumps({"verdict": "PASS", "issues": [], "suggested_fixes": []})
+
+
+class _SlowModel:
+    """`responses.create` koji odgovara nakon `delay` sekundi i broji istovremene pozive."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.responses = self
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, **request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(output_text=_VERDICT)
+
+
+async def _verify_claims(n: int, max_concurrency: int, delay: float = 0.2):
+    bus = LocalBus()
+    model = _SlowModel(delay)
+    llm = LLMClient(LLMConfig(model="test"), client=SimpleNamespace(), async_client=model)
+    verifier = VerifierAgent(
+        "verifier@localhost",
+        "test",
+        llm_model="test",
+        logger=logging.getLogger("test_verifier"),
+        llm_client=llm,
+        fast_path=False,
+        bus=bus,
+        max_concurrency=max_concurrency,
+    )
+    replies = []
+    coordinator = SimpleNamespace(jid=Message(to="coordinator@localhost").to, dispatch=replies.append)
+    await verifier.start(auto_register=False)
+    bus.register(coordinator)
+    try:
+        started = time.perf_counter()
+        for claim in range(n):
+            msg = Message(to="verifier@localhost", sender="coordinator@localhost")
+            msg.metadata = make_metadata("request", "c1", {"role": "verify", "claim-id": claim})
+            msg.body = json.dumps({"draft_answer": f"Tvrdnja {claim}.", "evidence": []})
+            await bus.send(msg)
+        while len(replies) < n and time.perf_counter() - started < 5:
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started, replies, model.peak
+    finally:
+        await bus.unregister(coordinator)
+        await verifier.stop()
+
+
+def test_claims_are_verified_concurrently():
+    elapsed, replies, peak = asyncio.run(_verify_claims(4, max_concurrency=8))
+    assert sorted(r.metadata["claim-id"] for r in replies) == ["0", "1", "2", "3"]
+    assert all(r.metadata["role"] == "verify_result" for r in replies)
+    assert peak == 4
+    assert elapsed < 0.6  # jedan po jedan bi trajalo barem 0.8 s
+
+
+def test_concurrency_is_bounded():
+    elapsed, replies, peak = asyncio.run(_verify_claims(4, max_concurrency=2, delay=0.1))
+    assert len(replies) == 4
+    assert peak == 2
+    assert elapsed >= 0.2
+
+
+EVIDENCE = [
+    {"doc_id": "VARAZDIN_01", "chunk_id": 0, "text": "Varaždin je grad na sjeveru Hrvatske, smješten uz rijeku Dravu."},
+    {"doc_id": "VARAZDIN_02", "chunk_id": 3, "text": "Stari grad Varaždin utvrda je iz 14. stoljeća i danas je muzej."},
+]
+
+
+def test_precheck_passes_supported_draft():
+    draft = "Varaždin je grad na sjeveru Hrvatske uz rijeku Dravu [VARAZDIN_01:0]."
+    assert precheck(draft, EVIDENCE).verdict == "PASS"
+
+
+def test_precheck_fails_uncited_draft():
+    result = precheck("Varaždin je grad na sjeveru Hrvatske.", EVIDENCE)
+    assert result.verdict == "FAIL"
+    assert result.issues == ["Nacrt ne citira nijedan dokaz [DOC:CHUNK]."]
+
+
+def test_precheck_fails_unknown_citation():
+    result = precheck("Varaždin ima zračnu luku [VARAZDIN_09:1].", EVIDENCE)
+    assert result.verdict == "FAIL"
+    assert result.issues == ["Citat [VARAZDIN_09:1] ne postoji među dokazima."]
+
+
+def test_precheck_leaves_unsupported_sentence_to_model():
+    draft = "Varaždin ima najveću zračnu luku u Europi od 1850. godine [VARAZDIN_01:0]."
+    assert precheck(draft, EVIDENCE) is None
+
+
+def test_precheck_uncited_claim_is_judged_not_rejected():
+    assert precheck("Ukratko, to je sve što znamo.", EVIDENCE, claim=True) is None
+    claim = "Stari grad Varaždin je utvrda iz 14. stoljeća i danas je muzej."
+    assert precheck(claim, EVIDENCE, claim=True).verdict == "PASS"
+
+
+def test_precheck_without_evidence_or_words():
+    assert precheck("Nema podataka o tome.", []) is None
+    assert precheck("[VARAZDIN_01:0]", EVIDENCE) is None
+
+
+def test_precheck_accepts_string_chunk_ids():
+    evidence = [dict(EVIDENCE[0], chunk_id="0")]
+    assert precheck("Varaždin je grad na sjeveru Hrvatske uz rijeku Dravu [VARAZDIN_01:0].", evidence).verdict == "PASS"
+    assert as_int("x") == -1 and as_int(None) == -1 and as_int("7") == 7
@@ -0,0 +1,60 @@
+import pytest
+
+from src.tools.worker_pool import WorkerPool
+
+
+def test_least_outstanding_then_longest_idle():
+    pool = WorkerPool("research", ["a", "b"])
+    assert [pool.pick(), pool.pick(), pool.pick()] == ["a", "b", "a"]
+    pool.finish("a", True)
+    pool.finish("a", True)
+    assert pool.pick() == "a"  # a nema neodgovorenih, b ima jedan
+
+
+def test_failed_worker_cools_down_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.tools.worker_pool.time.monotonic", lambda: now[0])
+    pool = WorkerPool("verify", ["a", "b"], max_failures=1, cooldown=10.0, max_cooldown=15.0)
+
+    pool.pick()
+    pool.finish("a", False)
+    assert not pool.healthy("a")
+    assert [pool.pick(), pool.pick()] == ["b", "b"]
+
+    now[0] += 10.0
+    assert pool.healthy("a")
+    assert pool.pick() == "a"  # probni zahtjev
+    pool.finish("a", False)
+    now[0] += 10.0
+    assert not pool.healthy("a")  # drugi put dvostruko (20 s), najviše max_cooldown = 15 s
+    now[0] += 5.0
+    assert pool.healthy("a")
+
+    pool.pick(exclude=["b"])
+    pool.finish("a", True, latency_s=0.5)
+    stats = pool.stats()["a"]
+    assert stats["healthy"] and stats["served"] == 1 and stats["timeouts"] == 2
+
+
+def test_all_down_picks_earliest_recovery(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("src.tools.worker_pool.time.monotonic", lambda: now[0])
+    pool = WorkerPool("research", ["a", "b"], cooldown=10.0)
+    pool.finish("b", False)
+    now[0] = 1.0
+    pool.finish("a", False)
+    assert pool.pick() == "b"
+    assert pool.pick(exclude=["a", "b"]) is None
+
+
+def test_cancelled_request_is_not_scored():
+    pool = WorkerPool("research", ["a"])
+    pool.pick()
+    pool.finish("a", None)
+    assert pool.healthy("a")
+    assert pool.stats()["a"]["outstanding"] == 0
+
+
+def test_empty_pool_is_rejected():
+    with pytest.raises(ValueError):
+        WorkerPool("research", [])